@@ -0,0 +1,128 @@
+"""Async variants of the read-heavy product and dashboard endpoints.
+
+These are plain Django async views mounted under ``/api/async/``. Under an ASGI server a request
+waiting on PostGIS or Redis yields the event loop instead of holding a worker, so one process keeps
+many slow reads in flight. Queries go through Django's async ORM and Redis through
+``async_redis()``. Responses match their DRF counterparts byte for byte; authentication
+accepts the same token and session credentials.
+"""
+
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.gis.geos import Point
+from django.http import HttpResponse
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import NotFound
+
+from app.api.conditional import acatalog_condition
+from app.api.fastpath import product_rows, product_values
+from app.api.pagination import GeoCursorPagination
+from app.api.renderers import ORJSONRenderer
+from app.geotiles import acached_geolocation_product_search
+from app.models import ArtisanShop, Product
+from app.refcache import category_cache
+from app.routers import ause_replica
+from app.services import CATALOG_CATEGORIES, CATALOG_PRODUCTS, acached_dashboard_kpis, arecommend_products
+
+_renderer = ORJSONRenderer()
+
+
+def _json(data, status=200, headers=None):
+    return HttpResponse(_renderer.render(data), content_type=_renderer.media_type, status=status, headers=headers)
+
+
+def _read_only(view):
+    """``require_safe`` for async views; Django 4.2's decorator only wraps sync ones."""
+
+    @wraps(view)
+    async def inner(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return _json(
+                {'detail': f'Method "{request.method}" not allowed.'}, status=405, headers={'Allow': 'GET, HEAD'}
+            )
+        return await view(request, *args, **kwargs)
+
+    return inner
+
+
+async def _authenticate(request):
+    """Return ``(user, error)`` from a ``Token`` ``Authorization`` header, else from the session."""
+    keyword, _, key = request.headers.get('Authorization', '').partition(' ')
+    if keyword == 'Token':
+        token = await Token.objects.select_related('user').filter(key=key.strip()).afirst() if key else None
+        if token is None or not token.user.is_active:
+            return None, 'Invalid token.'
+        return token.user, None
+    user = await sync_to_async(lambda: request.user if request.user.is_authenticated else None)()
+    return user, None if user else 'Authentication credentials were not provided.'
+
+
+async def _use_replica(request):
+    """Read from a replica unless the request carries the credentials of a user pinned to the primary."""
+    if not settings.DATABASE_REPLICAS:
+        return
+    user = None
+    if 'Authorization' in request.headers or settings.SESSION_COOKIE_NAME in request.COOKIES:
+        user, _ = await _authenticate(request)
+    await ause_replica(user)
+
+
+@_read_only
+async def geosearch(request):
+    lat = request.GET.get('lat')
+    lng = request.GET.get('lng')
+    category_id = request.GET.get('category')
+    if not lat or not lng:
+        return _json({'error': 'Missing latitude/longitude'}, status=400)
+    try:
+        point = Point(float(lng), float(lat), srid=4326)
+        radius = float(request.GET.get('radius', 10))
+    except ValueError:
+        return _json({'error': 'Invalid latitude/longitude/radius'}, status=400)
+    await _use_replica(request)
+    category = None
+    if category_id is not None:
+        category = await category_cache.aget(category_id)
+    paginator = GeoCursorPagination()
+    try:
+        after = paginator.get_position(request)
+    except NotFound as exc:
+        return _json({'detail': exc.detail}, status=404)
+    products = await acached_geolocation_product_search(point, radius, category, after=after)
+    page = await paginator.apaginate_queryset(product_values(products, 'distance'), request)
+    return _json(paginator.get_paginated_data(product_rows(page, 'distance')))
+
+
+@_read_only
+# Product payloads embed their category, so category writes change them too.
+@acatalog_condition(CATALOG_PRODUCTS, CATALOG_CATEGORIES)
+async def product_detail(request, pk):
+    await _use_replica(request)
+    row = await product_values(Product.objects.filter(pk=pk)).afirst()
+    if row is None:
+        return _json({'detail': 'No Product matches the given query.'}, status=404)
+    return _json(product_rows([row])[0])
+
+
+@_read_only
+async def product_recommendations(request, pk):
+    await _use_replica(request)
+    product = await Product.objects.only('id', 'shop_id', 'category_id').filter(pk=pk).afirst()
+    if product is None:
+        return _json({'detail': 'No Product matches the given query.'}, status=404)
+    return _json(product_rows(await arecommend_products(product, project=product_values)))
+
+
+@_read_only
+async def shop_dashboard(request, pk):
+    user, error = await _authenticate(request)
+    if user is None:
+        return _json({'detail': error}, status=401, headers={'WWW-Authenticate': 'Token'})
+    await ause_replica(user)
+    shop = await ArtisanShop.objects.filter(pk=pk).afirst()
+    if shop is None:
+        return _json({'detail': 'No ArtisanShop matches the given query.'}, status=404)
+    data, cache_meta = await acached_dashboard_kpis(shop)
+    return _json({**data, 'cache': cache_meta}, headers={'X-Cache': cache_meta['status']})
@@ -0,0 +1,122 @@
+"""Read-only fast path for product responses.
+
+``ProductSerializer`` builds every row through DRF's per-field machinery and nested
+``CategorySerializer``, and the ``location`` column is parsed into a GEOS object only to be printed
+back as EWKT. For list-style endpoints the rows are instead fetched with ``.values()``, with the
+coordinates extracted in SQL, and converted by a flat field table into the same wire format.
+"""
+
+from decimal import ROUND_HALF_EVEN, Decimal
+from operator import itemgetter
+
+from django.db.models import FloatField, Func
+from django.utils import timezone
+
+from app.metrics import timed_serialization
+
+PRODUCT_VALUES = (
+    'id',
+    'shop_id',
+    'name',
+    'sku',
+    'description',
+    'price',
+    'quantity',
+    'category_id',
+    'category__name',
+    'category__description',
+    'is_hot',
+    'flash_sale_price',
+    'flash_sale_start',
+    'flash_sale_end',
+    'effective_price',
+    'on_flash_sale',
+    'created_at',
+    'updated_at',
+)
+
+PRODUCT_EXPRESSIONS = {
+    'location_x': Func('location', function='ST_X', output_field=FloatField()),
+    'location_y': Func('location', function='ST_Y', output_field=FloatField()),
+}
+
+_WKT_QUANTUM = Decimal('1e-16')
+
+
+def _wkt_number(value):
+    """Format a coordinate exactly like GEOS' trimmed WKT writer (at most 16 decimals)."""
+    if value == 0:
+        return '0'
+    text = repr(value)
+    if 'e' in text:
+        mantissa, exponent = text.split('e')
+        return f'{mantissa}e{int(exponent):+d}'
+    whole, _, fraction = text.partition('.')
+    if len(fraction) > 16:
+        return format(Decimal(text).quantize(_WKT_QUANTUM, ROUND_HALF_EVEN), 'f').rstrip('0').rstrip('.')
+    return whole if fraction == '0' else text
+
+
+def _location(row):
+    x, y = row['location_x'], row['location_y']
+    if x is None:
+        return None
+    return f'SRID=4326;POINT ({_wkt_number(x)} {_wkt_number(y)})'
+
+
+def _category(row):
+    return {'id': row['category_id'], 'name': row['category__name'], 'description': row['category__description']}
+
+
+def _decimal(key):
+    def convert(row):
+        value = row[key]
+        return None if value is None else format(value, 'f')
+
+    return convert
+
+
+def _datetime(key):
+    def convert(row):
+        value = row[key]
+        if value is None:
+            return None
+        value = value.astimezone(timezone.get_current_timezone()).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+    return convert
+
+
+# Output key -> getter, in ``ProductSerializer.Meta.fields`` order.
+PRODUCT_FIELDS = (
+    ('id', itemgetter('id')),
+    ('shop', itemgetter('shop_id')),
+    ('name', itemgetter('name')),
+    ('sku', itemgetter('sku')),
+    ('description', itemgetter('description')),
+    ('price', _decimal('price')),
+    ('quantity', itemgetter('quantity')),
+    ('category', _category),
+    ('location', _location),
+    ('is_hot', itemgetter('is_hot')),
+    ('flash_sale_price', _decimal('flash_sale_price')),
+    ('flash_sale_start', _datetime('flash_sale_start')),
+    ('flash_sale_end', _datetime('flash_sale_end')),
+    ('effective_price', _decimal('effective_price')),
+    ('on_flash_sale', itemgetter('on_flash_sale')),
+    ('created_at', _datetime('created_at')),
+    ('updated_at', _datetime('updated_at')),
+)
+
+
+def product_values(products, *extra):
+    """Project a product queryset (or ``TileResults``) onto the columns ``product_rows`` reads."""
+    return products.values(*PRODUCT_VALUES, *extra, **PRODUCT_EXPRESSIONS)
+
+
+def product_rows(rows, *extra):
+    """Convert ``product_values`` rows to ``ProductSerializer`` output, plus the ``extra`` keys as is."""
+    fields = PRODUCT_FIELDS + tuple((key, itemgetter(key)) for key in extra)
+    rows = list(rows)
+    with timed_serialization():
+        return [{key: getter(row) for key, getter in fields} for row in rows]
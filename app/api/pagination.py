@@ -0,0 +1,180 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.db.models import BooleanField
+from django.db.models.expressions import RawSQL
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class InventoryAlertCursorPagination(CursorPagination):
+    page_size = 50
+    max_page_size = 200
+    page_size_query_param = 'page_size'
+    ordering = ('-triggered_at', '-id')
+
+
+class GeoCursorPagination:
+    """Keyset pagination over ``(distance, id)`` for nearest-first geosearch results.
+
+    Parameters are read from ``request.GET``, so the async views can page with a plain ``HttpRequest``.
+    """
+
+    page_size = 20
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def get_position(self, request):
+        encoded = request.GET.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            distance, pk = urlsafe_b64decode(encoded.encode()).decode().split(':')
+            return float(distance), int(pk)
+        except (TypeError, ValueError):
+            raise NotFound('Invalid cursor')
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.GET[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(page_size, self.max_page_size) if page_size > 0 else self.page_size
+
+    def paginate_queryset(self, queryset, request):
+        self.request = request
+        page_size = self.get_page_size(request)
+        return self._page(list(queryset[: page_size + 1]), page_size)
+
+    async def apaginate_queryset(self, queryset, request):
+        self.request = request
+        page_size = self.get_page_size(request)
+        return self._page([row async for row in queryset[: page_size + 1]], page_size)
+
+    def _page(self, rows, page_size):
+        self.next_position = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            last = rows[-1]
+            self.next_position = (last['distance'], last['id']) if isinstance(last, dict) else (last.distance, last.pk)
+        return rows
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        distance, pk = self.next_position
+        encoded = urlsafe_b64encode(f'{distance!r}:{pk}'.encode()).decode()
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, encoded)
+
+    def get_paginated_data(self, data):
+        return {'next': self.get_next_link(), 'results': data}
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+
+class KeysetPagination(PageNumberPagination):
+    """Opt-in keyset pagination, falling back to page numbers.
+
+    Requests carrying a ``cursor`` parameter (empty for the first page) are paged by the full sort
+    key of the queryset's ``order_by``, compared as a row value so the composite index on those
+    columns seeks straight to the next page: no ``COUNT(*)`` and no ``OFFSET``. The sort key must
+    end in the primary key and use one direction throughout. ``approximate_count=true`` adds the
+    planner's row estimate for the unpaginated query.
+    """
+
+    cursor_query_param = 'cursor'
+    approximate_count_query_param = 'approximate_count'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.cursor_query_param in request.query_params
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+        self.request = request
+        fields, descending = self._sort_key(queryset)
+        self.approximate_count = None
+        if request.query_params.get(self.approximate_count_query_param) in ('1', 'true'):
+            self.approximate_count = _planner_row_estimate(queryset)
+        position = self._decode_position(request.query_params[self.cursor_query_param], fields)
+        if position is not None:
+            table = connection.ops.quote_name(queryset.model._meta.db_table)
+            columns = ', '.join(f'{table}.{connection.ops.quote_name(field.column)}' for field in fields)
+            placeholders = ', '.join(['%s'] * len(fields))
+            operator = '<' if descending else '>'
+            queryset = queryset.filter(
+                RawSQL(f'({columns}) {operator} ({placeholders})', position, output_field=BooleanField())
+            )
+            # The planner cannot prune partitions on a row comparison; the bound it implies on the
+            # leading column lets it skip the monthly order partitions past the cursor.
+            lookup = 'lte' if descending else 'gte'
+            queryset = queryset.filter(**{f'{fields[0].name}__{lookup}': position[0]})
+        page_size = self.get_page_size(request) or api_settings.PAGE_SIZE
+        rows = list(queryset[: page_size + 1])
+        self.next_position = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            last = rows[-1]
+            if isinstance(last, dict):
+                self.next_position = [last[field.name] for field in fields]
+            else:
+                self.next_position = [getattr(last, field.attname) for field in fields]
+        return rows
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        payload = {'next': self.get_next_link(), 'results': data}
+        if self.approximate_count is not None:
+            payload['approximate_count'] = self.approximate_count
+        return Response(payload)
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if self.next_position is None:
+            return None
+        # ``isoformat`` rather than ``DjangoJSONEncoder``, which truncates datetimes to milliseconds.
+        values = [value.isoformat() if isinstance(value, datetime) else value for value in self.next_position]
+        encoded = urlsafe_b64encode(json.dumps(values, cls=DjangoJSONEncoder).encode()).decode()
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, encoded)
+
+    def get_previous_link(self):
+        return super().get_previous_link() if not self.keyset else None
+
+    def _sort_key(self, queryset):
+        opts = queryset.model._meta
+        ordering = [name for name in queryset.query.order_by if isinstance(name, str)]
+        if len(ordering) != len(queryset.query.order_by) or not ordering:
+            raise ImproperlyConfigured('Keyset pagination needs a queryset ordered by plain field names')
+        directions = {name.startswith('-') for name in ordering}
+        fields = [opts.pk if name.lstrip('-') == 'pk' else opts.get_field(name.lstrip('-')) for name in ordering]
+        if len(directions) != 1 or not fields[-1].primary_key:
+            raise ImproperlyConfigured('Keyset pagination needs one sort direction and a trailing primary key')
+        return fields, directions.pop()
+
+    def _decode_position(self, encoded, fields):
+        if not encoded:
+            return None
+        try:
+            values = json.loads(urlsafe_b64decode(encoded.encode()))
+            if len(values) != len(fields):
+                raise ValueError
+            return [field.to_python(value) for field, value in zip(fields, values)]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound('Invalid cursor')
+
+
+def _planner_row_estimate(queryset):
+    """Row estimate of ``queryset`` from ``EXPLAIN``, without running it."""
+    plan = json.loads(queryset.order_by().explain(format='json'))
+    return int(plan[0]['Plan']['Plan Rows'])
@@ -0,0 +1,21 @@
+import orjson
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class ORJSONRenderer(BaseRenderer):
+    """Drop-in for ``JSONRenderer`` that encodes with orjson.
+
+    Output matches DRF's compact, UTF-8 JSON; types orjson does not know natively (``Decimal``,
+    lazy strings, ...) go through DRF's own encoder.
+    """
+
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+    options = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return orjson.dumps(data, default=JSONEncoder().default, option=self.options)
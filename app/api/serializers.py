@@ -1,11 +1,39 @@
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
 
-from app.models import ArtisanShop, Category, Order, Product
+from app.metrics import timed_serialization
+from app.models import ArtisanShop, Category, InventoryAlert, Order, Product
+from app.refcache import category_cache, shop_cache
 from app.services import create_order
 
 
-class UserSerializer(serializers.ModelSerializer):
+class CachedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """``PrimaryKeyRelatedField`` resolved through a ``ReferenceCache`` instead of a query."""
+
+    def __init__(self, cache, **kwargs):
+        self.cache = cache
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool) or not isinstance(data, (int, str)):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        instance = self.cache.get(data)
+        if instance is None:
+            if not str(data).isdigit():
+                self.fail('incorrect_type', data_type=type(data).__name__)
+            self.fail('does_not_exist', pk_value=data)
+        return instance
+
+
+class TimedModelSerializer(serializers.ModelSerializer):
+    """``ModelSerializer`` reporting its output time to the request metrics."""
+
+    def to_representation(self, instance):
+        with timed_serialization():
+            return super().to_representation(instance)
+
+
+class UserSerializer(TimedModelSerializer):
     class Meta:
         model = get_user_model()
         fields = ['id', 'username', 'role', 'password']
@@ -20,23 +48,23 @@ class UserSerializer(serializers.ModelSerializer):
         return user
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(TimedModelSerializer):
     class Meta:
         model = Category
         fields = ['id', 'name', 'description']
 
 
-class ArtisanShopSerializer(serializers.ModelSerializer):
+class ArtisanShopSerializer(TimedModelSerializer):
     class Meta:
         model = ArtisanShop
         fields = ['id', 'owner', 'name', 'description', 'location', 'created_at']
         read_only_fields = ['owner', 'created_at']
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(TimedModelSerializer):
     category = CategorySerializer(read_only=True)
-    category_id = serializers.PrimaryKeyRelatedField(
-        source='category', queryset=Category.objects.all(), write_only=True
+    category_id = CachedPrimaryKeyRelatedField(
+        cache=category_cache, source='category', queryset=Category.objects.all(), write_only=True
     )
 
     class Meta:
@@ -45,22 +73,67 @@ class ProductSerializer(serializers.ModelSerializer):
             'id',
             'shop',
             'name',
+            'sku',
             'description',
             'price',
             'quantity',
             'category',
             'category_id',
             'location',
+            'is_hot',
+            'flash_sale_price',
+            'flash_sale_start',
+            'flash_sale_end',
+            'effective_price',
+            'on_flash_sale',
             'created_at',
             'updated_at',
         ]
-        read_only_fields = ['created_at', 'updated_at', 'shop']
+        read_only_fields = ['created_at', 'updated_at', 'shop', 'effective_price', 'on_flash_sale']
+
+    def validate_sku(self, value):
+        # ``shop`` is read-only, so DRF builds no validator for ``product_shop_sku_uniq``; check it here.
+        if not value:
+            return None
+        if self.instance is not None:
+            shop_id = self.instance.shop_id
+        else:
+            shop = shop_cache.get(self.initial_data.get('shop'))
+            if shop is None:
+                return value
+            shop_id = shop.pk
+        duplicates = Product.objects.filter(shop_id=shop_id, sku=value)
+        if self.instance is not None:
+            duplicates = duplicates.exclude(pk=self.instance.pk)
+        if duplicates.exists():
+            raise serializers.ValidationError('This shop already has a product with this SKU.')
+        return value
+
+    def validate(self, attrs):
+        sale_fields = ('flash_sale_price', 'flash_sale_start', 'flash_sale_end')
+        sale = {field: attrs.get(field, getattr(self.instance, field, None)) for field in sale_fields}
+        if any(value is not None for value in sale.values()):
+            if any(value is None for value in sale.values()):
+                raise serializers.ValidationError('flash_sale_price, flash_sale_start and flash_sale_end go together')
+            if sale['flash_sale_start'] >= sale['flash_sale_end']:
+                raise serializers.ValidationError('flash_sale_start must be before flash_sale_end')
+        return attrs
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class SearchProductSerializer(ProductSerializer):
+    rank = serializers.FloatField(read_only=True)
+    distance = serializers.FloatField(read_only=True)
+
+    class Meta(ProductSerializer.Meta):
+        fields = ProductSerializer.Meta.fields + ['rank', 'distance']
+
+
+class OrderSerializer(TimedModelSerializer):
     items = serializers.ListField(child=serializers.DictField(), write_only=True)
     shop = ArtisanShopSerializer(read_only=True)
-    shop_id = serializers.PrimaryKeyRelatedField(source='shop', queryset=ArtisanShop.objects.all(), write_only=True)
+    shop_id = CachedPrimaryKeyRelatedField(
+        cache=shop_cache, source='shop', queryset=ArtisanShop.objects.all(), write_only=True
+    )
 
     class Meta:
         model = Order
@@ -77,13 +150,20 @@ class OrderSerializer(serializers.ModelSerializer):
             product_id = item.get('product_id')
             if not product_id:
                 raise serializers.ValidationError('product_id is required for each item')
-            product = Product.objects.get(pk=product_id)
             quantity = item.get('quantity')
             if not quantity or quantity < 1:
                 raise serializers.ValidationError('quantity must be >= 1 for each item')
-            item_args.append({'product': product, 'quantity': quantity})
+            item_args.append({'product_id': product_id, 'quantity': quantity})
         try:
             order = create_order(customer, shop, item_args)
         except Exception as exc:
             raise serializers.ValidationError(str(exc))
         return order
+
+
+class InventoryAlertSerializer(TimedModelSerializer):
+    product = serializers.CharField(source='product.name', read_only=True)
+
+    class Meta:
+        model = InventoryAlert
+        fields = ['id', 'product', 'quantity', 'triggered_at']
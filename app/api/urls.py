@@ -2,11 +2,13 @@ from django.urls import include, path
 from rest_framework.authtoken.views import obtain_auth_token
 from rest_framework.routers import DefaultRouter
 
+from . import async_views
 from .views import (
     ArtisanShopViewSet,
     CategoryViewSet,
     HealthCheckView,
     InventoryAlertViewSet,
+    MetricsView,
     OrderViewSet,
     ProductViewSet,
     UserRegistrationView,
@@ -22,8 +24,17 @@ router.register(r'inventory-alerts', InventoryAlertViewSet, basename='inventory-
 urlpatterns = [
     path('', include(router.urls)),
     path('health/', HealthCheckView.as_view(), name='health-check'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
     path('register/', UserRegistrationView.as_view(), name='user-register'),
     path('token/', obtain_auth_token, name='api-token'),
+    path('async/products/geosearch/', async_views.geosearch, name='async-product-geosearch'),
+    path('async/products/<int:pk>/', async_views.product_detail, name='async-product-detail'),
+    path(
+        'async/products/<int:pk>/recommendations/',
+        async_views.product_recommendations,
+        name='async-product-recommendations',
+    ),
+    path('async/shops/<int:pk>/dashboard/', async_views.shop_dashboard, name='async-artisanshop-dashboard'),
 ]
 
 app_name = 'api'
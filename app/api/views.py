@@ -1,26 +1,61 @@
+import csv
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
 from django.contrib.gis.geos import Point
 from django.db import DatabaseError, connection
+from django.http import HttpResponse, StreamingHttpResponse
 from rest_framework import generics, permissions, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from app.api.conditional import catalog_condition
+from app.api.fastpath import product_rows, product_values
+from app.api.pagination import GeoCursorPagination, InventoryAlertCursorPagination, KeysetPagination
 from app.api.serializers import (
     ArtisanShopSerializer,
     CategorySerializer,
+    InventoryAlertSerializer,
     OrderSerializer,
     ProductSerializer,
+    SearchProductSerializer,
     UserSerializer,
 )
-from app.models import ArtisanShop, Category, Order, Product, User
+from app.exports import EXPORT_FORMATS, gzip_stream, order_lines, render_csv, render_ndjson
+from app.geotiles import cached_geolocation_product_search, invalidate_geo_tiles_on_commit
+from app.imports import IMPORT_FORMATS, decode_lines, import_products, read_rows
+from app.metrics import render_metrics
+from app.models import ArtisanShop, Category, InventoryAlert, Order, Product, User
+from app.pricing import schedule_flash_sale_boundaries
+from app.refcache import category_cache, shop_cache
+from app.routers import use_replica
 from app.services import (
-    artisan_dashboard_kpis,
-    geolocation_product_search,
+    CATALOG_CATEGORIES,
+    CATALOG_PRODUCTS,
+    cached_dashboard_kpis,
+    change_order_status,
     get_inventory_alerts,
+    invalidate_catalog_on_commit,
+    invalidate_dashboard_on_commit,
     recommend_products,
+    resolve_inventory_alerts,
+    search_products,
 )
 
 
+class ReplicaReadsMixin:
+    """Send the reads of ``replica_actions`` to a read replica unless the user just wrote; see ``app.routers``."""
+
+    replica_actions = ()
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.action in self.replica_actions:
+            use_replica(request.user)
+
+
 class UserRegistrationView(generics.CreateAPIView):
     queryset = User.objects.all()
     serializer_class = UserSerializer
@@ -32,11 +67,33 @@ class CategoryViewSet(viewsets.ModelViewSet):
     serializer_class = CategorySerializer
     permission_classes = [permissions.AllowAny]
 
+    @catalog_condition(CATALOG_CATEGORIES)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @catalog_condition(CATALOG_CATEGORIES)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    def perform_create(self, serializer):
+        serializer.save()
+        invalidate_catalog_on_commit(CATALOG_CATEGORIES)
+
+    def perform_update(self, serializer):
+        serializer.save()
+        invalidate_catalog_on_commit(CATALOG_CATEGORIES)
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        invalidate_catalog_on_commit(CATALOG_CATEGORIES)
+
 
-class ArtisanShopViewSet(viewsets.ModelViewSet):
-    queryset = ArtisanShop.objects.all()
+class ArtisanShopViewSet(ReplicaReadsMixin, viewsets.ModelViewSet):
+    queryset = ArtisanShop.objects.order_by('-created_at', '-id')
     serializer_class = ArtisanShopSerializer
+    pagination_class = KeysetPagination
     permission_classes = [permissions.IsAuthenticated]
+    replica_actions = ('dashboard',)
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
@@ -44,68 +101,228 @@ class ArtisanShopViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'], permission_classes=[permissions.IsAuthenticated])
     def dashboard(self, request, pk=None):
         shop = self.get_object()
-        data = artisan_dashboard_kpis(shop)
-        return Response(data)
+        data, cache_meta = cached_dashboard_kpis(shop)
+        return Response({**data, 'cache': cache_meta}, headers={'X-Cache': cache_meta['status']})
 
+    @action(detail=True, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+    def export(self, request, pk=None):
+        shop = self.get_object()
+        if shop.owner_id != request.user.pk:
+            return Response({'error': 'Only the shop owner can export its orders'}, status=status.HTTP_403_FORBIDDEN)
+        output = request.query_params.get('output', 'csv')
+        if output not in EXPORT_FORMATS:
+            return Response({'error': 'Unsupported output format'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            since, until = (
+                date.fromisoformat(request.query_params[name]) if request.query_params.get(name) else None
+                for name in ('since', 'until')
+            )
+        except ValueError:
+            return Response({'error': 'Invalid since/until date'}, status=status.HTTP_400_BAD_REQUEST)
+        rows = order_lines(shop, since, until)
+        content = render_csv(rows) if output == 'csv' else render_ndjson(rows)
+        content_type = 'text/csv' if output == 'csv' else 'application/x-ndjson'
+        filename = f'shop-{shop.pk}-orders.{output}'
+        if request.query_params.get('compress') == 'gzip':
+            content, content_type, filename = gzip_stream(content), 'application/gzip', f'{filename}.gz'
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
 
-class ProductViewSet(viewsets.ModelViewSet):
+
+class ProductViewSet(ReplicaReadsMixin, viewsets.ModelViewSet):
     queryset = Product.objects.select_related('shop', 'category').all()
     serializer_class = ProductSerializer
+    pagination_class = KeysetPagination
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    replica_actions = ('list', 'retrieve', 'geosearch', 'search', 'recommendations')
+    # Sorting and price filters use the stored effective price, so they run on its index.
+    listing_orderings = {'price': 'effective_price', 'created_at': 'created_at'}
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action != 'list':
+            return queryset
+        params = self.request.query_params
+        try:
+            if params.get('min_price'):
+                queryset = queryset.filter(effective_price__gte=Decimal(params['min_price']))
+            if params.get('max_price'):
+                queryset = queryset.filter(effective_price__lte=Decimal(params['max_price']))
+        except InvalidOperation:
+            raise ValidationError({'error': 'Invalid min_price/max_price'})
+        if params.get('on_sale') in ('1', 'true'):
+            queryset = queryset.filter(on_flash_sale=True)
+        ordering = params.get('ordering', '')
+        field = self.listing_orderings.get(ordering.lstrip('-'))
+        if field:
+            direction = '-' if ordering.startswith('-') else ''
+            return queryset.order_by(f'{direction}{field}', f'{direction}id')
+        return queryset.order_by('-on_flash_sale', '-created_at', '-id')
+
+    # Product payloads embed their category, so category writes change them too.
+    @catalog_condition(CATALOG_PRODUCTS, CATALOG_CATEGORIES)
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(product_values(queryset))
+        return self.get_paginated_response(product_rows(page))
+
+    @catalog_condition(CATALOG_PRODUCTS, CATALOG_CATEGORIES)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
     def perform_create(self, serializer):
-        shop_id = self.request.data.get('shop')
-        shop = ArtisanShop.objects.get(id=shop_id)
-        serializer.save(shop=shop)
+        shop = shop_cache.get(self.request.data.get('shop'))
+        if shop is None:
+            raise ValidationError({'shop': 'Invalid shop id'})
+        product = serializer.save(shop=shop)
+        schedule_flash_sale_boundaries(product)
+        invalidate_catalog_on_commit(CATALOG_PRODUCTS)
+        invalidate_dashboard_on_commit(product.shop_id)
+        invalidate_geo_tiles_on_commit(product.location)
+
+    def perform_update(self, serializer):
+        previous_location, previous_category_id = serializer.instance.location, serializer.instance.category_id
+        product = serializer.save()
+        schedule_flash_sale_boundaries(product)
+        invalidate_catalog_on_commit(CATALOG_PRODUCTS)
+        invalidate_dashboard_on_commit(product.shop_id)
+        if product.location != previous_location or product.category_id != previous_category_id:
+            invalidate_geo_tiles_on_commit(previous_location, product.location)
+
+    def perform_destroy(self, instance):
+        shop_id, location = instance.shop_id, instance.location
+        instance.delete()
+        invalidate_catalog_on_commit(CATALOG_PRODUCTS)
+        invalidate_dashboard_on_commit(shop_id)
+        invalidate_geo_tiles_on_commit(location)
 
     @action(detail=False, methods=['get'], permission_classes=[permissions.AllowAny])
     def geosearch(self, request):
         lat = request.query_params.get('lat')
         lng = request.query_params.get('lng')
-        radius = float(request.query_params.get('radius', 10))
         category_id = request.query_params.get('category')
         if not lat or not lng:
             return Response({'error': 'Missing latitude/longitude'}, status=status.HTTP_400_BAD_REQUEST)
-        point = Point(float(lng), float(lat), srid=4326)
+        try:
+            point = Point(float(lng), float(lat), srid=4326)
+            radius = float(request.query_params.get('radius', 10))
+        except ValueError:
+            return Response({'error': 'Invalid latitude/longitude/radius'}, status=status.HTTP_400_BAD_REQUEST)
         category = None
         if category_id is not None:
-            category = Category.objects.filter(pk=category_id).first()
-        products = geolocation_product_search(point, radius, category)
-        serializer = ProductSerializer(products, many=True)
-        return Response(serializer.data)
+            category = category_cache.get(category_id)
+        paginator = GeoCursorPagination()
+        products = cached_geolocation_product_search(point, radius, category, after=paginator.get_position(request))
+        page = paginator.paginate_queryset(product_values(products, 'distance'), request)
+        return paginator.get_paginated_response(product_rows(page, 'distance'))
+
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAuthenticated], url_path='import')
+    def bulk_import(self, request):
+        shop = shop_cache.get(request.query_params.get('shop'))
+        if shop is None or shop.owner_id != request.user.pk:
+            return Response({'error': 'Invalid shop id'}, status=status.HTTP_400_BAD_REQUEST)
+        content_type = request.content_type.split(';')[0].strip()
+        if content_type == 'multipart/form-data':
+            upload = request.FILES.get('file')
+            if upload is None:
+                return Response({'error': 'Missing file'}, status=status.HTTP_400_BAD_REQUEST)
+            default_format = 'csv' if upload.name.endswith('.csv') else 'ndjson'
+            lines = decode_lines(upload)
+        else:
+            # Read the raw body line by line instead of letting a parser buffer it.
+            default_format = 'csv' if content_type == 'text/csv' else 'ndjson'
+            lines = decode_lines(request._request)
+        fmt = request.query_params.get('input', default_format)
+        if fmt not in IMPORT_FORMATS:
+            return Response({'error': 'Unsupported input format'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            report = import_products(shop, read_rows(lines, fmt))
+        except (UnicodeDecodeError, csv.Error) as exc:
+            return Response({'error': f'Unreadable input: {exc}'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report.as_dict())
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.AllowAny])
+    def search(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'Missing search query'}, status=status.HTTP_400_BAD_REQUEST)
+        lat = request.query_params.get('lat')
+        lng = request.query_params.get('lng')
+        point = None
+        try:
+            if lat or lng:
+                point = Point(float(lng), float(lat), srid=4326)
+            radius = float(request.query_params.get('radius', 10))
+            limit = min(int(request.query_params.get('limit', 20)), 100)
+        except (TypeError, ValueError):
+            return Response({'error': 'Invalid latitude/longitude/radius/limit'}, status=status.HTTP_400_BAD_REQUEST)
+        category = None
+        category_id = request.query_params.get('category')
+        if category_id is not None:
+            category = category_cache.get(category_id)
+        products = search_products(query, category, point, radius)[: max(limit, 1)]
+        serializer = SearchProductSerializer(products, many=True)
+        return Response({'results': serializer.data})
 
     @action(detail=True, methods=['get'], permission_classes=[permissions.AllowAny], url_path='recommendations')
     def recommendations(self, request, pk=None):
         product = self.get_object()
-        recs = recommend_products(product)
-        serializer = ProductSerializer(recs, many=True)
-        return Response(serializer.data)
+        return Response(product_rows(recommend_products(product, project=product_values)))
 
 
 class OrderViewSet(viewsets.ModelViewSet):
     queryset = Order.objects.prefetch_related('items').select_related('shop', 'customer').all()
     serializer_class = OrderSerializer
+    pagination_class = KeysetPagination
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Order.objects.filter(customer=self.request.user)
+        return Order.objects.filter(customer=self.request.user).order_by('-created_at', '-id')
 
+    @action(detail=True, methods=['post'], url_path='status')
+    def set_status(self, request, pk=None):
+        order = Order.objects.filter(pk=pk, shop__owner=request.user).first()
+        if not order:
+            return Response({'error': 'Order not found'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            order = change_order_status(order, request.data.get('status'))
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.get_serializer(order).data)
 
-class InventoryAlertViewSet(viewsets.ViewSet):
+
+class InventoryAlertViewSet(viewsets.GenericViewSet):
+    serializer_class = InventoryAlertSerializer
+    pagination_class = InventoryAlertCursorPagination
     permission_classes = [permissions.IsAuthenticated]
 
     def list(self, request):
         shop_id = request.query_params.get('shop')
-        shop = ArtisanShop.objects.filter(pk=shop_id).first()
+        shop = shop_cache.get(shop_id)
         if not shop:
             return Response({'error': 'Invalid shop id'}, status=status.HTTP_400_BAD_REQUEST)
-        alerts = get_inventory_alerts(shop)
-        return Response(
-            [
-                {'id': a.id, 'product': a.product.name, 'quantity': a.quantity, 'triggered_at': a.triggered_at}
-                for a in alerts
-            ]
+        alerts = (
+            get_inventory_alerts(shop).select_related('product').only('id', 'quantity', 'triggered_at', 'product__name')
         )
+        page = self.paginate_queryset(alerts)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=['post'])
+    def resolve(self, request, pk=None):
+        alert = InventoryAlert.objects.select_related('shop').filter(pk=pk, shop__owner=request.user).first()
+        if not alert:
+            return Response({'error': 'Alert not found'}, status=status.HTTP_404_NOT_FOUND)
+        resolved = resolve_inventory_alerts(alert.shop, [alert.pk])
+        return Response({'resolved': resolved})
+
+
+class MetricsView(APIView):
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 
 class HealthCheckView(APIView):
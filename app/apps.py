@@ -5,3 +5,16 @@ class AppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app'
     verbose_name = 'Main Application'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_save
+
+        from app.metrics import install_query_recorder
+        from app.models import Product
+        from app.refcache import connect_signals
+        from app.services import reseed_hot_stock_on_save
+
+        connection_created.connect(install_query_recorder, dispatch_uid='app.metrics.install_query_recorder')
+        post_save.connect(reseed_hot_stock_on_save, sender=Product, dispatch_uid='app.services.reseed_hot_stock')
+        connect_signals()
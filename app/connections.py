@@ -0,0 +1,146 @@
+"""Process-wide connection pools for Redis and Postgres.
+
+``redis_pool()`` is the one Redis pool of the process. The cache reaches it through
+``SharedConnectionFactory`` (``DJANGO_REDIS_CONNECTION_FACTORY``) and the service code through
+``app.services.redis_client``, so both draw on the same ``REDIS_MAX_CONNECTIONS`` sockets. It is
+created on first use and opens sockets only when a command needs one. A forked child (a Gunicorn
+or Celery worker) resets the inherited pool before its first command, so it never writes to the
+parent's sockets.
+
+With ``DB_POOL_ENABLED`` the ``app.db`` backend checks Postgres connections out of a
+``psycopg_pool.ConnectionPool`` per database alias and process instead of connecting per request.
+The pool is created on first use and checks each connection before handing it out. Otherwise the
+backend keeps one persistent connection per thread (``DB_CONN_MAX_AGE``) with Django's health
+checks. ``pool_samples()`` reports both pools to ``app.metrics``.
+"""
+
+import os
+import threading
+
+import redis
+from django.conf import settings
+from django_redis.pool import ConnectionFactory
+
+_lock = threading.Lock()
+_redis_pool = None
+_database_pools = {}
+# Pools inherited over fork(). They stay referenced because collecting them would close sockets the parent still uses.
+_inherited_database_pools = []
+# Connections opened outside a pool since the last ``pool_samples()``, by alias.
+_unpooled_connects = {}
+
+
+class SharedConnectionPool(redis.BlockingConnectionPool):
+    """Blocking pool: when every connection is busy, callers wait up to ``REDIS_POOL_TIMEOUT`` instead of failing."""
+
+    def stats(self):
+        self._checkpid()
+        with self._lock:
+            created = len(self._connections)
+            idle = sum(1 for connection in self.pool.queue if connection is not None)
+        return {'idle': idle, 'in_use': created - idle, 'max': self.max_connections}
+
+
+def redis_url():
+    return settings.CACHES['default']['LOCATION']
+
+
+def redis_pool():
+    global _redis_pool
+    if _redis_pool is None:
+        with _lock:
+            if _redis_pool is None:
+                _redis_pool = SharedConnectionPool.from_url(
+                    redis_url(),
+                    max_connections=settings.REDIS_MAX_CONNECTIONS,
+                    timeout=settings.REDIS_POOL_TIMEOUT,
+                    health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+                    socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                    socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+                    socket_keepalive=True,
+                )
+    return _redis_pool
+
+
+class SharedConnectionFactory(ConnectionFactory):
+    """django-redis connection factory handing out ``redis_pool()`` for the shared Redis URL."""
+
+    def get_or_create_connection_pool(self, params):
+        if params['url'] == redis_url():
+            return redis_pool()
+        return super().get_or_create_connection_pool(params)
+
+
+def database_pool(wrapper, pool_options):
+    """The ``psycopg_pool.ConnectionPool`` of ``wrapper``'s database in this process."""
+    key = (wrapper.alias, wrapper.settings_dict['NAME'])
+    pool = _database_pools.get(key)
+    if pool is not None:
+        return pool
+    from psycopg_pool import ConnectionPool
+
+    with _lock:
+        pool = _database_pools.get(key)
+        if pool is None:
+            pool = _database_pools[key] = ConnectionPool(
+                kwargs=wrapper.get_connection_params(),
+                configure=wrapper.configure_pooled_connection,
+                check=ConnectionPool.check_connection,
+                name=f'{wrapper.alias}-{os.getpid()}',
+                open=True,
+                **pool_options,
+            )
+    return pool
+
+
+def record_unpooled_connect(alias):
+    with _lock:
+        _unpooled_connects[alias] = _unpooled_connects.get(alias, 0) + 1
+
+
+def pool_samples():
+    """``(counters, gauges)`` of this process's pools as ``(name, labels, value)`` triples.
+
+    Counters are increments since the previous call, gauges current values.
+    """
+    with _lock:
+        unpooled = dict(_unpooled_connects)
+        _unpooled_connects.clear()
+        pools = list(_database_pools.items())
+    counters = [('db_connections_opened_total', {'alias': alias}, count) for alias, count in unpooled.items()]
+    gauges = []
+    for (alias, _), pool in pools:
+        stats = pool.pop_stats()
+        labels = {'alias': alias}
+        counters += [
+            ('db_connections_opened_total', labels, stats.get('connections_num', 0)),
+            ('db_pool_wait_seconds_total', labels, stats.get('requests_wait_ms', 0) / 1000),
+            ('db_pool_timeouts_total', labels, stats.get('requests_errors', 0)),
+            ('db_pool_connections_lost_total', labels, stats.get('connections_lost', 0)),
+        ]
+        gauges += [
+            ('db_pool_connections', {**labels, 'state': 'idle'}, stats['pool_available']),
+            ('db_pool_connections', {**labels, 'state': 'in_use'}, stats['pool_size'] - stats['pool_available']),
+            ('db_pool_max_connections', labels, stats['pool_max']),
+            ('db_pool_requests_waiting', labels, stats['requests_waiting']),
+        ]
+    if _redis_pool is not None:
+        stats = _redis_pool.stats()
+        gauges += [
+            ('redis_pool_connections', {'state': 'idle'}, stats['idle']),
+            ('redis_pool_connections', {'state': 'in_use'}, stats['in_use']),
+            ('redis_pool_max_connections', {}, stats['max']),
+        ]
+    return counters, gauges
+
+
+def _after_fork():
+    # The Redis pool resets itself on its first use in the child; see ``ConnectionPool._checkpid``.
+    global _lock
+    _lock = threading.Lock()
+    _inherited_database_pools.extend(_database_pools.values())
+    _database_pools.clear()
+    _unpooled_connects.clear()
+
+
+os.register_at_fork(after_in_child=_after_fork)
@@ -0,0 +1,77 @@
+"""PostGIS backend that can check connections out of a ``psycopg_pool`` pool.
+
+Set ``OPTIONS['pool']`` to the ``ConnectionPool`` arguments (``min_size``, ``max_size``,
+``timeout``, ``max_idle``, ``max_lifetime``) to enable pooling. This follows the ``pool`` option of
+the PostgreSQL backend in Django 5.1, so the engine can go back to ``django.contrib.gis.db.backends.postgis``
+after an upgrade. Closing a connection returns it to the pool, so pooling requires ``CONN_MAX_AGE = 0``.
+"""
+
+import os
+
+from django.contrib.gis.db.backends.postgis.base import DatabaseWrapper as PostGISDatabaseWrapper
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.base.base import NO_DB_ALIAS
+from django.utils.asyncio import async_unsafe
+
+from app.connections import database_pool, record_unpooled_connect
+
+
+class DatabaseWrapper(PostGISDatabaseWrapper):
+    _pool_pid = None
+
+    @property
+    def pool_options(self):
+        # The connection to the 'postgres' database used by test setup is short-lived and stays unpooled.
+        if self.alias == NO_DB_ALIAS:
+            return None
+        options = self.settings_dict['OPTIONS'].get('pool')
+        if options and self.settings_dict['CONN_MAX_AGE'] != 0:
+            raise ImproperlyConfigured('Pooled connections require CONN_MAX_AGE = 0.')
+        return options
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('pool', None)
+        return params
+
+    @async_unsafe
+    def get_new_connection(self, conn_params):
+        pool_options = self.pool_options
+        if not pool_options:
+            record_unpooled_connect(self.alias)
+            return super().get_new_connection(conn_params)
+        # Mirror what the parent method records before connecting; the pool applies it to new connections.
+        self.isolation_level = self._isolation_level()
+        connection = database_pool(self, pool_options).getconn()
+        self._pool_pid = os.getpid()
+        return connection
+
+    def _isolation_level(self):
+        from psycopg import IsolationLevel
+
+        value = self.settings_dict['OPTIONS'].get('isolation_level')
+        try:
+            return IsolationLevel.READ_COMMITTED if value is None else IsolationLevel(value)
+        except ValueError:
+            raise ImproperlyConfigured(
+                f'Invalid transaction isolation level {value} specified. Use one of the psycopg.IsolationLevel values.'
+            ) from None
+
+    def configure_pooled_connection(self, connection):
+        """``configure`` callback of the pool, run once per new connection."""
+        if self.settings_dict['OPTIONS'].get('isolation_level') is not None:
+            connection.isolation_level = self._isolation_level()
+        self.register_geometry_adapters(connection)
+        # The pool returns connections in their last autocommit state; leave them idle and committed.
+        connection.commit()
+
+    def _close(self):
+        if self._pool_pid is None or self.connection is None:
+            return super()._close()
+        pid, self._pool_pid = self._pool_pid, None
+        if pid != os.getpid():
+            # Checked out by the parent before a fork: the socket is the parent's, so only drop the reference.
+            return None
+        with self.wrap_database_errors:
+            self.connection._pool.putconn(self.connection)
+        return None
@@ -0,0 +1,287 @@
+"""Geohash-tiled result cache in front of ``geolocation_product_search``.
+
+A query is mapped to the geohash cell containing its point, at a precision picked from its radius
+bucket. The tile stores the ids and coordinates of every product within the bucket radius of
+*any* point of the cell, so each query in the cell can be answered by filtering the tile in
+process and loading only the page it returns by primary key. Tiles are indexed by the coarse
+cells their candidate area covers and dropped when a product appears, moves, changes category
+or disappears inside one of them.
+
+Tiles may be filled from a replica. A coarse cell is flagged as changed for
+``REPLICA_PIN_SECONDS`` after its tiles are dropped, and a tile covering a flagged cell before or
+after its query is returned without being cached, so a lagging replica never refills a dropped
+tile with the rows it replaced.
+"""
+
+import json
+import math
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.gis.geos import Point
+from django.db import transaction
+
+from .models import Product
+from .services import async_redis, geolocation_product_search, redis_client
+
+GEO_TILE_KEY = 'geo-tile:{}:{}:{}'
+GEO_TILE_INDEX_KEY = 'geo-tile-index:{}'
+GEO_TILE_CHANGED_KEY = 'geo-tile-changed:{}'
+# Cached in place of a tile with more than ``GEOSEARCH_TILE_MAX_CANDIDATES`` candidates.
+GEO_TILE_OVERFLOW = 'null'
+GEO_TILE_INDEX_PRECISION = 4
+
+# (largest radius in km, geohash precision of the tiles serving it)
+RADIUS_BUCKETS = [(1, 6), (2, 6), (5, 5), (10, 5), (25, 4), (50, 4)]
+
+EARTH_RADIUS_M = 6371008.8
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def geohash_encode(lng, lat, precision):
+    lng_range = [-180.0, 180.0]
+    lat_range = [-90.0, 90.0]
+    chars = []
+    bits = bit_count = 0
+    use_lng = True
+    while len(chars) < precision:
+        value, bounds = (lng, lng_range) if use_lng else (lat, lat_range)
+        mid = (bounds[0] + bounds[1]) / 2
+        if value >= mid:
+            bits = bits * 2 + 1
+            bounds[0] = mid
+        else:
+            bits *= 2
+            bounds[1] = mid
+        use_lng = not use_lng
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits = bit_count = 0
+    return ''.join(chars)
+
+
+def geohash_bounds(geohash):
+    """Return ``(min_lng, min_lat, max_lng, max_lat)`` of a geohash cell."""
+    lng_range = [-180.0, 180.0]
+    lat_range = [-90.0, 90.0]
+    use_lng = True
+    for char in geohash:
+        value = _BASE32.index(char)
+        for shift in range(4, -1, -1):
+            bounds = lng_range if use_lng else lat_range
+            mid = (bounds[0] + bounds[1]) / 2
+            if value >> shift & 1:
+                bounds[0] = mid
+            else:
+                bounds[1] = mid
+            use_lng = not use_lng
+    return lng_range[0], lat_range[0], lng_range[1], lat_range[1]
+
+
+def geohash_cells_in_bbox(min_lng, min_lat, max_lng, max_lat, precision):
+    lng_bits = math.ceil(precision * 5 / 2)
+    lat_bits = precision * 5 - lng_bits
+    width = 360.0 / 2**lng_bits
+    height = 180.0 / 2**lat_bits
+    min_lng, max_lng = max(min_lng, -180.0), min(max_lng, 180.0 - 1e-9)
+    min_lat, max_lat = max(min_lat, -90.0), min(max_lat, 90.0 - 1e-9)
+    cells = set()
+    lat = min_lat
+    while True:
+        lng = min_lng
+        while True:
+            cells.add(geohash_encode(lng, lat, precision))
+            if lng >= max_lng:
+                break
+            lng = min(lng + width, max_lng)
+        if lat >= max_lat:
+            break
+        lat = min(lat + height, max_lat)
+    return cells
+
+
+def haversine_m(lng1, lat1, lng2, lat2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def _radius_bucket(radius_km):
+    for bucket, precision in RADIUS_BUCKETS:
+        if radius_km <= bucket:
+            return bucket, precision
+    return None, None
+
+
+class TileResults:
+    """Sorted ``(distance, id)`` hits that load ``Product`` rows only for the slice taken.
+
+    Slicing narrows the hits; rows are loaded when the slice is iterated, with ``async for`` too.
+    ``values()`` switches the rows loaded to dicts, like ``QuerySet.values``.
+    """
+
+    def __init__(self, hits, values=None):
+        self.hits = hits
+        self.values_queryset = values
+
+    def __len__(self):
+        return len(self.hits)
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            raise TypeError('TileResults only supports slicing')
+        return TileResults(self.hits[key], self.values_queryset)
+
+    def __iter__(self):
+        return iter(self._ordered(list(self._queryset())))
+
+    async def __aiter__(self):
+        for row in self._ordered([row async for row in self._queryset()]):
+            yield row
+
+    def values(self, *fields, **expressions):
+        fields = [field for field in fields if field != 'distance']
+        return TileResults(self.hits, Product.objects.values(*fields, **expressions))
+
+    def _queryset(self):
+        ids = [pk for _, pk in self.hits]
+        if self.values_queryset is not None:
+            return self.values_queryset.filter(pk__in=ids)
+        return Product.objects.select_related('shop', 'category').filter(pk__in=ids)
+
+    def _ordered(self, loaded):
+        """Put ``loaded`` rows in hit order, with their distance, skipping products gone since."""
+        if self.values_queryset is not None:
+            by_pk = {row['id']: row for row in loaded}
+        else:
+            by_pk = {product.pk: product for product in loaded}
+        rows = []
+        for distance, pk in self.hits:
+            row = by_pk.get(pk)
+            if row is None:
+                continue
+            if self.values_queryset is not None:
+                row['distance'] = distance
+            else:
+                row.distance = distance
+            rows.append(row)
+        return rows
+
+
+def cached_geolocation_product_search(point, radius_km=10, category=None, after=None):
+    """Drop-in for ``geolocation_product_search`` answered from geohash tiles when possible."""
+    bucket, precision = _radius_bucket(radius_km)
+    if bucket is None:
+        return geolocation_product_search(point, radius_km, category, after=after)
+    tile_key, cell = _tile_key(point, category, bucket, precision)
+    raw_tile = redis_client.get(tile_key)
+    candidates = json.loads(raw_tile) if raw_tile else _build_tile(tile_key, cell, bucket, category)
+    if candidates is None:
+        return geolocation_product_search(point, radius_km, category, after=after)
+    return _tile_results(candidates, point, radius_km, after)
+
+
+async def acached_geolocation_product_search(point, radius_km=10, category=None, after=None):
+    """Async ``cached_geolocation_product_search``; iterate the result with ``async for``.
+
+    Tiles are read with the async Redis client. Building a missing tile is rare and runs in a
+    worker thread.
+    """
+    bucket, precision = _radius_bucket(radius_km)
+    if bucket is None:
+        return geolocation_product_search(point, radius_km, category, after=after)
+    tile_key, cell = _tile_key(point, category, bucket, precision)
+    raw_tile = await async_redis().get(tile_key)
+    if raw_tile:
+        candidates = json.loads(raw_tile)
+    else:
+        candidates = await sync_to_async(_build_tile)(tile_key, cell, bucket, category)
+    if candidates is None:
+        return geolocation_product_search(point, radius_km, category, after=after)
+    return _tile_results(candidates, point, radius_km, after)
+
+
+def _tile_key(point, category, bucket, precision):
+    cell = geohash_encode(point.x, point.y, precision)
+    return GEO_TILE_KEY.format(cell, category.pk if category else 'all', bucket), cell
+
+
+def _tile_results(candidates, point, radius_km, after):
+    radius_m = radius_km * 1000
+    hits = []
+    for pk, lng, lat in candidates:
+        distance = haversine_m(point.x, point.y, lng, lat)
+        if distance <= radius_m and (after is None or (distance, pk) > after):
+            hits.append((distance, pk))
+    hits.sort()
+    return TileResults(hits)
+
+
+def _build_tile(tile_key, cell, bucket, category):
+    min_lng, min_lat, max_lng, max_lat = geohash_bounds(cell)
+    center_lng, center_lat = (min_lng + max_lng) / 2, (min_lat + max_lat) / 2
+    reach_m = bucket * 1000 + haversine_m(center_lng, center_lat, max_lng, max_lat)
+    limit = settings.GEOSEARCH_TILE_MAX_CANDIDATES
+    d_lat = math.degrees(reach_m / EARTH_RADIUS_M)
+    d_lng = d_lat / max(math.cos(math.radians(center_lat)), 0.01)
+    coarse_cells = geohash_cells_in_bbox(
+        center_lng - d_lng, center_lat - d_lat, center_lng + d_lng, center_lat + d_lat, GEO_TILE_INDEX_PRECISION
+    )
+    changed_keys = [GEO_TILE_CHANGED_KEY.format(coarse_cell) for coarse_cell in coarse_cells]
+    changed = redis_client.exists(*changed_keys)
+    rows = list(
+        geolocation_product_search(Point(center_lng, center_lat, srid=4326), reach_m / 1000, category).values_list(
+            'id', 'location'
+        )[: limit + 1]
+    )
+    if len(rows) > limit:
+        # Dense cells go straight to the direct search until the marker expires.
+        redis_client.set(tile_key, GEO_TILE_OVERFLOW, ex=settings.GEOSEARCH_TILE_OVERFLOW_TTL)
+        return None
+    candidates = [[pk, location.x, location.y] for pk, location in rows]
+    if changed or redis_client.exists(*changed_keys):
+        return candidates
+    ttl = settings.GEOSEARCH_TILE_CACHE_TTL
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.set(tile_key, json.dumps(candidates), ex=ttl)
+    for coarse_cell in coarse_cells:
+        index_key = GEO_TILE_INDEX_KEY.format(coarse_cell)
+        pipe.sadd(index_key, tile_key)
+        pipe.expire(index_key, ttl)
+    pipe.execute()
+    return candidates
+
+
+def invalidate_geo_tiles(*locations):
+    """Drop every cached tile whose candidate area covers one of ``locations``."""
+    invalidate_geo_tile_cells(
+        *{
+            geohash_encode(location.x, location.y, GEO_TILE_INDEX_PRECISION)
+            for location in locations
+            if location is not None
+        }
+    )
+
+
+def invalidate_geo_tile_cells(*cells):
+    """Drop every cached tile indexed under one of the ``GEO_TILE_INDEX_PRECISION`` geohash ``cells``."""
+    index_keys = {GEO_TILE_INDEX_KEY.format(cell) for cell in cells}
+    if not index_keys:
+        return
+    pipe = redis_client.pipeline(transaction=False)
+    for index_key in index_keys:
+        pipe.smembers(index_key)
+    tile_keys = set().union(*pipe.execute())
+    pipe.delete(*index_keys, *tile_keys)
+    if settings.DATABASE_REPLICAS:
+        for cell in cells:
+            pipe.set(GEO_TILE_CHANGED_KEY.format(cell), 1, ex=settings.REPLICA_PIN_SECONDS)
+    pipe.execute()
+
+
+def invalidate_geo_tiles_on_commit(*locations):
+    if any(location is not None for location in locations):
+        transaction.on_commit(lambda: invalidate_geo_tiles(*locations))
@@ -0,0 +1,289 @@
+"""Bulk product import for artisans from streaming CSV or NDJSON.
+
+Rows are read lazily and validated in chunks of ``PRODUCT_IMPORT_CHUNK_SIZE``. Category names are
+resolved once per chunk, and valid rows are streamed with ``COPY`` into a temporary staging table.
+Once the input is exhausted, a single ``INSERT ... ON CONFLICT (shop_id, sku)`` upserts the staged
+rows into ``Product``; when a SKU appears twice, the last row wins. Memory use depends on the chunk
+size and the capped error report, not on the size of the input.
+"""
+
+import csv
+import json
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .geotiles import GEO_TILE_INDEX_PRECISION, invalidate_geo_tile_cells
+from .models import Category, Product
+from .services import (
+    CATALOG_PRODUCTS,
+    invalidate_catalog_on_commit,
+    invalidate_dashboard_on_commit,
+    seed_hot_stock,
+)
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+
+STAGING_COLUMNS = (
+    'row_number',
+    'sku',
+    'name',
+    'description',
+    'price',
+    'quantity',
+    'category_id',
+    'location',
+    'flash_sale_price',
+    'flash_sale_start',
+    'flash_sale_end',
+)
+
+MAX_PRICE = Decimal('99999999.99')
+MAX_QUANTITY = 2147483647
+
+
+@dataclass
+class ImportReport:
+    created: int = 0
+    updated: int = 0
+    error_count: int = 0
+    errors: list = field(default_factory=list)
+
+    def add_error(self, row_number, errors):
+        self.error_count += 1
+        if len(self.errors) < settings.PRODUCT_IMPORT_MAX_ERRORS:
+            self.errors.append({'row': row_number, 'errors': errors})
+
+    def as_dict(self):
+        return {
+            'created': self.created,
+            'updated': self.updated,
+            'error_count': self.error_count,
+            'errors': self.errors,
+        }
+
+
+def read_rows(lines, fmt):
+    """Yield ``(row_number, row)`` from an iterable of text lines in ``fmt``; bad lines yield an error string."""
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        for row_number, row in enumerate(reader, start=1):
+            yield row_number, row
+        return
+    for row_number, line in enumerate((line for line in lines if line.strip()), start=1):
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield row_number, 'Invalid JSON'
+            continue
+        yield row_number, row if isinstance(row, dict) else 'Expected a JSON object'
+
+
+def decode_lines(chunks, encoding='utf-8'):
+    """Decode an iterable of byte lines (an upload or a request body) without reading it all."""
+    for line in chunks:
+        yield line.decode(encoding) if isinstance(line, bytes) else line
+
+
+def import_products(shop, rows):
+    """Validate and upsert ``(row_number, row)`` pairs into ``shop``'s catalog; return an ``ImportReport``."""
+    report = ImportReport()
+    categories = {}
+    chunk_size = settings.PRODUCT_IMPORT_CHUNK_SIZE
+    rows = iter(rows)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE TEMP TABLE product_import_staging ('
+            'row_number integer, sku varchar(64), name varchar(255), description text, price numeric(10, 2), '
+            'quantity integer, category_id bigint, location geometry(Point, 4326), flash_sale_price numeric(10, 2), '
+            'flash_sale_start timestamptz, flash_sale_end timestamptz) ON COMMIT DROP'
+        )
+        staged = 0
+        while chunk := list(islice(rows, chunk_size)):
+            valid = _validate_chunk(chunk, categories, report)
+            if valid:
+                with cursor.copy(f'COPY product_import_staging ({", ".join(STAGING_COLUMNS)}) FROM STDIN') as copy:
+                    for values in valid:
+                        copy.write_row(values)
+                staged += len(valid)
+        if staged:
+            _upsert(cursor, shop, report)
+        cursor.execute('DROP TABLE product_import_staging')
+    return report
+
+
+def _validate_chunk(chunk, categories, report):
+    parsed = []
+    for row_number, row in chunk:
+        if isinstance(row, str):
+            report.add_error(row_number, {'row': row})
+            continue
+        values, errors = _parse_row(row)
+        if errors:
+            report.add_error(row_number, errors)
+        else:
+            parsed.append((row_number, values))
+    _resolve_categories({values['category'] for _, values in parsed}, categories)
+    valid = []
+    for row_number, values in parsed:
+        category_id = categories.get(values.pop('category'))
+        if category_id is None:
+            report.add_error(row_number, {'category': 'Unknown category'})
+            continue
+        values['category_id'] = category_id
+        valid.append((row_number, *(values[column] for column in STAGING_COLUMNS[1:])))
+    return valid
+
+
+def _resolve_categories(keys, categories):
+    """Map category names and ids of a chunk to ids with one query for those not seen yet."""
+    missing = keys - categories.keys()
+    names = {key for key in missing if isinstance(key, str)}
+    ids = {key for key in missing if isinstance(key, int)}
+    if names or ids:
+        for category_id in Category.objects.filter(pk__in=ids).values_list('id', flat=True):
+            categories[category_id] = category_id
+        for category_id, name in Category.objects.filter(name__in=names).values_list('id', 'name'):
+            categories[name] = category_id
+        for key in missing:
+            categories.setdefault(key, None)
+
+
+def _text(row, key):
+    value = row.get(key)
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _parse_row(row):
+    values, errors = {}, {}
+    for key, max_length, required in (('sku', 64, True), ('name', 255, True)):
+        value = _text(row, key)
+        if value is None and required:
+            errors[key] = 'This field is required.'
+        elif value is not None and len(value) > max_length:
+            errors[key] = f'Ensure this field has no more than {max_length} characters.'
+        values[key] = value
+    values['description'] = _text(row, 'description')
+    values['price'] = _parse_price(row, 'price', errors, required=True)
+    quantity = _text(row, 'quantity')
+    try:
+        values['quantity'] = int(quantity) if quantity is not None else 0
+        if not 0 <= values['quantity'] <= MAX_QUANTITY:
+            raise ValueError
+    except ValueError:
+        errors['quantity'] = 'A valid non-negative integer is required.'
+    category_id, category = _text(row, 'category_id'), _text(row, 'category')
+    if category_id is not None:
+        if not category_id.isdigit():
+            errors['category_id'] = 'A valid integer is required.'
+        values['category'] = int(category_id) if category_id.isdigit() else None
+    elif category is not None:
+        values['category'] = category
+    else:
+        errors['category'] = 'Either category or category_id is required.'
+    values['location'] = _parse_location(row, errors)
+    values['flash_sale_price'] = _parse_price(row, 'flash_sale_price', errors, required=False)
+    values['flash_sale_start'] = _parse_moment(row, 'flash_sale_start', errors)
+    values['flash_sale_end'] = _parse_moment(row, 'flash_sale_end', errors)
+    sale = [values['flash_sale_price'], values['flash_sale_start'], values['flash_sale_end']]
+    if not errors and any(value is not None for value in sale):
+        if any(value is None for value in sale):
+            errors['flash_sale'] = 'flash_sale_price, flash_sale_start and flash_sale_end go together'
+        elif values['flash_sale_start'] >= values['flash_sale_end']:
+            errors['flash_sale'] = 'flash_sale_start must be before flash_sale_end'
+    return values, errors
+
+
+def _parse_price(row, key, errors, required):
+    value = _text(row, key)
+    if value is None:
+        if required:
+            errors[key] = 'This field is required.'
+        return None
+    try:
+        price = Decimal(value).quantize(Decimal('0.01'))
+        if not 0 <= price <= MAX_PRICE:
+            raise InvalidOperation
+    except InvalidOperation:
+        errors[key] = 'A valid non-negative amount is required.'
+        return None
+    return price
+
+
+def _parse_moment(row, key, errors):
+    value = _text(row, key)
+    if value is None:
+        return None
+    moment = parse_datetime(value)
+    if moment is None:
+        errors[key] = 'A valid ISO 8601 datetime is required.'
+        return None
+    return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+
+
+def _parse_location(row, errors):
+    lat, lng = _text(row, 'lat'), _text(row, 'lng')
+    if lat is None and lng is None:
+        return None
+    try:
+        lat, lng = float(lat), float(lng)
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            raise ValueError
+    except (TypeError, ValueError):
+        errors['location'] = 'lat and lng must be valid coordinates.'
+        return None
+    return f'SRID=4326;POINT({lng!r} {lat!r})'
+
+
+def _upsert(cursor, shop, report):
+    table = connection.ops.quote_name(Product._meta.db_table)
+    now = timezone.now()
+    # Geohash cells of the locations about to be replaced, so their cached geosearch tiles are dropped too.
+    cursor.execute(
+        f'SELECT DISTINCT ST_GeoHash(p.location, %s) FROM {table} p JOIN product_import_staging s '
+        f'ON p.shop_id = %s AND p.sku = s.sku WHERE p.location IS NOT NULL',
+        [GEO_TILE_INDEX_PRECISION, shop.pk],
+    )
+    cells = {row[0] for row in cursor.fetchall()}
+    cursor.execute(
+        f'WITH upserted AS ('
+        f'INSERT INTO {table} (shop_id, sku, name, description, price, quantity, category_id, location, is_hot, '
+        f'flash_sale_price, flash_sale_start, flash_sale_end, on_flash_sale, effective_price, created_at, updated_at) '
+        f'SELECT %(shop)s, sku, name, description, price, quantity, category_id, location, false, '
+        f'flash_sale_price, flash_sale_start, flash_sale_end, on_sale, '
+        f'CASE WHEN on_sale THEN flash_sale_price ELSE price END, %(now)s, %(now)s '
+        f'FROM (SELECT DISTINCT ON (sku) *, '
+        f'coalesce(flash_sale_start <= %(now)s AND %(now)s < flash_sale_end, false) AS on_sale '
+        f'FROM product_import_staging ORDER BY sku, row_number DESC) AS staged '
+        f'ON CONFLICT (shop_id, sku) DO UPDATE SET name = EXCLUDED.name, description = EXCLUDED.description, '
+        f'price = EXCLUDED.price, quantity = EXCLUDED.quantity, category_id = EXCLUDED.category_id, '
+        f'location = EXCLUDED.location, flash_sale_price = EXCLUDED.flash_sale_price, '
+        f'flash_sale_start = EXCLUDED.flash_sale_start, flash_sale_end = EXCLUDED.flash_sale_end, '
+        f'on_flash_sale = EXCLUDED.on_flash_sale, effective_price = EXCLUDED.effective_price, '
+        f'updated_at = EXCLUDED.updated_at '
+        f'RETURNING (xmax = 0) AS inserted, ST_GeoHash(location, %(precision)s) AS cell) '
+        f'SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted), '
+        f'array_agg(DISTINCT cell) FILTER (WHERE cell IS NOT NULL) FROM upserted',
+        {'shop': shop.pk, 'now': now, 'precision': GEO_TILE_INDEX_PRECISION},
+    )
+    report.created, report.updated, new_cells = cursor.fetchone()
+    cells.update(new_cells or ())
+    if settings.INVENTORY_RESERVATIONS_ENABLED:
+        hot_products = Product.objects.filter(
+            shop=shop, is_hot=True, sku__in=RawSQL('SELECT sku FROM product_import_staging', [])
+        ).only('id', 'quantity')
+        for product in hot_products:
+            transaction.on_commit(lambda product=product: seed_hot_stock(product, overwrite=True))
+    invalidate_catalog_on_commit(CATALOG_PRODUCTS)
+    invalidate_dashboard_on_commit(shop.pk)
+    if cells:
+        transaction.on_commit(lambda: invalidate_geo_tile_cells(*cells))
@@ -0,0 +1,32 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+
+from app.models import Order
+from app.rollups import iter_month_ranges, rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily sales rollups from the raw completed orders, one month per transaction.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=date.fromisoformat, help='First day to rebuild (YYYY-MM-DD).')
+        parser.add_argument('--until', type=date.fromisoformat, help='Day after the last one to rebuild.')
+        parser.add_argument('--shop', type=int, action='append', dest='shops', help='Restrict to a shop id.')
+
+    def handle(self, *args, since=None, until=None, shops=None, **options):
+        until = until or timezone.localdate() + timedelta(days=1)
+        if since is None:
+            first_order = Order.objects.aggregate(first=Min('created_at'))['first']
+            if first_order is None:
+                self.stdout.write('No orders to backfill.')
+                return
+            since = timezone.localdate(first_order)
+        if since >= until:
+            raise CommandError('--since must be before --until')
+        for start, end in iter_month_ranges(since, until):
+            rebuild_rollups(start, end, shop_ids=shops)
+            self.stdout.write(f'Rebuilt {start} to {end}')
+        self.stdout.write(self.style.SUCCESS('Sales rollups backfilled.'))
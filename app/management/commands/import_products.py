@@ -0,0 +1,34 @@
+import sys
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.imports import IMPORT_FORMATS, decode_lines, import_products, read_rows
+from app.models import ArtisanShop
+
+
+class Command(BaseCommand):
+    help = 'Upsert products into a shop from a CSV or NDJSON file, keyed on SKU.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import, or - for standard input.')
+        parser.add_argument('--shop', type=int, required=True, help='Shop id to import into.')
+        parser.add_argument('--format', choices=IMPORT_FORMATS, help='Input format; defaults to the file extension.')
+
+    def handle(self, *args, path, shop, format=None, **options):
+        shop = ArtisanShop.objects.filter(pk=shop).first()
+        if shop is None:
+            raise CommandError('Unknown shop')
+        fmt = format or ('csv' if Path(path).suffix == '.csv' else 'ndjson')
+        if path == '-':
+            report = import_products(shop, read_rows(decode_lines(sys.stdin), fmt))
+        else:
+            with open(path, encoding='utf-8', newline='') as lines:
+                report = import_products(shop, read_rows(lines, fmt))
+        for error in report.errors:
+            self.stderr.write(f'Row {error["row"]}: {error["errors"]}')
+        if report.error_count > len(report.errors):
+            self.stderr.write(f'... {report.error_count - len(report.errors)} more rejected rows')
+        self.stdout.write(
+            self.style.SUCCESS(f'{report.created} created, {report.updated} updated, {report.error_count} rejected.')
+        )
@@ -0,0 +1,45 @@
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from app.partitions import ensure_partitions, maintain_order_partitions
+
+
+class Command(BaseCommand):
+    help = (
+        'Create the monthly Order and OrderItem partitions of the coming months and detach the months past '
+        'ORDER_RETENTION_MONTHS into the archive schema (or drop them).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months-ahead',
+            type=int,
+            default=settings.ORDER_PARTITION_MONTHS_AHEAD,
+            help='Months after the current one to create partitions for.',
+        )
+        parser.add_argument(
+            '--retention-months',
+            type=int,
+            default=settings.ORDER_RETENTION_MONTHS,
+            help='Months kept in the live tables, the current one included; 0 keeps every month.',
+        )
+        parser.add_argument(
+            '--drop', action='store_true', default=settings.ORDER_ARCHIVE_DROP, help='Drop archived months.'
+        )
+        parser.add_argument(
+            '--since', type=date.fromisoformat, help='Also create partitions back to this day (YYYY-MM-DD).'
+        )
+
+    def handle(self, *args, months_ahead, retention_months, drop, since=None, **options):
+        if months_ahead < 0 or retention_months < 0:
+            raise CommandError('--months-ahead and --retention-months must not be negative')
+        created = ensure_partitions(since, timezone.now()) if since else []
+        more, archived = maintain_order_partitions(months_ahead, retention_months, drop)
+        for name in created + more:
+            self.stdout.write(f'Created {name}')
+        for month in archived:
+            self.stdout.write(f'{"Dropped" if drop else "Archived"} orders of {month:%Y-%m}')
+        self.stdout.write(self.style.SUCCESS('Order partitions maintained.'))
@@ -0,0 +1,88 @@
+import os
+import time
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from app.rollups import discard_rollup_changes, iter_month_ranges, rebuild_rollups
+from app.seeding import (
+    SeedSizes,
+    create_categories,
+    make_plan,
+    marketplace_is_empty,
+    reset_marketplace,
+    seed_marketplace,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a deterministic synthetic marketplace (users, shops, products, orders, order items, deliveries '
+        'and inventory alerts) with NumPy and load it with COPY. --scale 1 makes about a million order items.'
+    )
+
+    def add_arguments(self, parser):
+        defaults = SeedSizes()
+        parser.add_argument('--seed', type=int, default=42, help='Random seed; the same seed gives the same data.')
+        parser.add_argument('--scale', type=float, default=1.0, help='Multiplier applied to the default sizes.')
+        parser.add_argument('--customers', type=int, help=f'Customers (default {defaults.customers} x scale).')
+        parser.add_argument('--shops', type=int, help=f'Shops, one per artisan (default {defaults.shops} x scale).')
+        parser.add_argument('--products', type=int, help=f'Products (default {defaults.products} x scale).')
+        parser.add_argument('--orders', type=int, help=f'Orders (default {defaults.orders} x scale).')
+        parser.add_argument('--items-per-order', type=float, default=defaults.items_per_order)
+        parser.add_argument('--history-days', type=int, default=defaults.history_days, help='Days of order history.')
+        parser.add_argument('--chunk-size', type=int, default=100000, help='Rows generated and copied per chunk.')
+        parser.add_argument(
+            '--workers', type=int, default=min(os.cpu_count() or 1, 8), help='Processes loading chunks in parallel.'
+        )
+        parser.add_argument('--reset', action='store_true', help='Truncate every app table and clear the cache first.')
+
+    def handle(self, *args, seed, scale, reset, chunk_size, workers, **options):
+        scaled = SeedSizes().scaled(scale)
+        sizes = SeedSizes(
+            customers=options['customers'] if options['customers'] is not None else scaled.customers,
+            shops=options['shops'] if options['shops'] is not None else scaled.shops,
+            products=options['products'] if options['products'] is not None else scaled.products,
+            orders=options['orders'] if options['orders'] is not None else scaled.orders,
+            items_per_order=options['items_per_order'],
+            history_days=options['history_days'],
+        )
+        if chunk_size < 1 or workers < 1:
+            raise CommandError('--chunk-size and --workers must be positive')
+        if reset:
+            reset_marketplace()
+        elif not marketplace_is_empty():
+            raise CommandError('The database already holds marketplace data; rerun with --reset to replace it')
+
+        started = time.perf_counter()
+        try:
+            plan = make_plan(seed, sizes, create_categories(), timezone.now().timestamp())
+        except ValueError as exc:
+            raise CommandError(str(exc)) from exc
+        self.stdout.write(
+            f'Seeding {sizes.customers} customers, {sizes.shops} shops, {sizes.products} products and '
+            f'{sizes.orders} orders with {workers} worker(s)'
+        )
+        loaded = {}
+
+        def progress(phase, counts):
+            for label, rows in counts.items():
+                loaded[label] = loaded.get(label, 0) + rows
+            summary = ', '.join(f'{label.split(".")[-1]} {rows}' for label, rows in loaded.items())
+            self.stdout.write(f'  [{time.perf_counter() - started:7.1f}s] {phase}: {summary}')
+
+        totals = seed_marketplace(plan, chunk_size=chunk_size, workers=workers, progress=progress)
+
+        today = timezone.localdate()
+        for start, end in iter_month_ranges(today - timedelta(days=sizes.history_days + 1), today + timedelta(days=1)):
+            rebuild_rollups(start, end)
+        discard_rollup_changes()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        # Cached catalog pages, dashboards and stock counters describe the data that was replaced.
+        cache.clear()
+        rows = ', '.join(f'{rows} {label.split(".")[-1]}' for label, rows in totals.items())
+        self.stdout.write(self.style.SUCCESS(f'Seeded {rows} in {time.perf_counter() - started:.1f}s.'))
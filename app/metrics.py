@@ -0,0 +1,397 @@
+"""Per-route request metrics shared by every worker process through Redis.
+
+``RequestMetricsMiddleware`` opens a ``RequestStats`` for each request. The request's SQL goes
+through the execute wrapper added to every database connection, its Redis round trips through the
+``InstrumentedRedis`` clients, and serialization through ``timed_serialization``; each reports into
+the stats of the current context (copied into ``sync_to_async`` threads as well). At the end of
+the request its samples are folded into a per-process buffer. The buffer is flushed into the
+``METRICS_KEY`` hash in one pipeline every ``METRICS_FLUSH_INTERVAL`` seconds, so the
+totals add up across processes and hosts without a collector, and ``render_metrics`` prints the
+hash in the Prometheus text format. Each flush also adds the counters of the process's connection
+pools (``app.connections.pool_samples``) and replaces its pool gauges in a per-process hash that
+expires when the process stops flushing; gauges are summed over processes when rendered.
+
+Requests slower than ``METRICS_SLOW_REQUEST_SECONDS`` are logged, sampled at
+``METRICS_SLOW_REQUEST_SAMPLE_RATE``, with their most expensive queries.
+"""
+
+import atexit
+import json
+import logging
+import os
+import random
+import re
+import socket
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+import redis
+import redis.asyncio
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .connections import pool_samples, redis_pool
+
+logger = logging.getLogger(__name__)
+
+METRICS_KEY = 'metrics:samples'
+GAUGES_KEY_PREFIX = 'metrics:gauges:'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# name: (type, help); histograms also get their _bucket, _sum and _count series.
+METRIC_FAMILIES = {
+    'http_request_duration_seconds': ('histogram', 'Request latency by route, method and status.'),
+    'http_request_db_queries_total': ('counter', 'SQL queries issued by requests, by route.'),
+    'http_request_db_seconds_total': ('counter', 'Time spent executing SQL, by route.'),
+    'http_request_redis_calls_total': ('counter', 'Redis round trips (commands or pipelines), by route.'),
+    'http_request_redis_seconds_total': ('counter', 'Time spent in Redis round trips, by route.'),
+    'http_request_serializer_seconds_total': ('counter', 'Time spent serializing responses, by route.'),
+    'db_connections_opened_total': ('counter', 'Postgres connections opened, by database alias.'),
+    'db_pool_connections': ('gauge', 'Pooled Postgres connections by state.'),
+    'db_pool_max_connections': ('gauge', 'Maximum size of the Postgres pools.'),
+    'db_pool_requests_waiting': ('gauge', 'Requests waiting for a pooled Postgres connection.'),
+    'db_pool_wait_seconds_total': ('counter', 'Time spent waiting for a pooled Postgres connection.'),
+    'db_pool_timeouts_total': ('counter', 'Requests that timed out waiting for a pooled Postgres connection.'),
+    'db_pool_connections_lost_total': ('counter', 'Pooled Postgres connections found broken and discarded.'),
+    'redis_pool_connections': ('gauge', 'Connections of the shared Redis pools by state.'),
+    'redis_pool_max_connections': ('gauge', 'Maximum size of the shared Redis pools.'),
+}
+
+SLOW_REQUEST_TOP_QUERIES = 5
+
+_current = ContextVar('request_stats', default=None)
+
+
+class RequestStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.queries = defaultdict(lambda: [0, 0.0])
+        self.query_count = 0
+        self.query_time = 0.0
+        self.redis_calls = 0
+        self.redis_time = 0.0
+        self.serializer_time = 0.0
+        self.serializing = False
+
+    def add_query(self, sql, elapsed):
+        with self.lock:
+            self.query_count += 1
+            self.query_time += elapsed
+            entry = self.queries[sql]
+            entry[0] += 1
+            entry[1] += elapsed
+
+    def add_redis_call(self, elapsed):
+        with self.lock:
+            self.redis_calls += 1
+            self.redis_time += elapsed
+
+    def top_queries(self, limit=SLOW_REQUEST_TOP_QUERIES):
+        ranked = sorted(self.queries.items(), key=lambda item: -item[1][1])[:limit]
+        return [{'sql': sql[:500], 'count': count, 'seconds': round(elapsed, 6)} for sql, (count, elapsed) in ranked]
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper timing every query of the current request."""
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add_query(sql, time.perf_counter() - start)
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """``connection_created`` receiver; the wrapper list outlives reconnects, so it is added once."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def timed_serialization():
+    """Count the enclosed time as serialization; nested serializers are covered by the outermost one."""
+    stats = _current.get()
+    if stats is None or stats.serializing:
+        yield
+        return
+    stats.serializing = True
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.serializer_time += time.perf_counter() - start
+        stats.serializing = False
+
+
+class InstrumentedRedis(redis.Redis):
+    """``redis.Redis`` reporting each command, and each pipeline as one round trip, to the current request."""
+
+    def execute_command(self, *args, **options):
+        stats = _current.get()
+        if stats is None:
+            return super().execute_command(*args, **options)
+        start = time.perf_counter()
+        try:
+            return super().execute_command(*args, **options)
+        finally:
+            stats.add_redis_call(time.perf_counter() - start)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        pipe = super().pipeline(transaction, shard_hint)
+        execute = pipe.execute
+
+        @wraps(execute)
+        def timed_execute(*args, **kwargs):
+            stats = _current.get()
+            if stats is None:
+                return execute(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return execute(*args, **kwargs)
+            finally:
+                stats.add_redis_call(time.perf_counter() - start)
+
+        pipe.execute = timed_execute
+        return pipe
+
+
+class AsyncInstrumentedRedis(redis.asyncio.Redis):
+    """``InstrumentedRedis`` for ``redis.asyncio``."""
+
+    async def execute_command(self, *args, **options):
+        stats = _current.get()
+        if stats is None:
+            return await super().execute_command(*args, **options)
+        start = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            stats.add_redis_call(time.perf_counter() - start)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        pipe = super().pipeline(transaction, shard_hint)
+        execute = pipe.execute
+
+        @wraps(execute)
+        async def timed_execute(*args, **kwargs):
+            stats = _current.get()
+            if stats is None:
+                return await execute(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return await execute(*args, **kwargs)
+            finally:
+                stats.add_redis_call(time.perf_counter() - start)
+
+        pipe.execute = timed_execute
+        return pipe
+
+
+class _Buffer:
+    """Samples of this process not yet added to ``METRICS_KEY``, flushed by a background thread.
+
+    The thread keeps flushing while the process is idle, so a scrape never misses samples of a
+    worker that stopped receiving requests.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(float)
+        self.flusher = None
+
+    def add(self, samples):
+        with self.lock:
+            for field, value in samples:
+                self.samples[field] += value
+            if self.flusher is None:
+                self.flusher = threading.Thread(target=self._flush_periodically, name='metrics-flusher', daemon=True)
+                self.flusher.start()
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(settings.METRICS_FLUSH_INTERVAL)
+            self.flush()
+
+    def flush(self, final=False):
+        with self.lock:
+            samples, self.samples = self.samples, defaultdict(float)
+            # Only processes that serve requests report their pools; a management command stays silent.
+            reporting = self.flusher is not None
+        if not samples and not reporting:
+            return
+        counters, gauges = pool_samples() if reporting else ([], [])
+        for name, labels, value in counters:
+            if value:
+                samples[_field(name, labels)] += value
+        gauges_key = f'{GAUGES_KEY_PREFIX}{socket.gethostname()}:{os.getpid()}'
+        try:
+            pipe = _store().pipeline(transaction=False)
+            for field, value in samples.items():
+                pipe.hincrbyfloat(METRICS_KEY, field, value)
+            pipe.delete(gauges_key)
+            if gauges and not final:
+                pipe.hset(gauges_key, mapping={_field(name, labels): value for name, labels, value in gauges})
+                pipe.expire(gauges_key, max(30, round(3 * settings.METRICS_FLUSH_INTERVAL)))
+            pipe.execute()
+        except redis.RedisError:
+            logger.warning('Dropped %d metric samples: Redis is unavailable', len(samples), exc_info=True)
+
+
+_buffer = _Buffer()
+_store_client = None
+
+
+def _store():
+    # Plain client: writing the metrics must not count as Redis traffic of a request.
+    global _store_client
+    if _store_client is None:
+        _store_client = redis.Redis(connection_pool=redis_pool())
+    return _store_client
+
+
+def _after_fork():
+    # A forked worker starts with an empty buffer instead of re-adding its parent's samples.
+    _buffer.__init__()
+
+
+os.register_at_fork(after_in_child=_after_fork)
+atexit.register(_buffer.flush, final=True)
+
+
+def _labels(**labels):
+    escaped = (
+        (key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in labels.items()
+    )
+    return ','.join(f'{key}="{value}"' for key, value in escaped)
+
+
+def _field(name, labels):
+    return f'{name}{{{_labels(**labels)}}}'
+
+
+def _samples(route, method, status, duration, stats):
+    labels = _labels(route=route, method=method, status=status)
+    name = 'http_request_duration_seconds'
+    for bound in LATENCY_BUCKETS:
+        if duration <= bound:
+            yield f'{name}_bucket{{{labels},le="{bound}"}}', 1
+    yield f'{name}_bucket{{{labels},le="+Inf"}}', 1
+    yield f'{name}_sum{{{labels}}}', duration
+    yield f'{name}_count{{{labels}}}', 1
+    route_label = _labels(route=route)
+    yield f'http_request_db_queries_total{{{route_label}}}', stats.query_count
+    yield f'http_request_db_seconds_total{{{route_label}}}', stats.query_time
+    yield f'http_request_redis_calls_total{{{route_label}}}', stats.redis_calls
+    yield f'http_request_redis_seconds_total{{{route_label}}}', stats.redis_time
+    yield f'http_request_serializer_seconds_total{{{route_label}}}', stats.serializer_time
+
+
+def _route(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else 'unmatched'
+
+
+class RequestMetricsMiddleware:
+    """Time each request and record it, with its SQL, Redis and serializer totals, under its route."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._record(request, response, time.perf_counter() - start, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._record(request, response, time.perf_counter() - start, stats)
+        return response
+
+    def _record(self, request, response, duration, stats):
+        route = _route(request)
+        _buffer.add(_samples(route, request.method, response.status_code, duration, stats))
+        if duration < settings.METRICS_SLOW_REQUEST_SECONDS:
+            return
+        if random.random() >= settings.METRICS_SLOW_REQUEST_SAMPLE_RATE:
+            return
+        logger.warning(
+            'Slow request %s %s (%s) took %.3fs: %d queries in %.3fs, %d Redis calls in %.3fs, '
+            'serialization %.3fs; top queries: %s',
+            request.method,
+            request.path,
+            route,
+            duration,
+            stats.query_count,
+            stats.query_time,
+            stats.redis_calls,
+            stats.redis_time,
+            stats.serializer_time,
+            json.dumps(stats.top_queries()),
+        )
+
+
+_SAMPLE_RE = re.compile(r'^(?P<name>[a-z_]+)\{(?P<labels>.*?)(?:,le="(?P<le>[^"]+)")?\}$')
+
+
+def _sort_key(field):
+    match = _SAMPLE_RE.match(field)
+    le = match['le']
+    return match['labels'], match['name'], float(le) if le else 0.0
+
+
+def _family(name):
+    for suffix in ('_bucket', '_sum', '_count'):
+        if name.endswith(suffix) and name[: -len(suffix)] in METRIC_FAMILIES:
+            return name[: -len(suffix)]
+    return name
+
+
+def render_metrics():
+    """Every process's samples in the Prometheus text exposition format."""
+    _buffer.flush()
+    store = _store()
+    totals = defaultdict(float)
+    for field, value in store.hgetall(METRICS_KEY).items():
+        totals[field.decode()] += float(value)
+    for key in store.scan_iter(match=f'{GAUGES_KEY_PREFIX}*', count=500):
+        for field, value in store.hgetall(key).items():
+            totals[field.decode()] += float(value)
+    by_family = defaultdict(list)
+    for field, value in totals.items():
+        by_family[_family(_SAMPLE_RE.match(field)['name'])].append((field, value))
+    lines = []
+    for family, (kind, help_text) in METRIC_FAMILIES.items():
+        lines += [f'# HELP {family} {help_text}', f'# TYPE {family} {kind}']
+        for field, value in sorted(by_family[family], key=lambda sample: _sort_key(sample[0])):
+            lines.append(f'{field} {int(value) if value.is_integer() else value!r}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='is_hot',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+    ]
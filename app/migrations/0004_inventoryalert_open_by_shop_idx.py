@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_outboxevent'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventoryalert',
+            index=models.Index(condition=models.Q(('resolved', False)), fields=['shop', '-triggered_at', '-id'], name='alert_open_by_shop_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_inventoryalert_open_by_shop_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShopProductDailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('quantity', models.IntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='app.product')),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='product_daily_sales', to='app.artisanshop')),
+            ],
+            options={
+                'unique_together': {('shop', 'product', 'day')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ShopDailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('orders', models.IntegerField(default=0)),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='app.artisanshop')),
+            ],
+            options={
+                'unique_together': {('shop', 'day')},
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_daily_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['shop', 'status', 'created_at'], name='order_shop_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shopproductdailysales',
+            index=models.Index(fields=['shop', 'day'], include=('product', 'revenue', 'quantity'), name='product_sales_shop_day_idx'),
+        ),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_analytics_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql='CREATE INDEX product_location_geog_idx ON app_product USING gist ((CAST(location AS geography)));',
+            reverse_sql='DROP INDEX IF EXISTS product_location_geog_idx;',
+        ),
+    ]
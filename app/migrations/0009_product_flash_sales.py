@@ -0,0 +1,55 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_productrecommendation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='effective_price',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10),
+        ),
+        migrations.RunSQL('UPDATE app_product SET effective_price = price', migrations.RunSQL.noop),
+        migrations.AddField(
+            model_name='product',
+            name='flash_sale_end',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='flash_sale_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='flash_sale_start',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='on_flash_sale',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['effective_price', 'id'], name='product_effective_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['-on_flash_sale', '-created_at', '-id'], name='product_sale_first_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('flash_sale_price__isnull', False), ('on_flash_sale', False)), fields=['flash_sale_start'], name='product_sale_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('on_flash_sale', True)), fields=['flash_sale_end'], name='product_sale_active_idx'),
+        ),
+    ]
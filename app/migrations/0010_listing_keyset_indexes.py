@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_product_flash_sales'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='artisanshop',
+            index=models.Index(fields=['created_at', 'id'], name='shop_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['customer', 'created_at', 'id'], name='order_customer_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['created_at', 'id'], name='product_created_idx'),
+        ),
+    ]
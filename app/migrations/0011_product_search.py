@@ -0,0 +1,87 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:37
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+# Keep the text search configuration in step with ``app.services.SEARCH_CONFIG``.
+SEARCH_VECTOR_SQL = """
+CREATE FUNCTION app_product_search_vector(p_name text, p_description text, p_category_id bigint, p_shop_id bigint)
+RETURNS tsvector LANGUAGE sql STABLE AS $$
+    SELECT setweight(to_tsvector('english', coalesce(p_name, '')), 'A')
+        || setweight(to_tsvector('english', coalesce((SELECT name FROM app_category WHERE id = p_category_id), '')), 'B')
+        || setweight(to_tsvector('english', coalesce((SELECT name FROM app_artisanshop WHERE id = p_shop_id), '')), 'B')
+        || setweight(to_tsvector('english', coalesce(p_description, '')), 'C')
+$$;
+
+CREATE FUNCTION app_product_search_vector_trigger() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.search_vector := app_product_search_vector(NEW.name, NEW.description, NEW.category_id, NEW.shop_id);
+    RETURN NEW;
+END
+$$;
+
+CREATE TRIGGER app_product_search_vector_update
+    BEFORE INSERT OR UPDATE OF name, description, category_id, shop_id, search_vector ON app_product
+    FOR EACH ROW EXECUTE FUNCTION app_product_search_vector_trigger();
+
+CREATE FUNCTION app_product_search_vector_refresh() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_TABLE_NAME = 'app_category' THEN
+        UPDATE app_product SET search_vector = NULL WHERE category_id = NEW.id;
+    ELSE
+        UPDATE app_product SET search_vector = NULL WHERE shop_id = NEW.id;
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+CREATE TRIGGER app_category_search_vector_refresh
+    AFTER UPDATE OF name ON app_category
+    FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+    EXECUTE FUNCTION app_product_search_vector_refresh();
+
+CREATE TRIGGER app_artisanshop_search_vector_refresh
+    AFTER UPDATE OF name ON app_artisanshop
+    FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+    EXECUTE FUNCTION app_product_search_vector_refresh();
+
+UPDATE app_product SET search_vector = NULL;
+"""
+
+DROP_SEARCH_VECTOR_SQL = """
+DROP TRIGGER IF EXISTS app_artisanshop_search_vector_refresh ON app_artisanshop;
+DROP TRIGGER IF EXISTS app_category_search_vector_refresh ON app_category;
+DROP TRIGGER IF EXISTS app_product_search_vector_update ON app_product;
+DROP FUNCTION IF EXISTS app_product_search_vector_refresh();
+DROP FUNCTION IF EXISTS app_product_search_vector_trigger();
+DROP FUNCTION IF EXISTS app_product_search_vector(text, text, bigint, bigint);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_listing_keyset_indexes'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunSQL(sql=SEARCH_VECTOR_SQL, reverse_sql=DROP_SEARCH_VECTOR_SQL),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='product_search_vector_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=['name'], name='product_name_trgm_idx', opclasses=['gin_trgm_ops']
+            ),
+        ),
+    ]
@@ -0,0 +1,183 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Rebuild ``app_order`` and ``app_orderitem`` as tables partitioned by month of ``created_at``; see
+# ``app.partitions``. A unique constraint on a partitioned table must include the partition key, so
+# the primary keys become ``(id, created_at)``, line items carry their order's ``created_at`` and
+# reference it with a composite foreign key, and ``app_deliveryschedule`` loses its database-level
+# foreign key. The migration creates the monthly partitions from the oldest order to three months
+# ahead; ``maintain_order_partitions`` keeps creating them.
+PARTITION_ORDERS_SQL = """
+ALTER TABLE app_orderitem DROP CONSTRAINT app_orderitem_order_id_41257a1b_fk_app_order_id;
+ALTER TABLE app_deliveryschedule DROP CONSTRAINT app_deliveryschedule_order_id_45f4051b_fk_app_order_id;
+
+ALTER TABLE app_order RENAME TO app_order_unpartitioned;
+ALTER INDEX app_order_pkey RENAME TO app_order_unpartitioned_pkey;
+ALTER SEQUENCE app_order_id_seq RENAME TO app_order_unpartitioned_id_seq;
+ALTER TABLE app_orderitem RENAME TO app_orderitem_unpartitioned;
+ALTER INDEX app_orderitem_pkey RENAME TO app_orderitem_unpartitioned_pkey;
+ALTER SEQUENCE app_orderitem_id_seq RENAME TO app_orderitem_unpartitioned_id_seq;
+
+CREATE TABLE app_order (
+    id bigint NOT NULL GENERATED BY DEFAULT AS IDENTITY,
+    customer_id bigint NOT NULL,
+    shop_id bigint NOT NULL,
+    created_at timestamp with time zone NOT NULL,
+    total_amount numeric(10, 2) NOT NULL,
+    status varchar(16) NOT NULL,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+CREATE TABLE app_orderitem (
+    id bigint NOT NULL GENERATED BY DEFAULT AS IDENTITY,
+    order_id bigint NOT NULL,
+    product_id bigint NOT NULL,
+    quantity integer NOT NULL CHECK (quantity >= 0),
+    unit_price numeric(10, 2) NOT NULL,
+    total_price numeric(10, 2) NOT NULL,
+    created_at timestamp with time zone NOT NULL,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+DO $$
+DECLARE
+    bound timestamptz := date_trunc(
+        'month', coalesce((SELECT min(created_at) FROM app_order_unpartitioned), now()), 'UTC'
+    );
+    last_month timestamptz := date_trunc('month', now(), 'UTC') + interval '3 months';
+    suffix text;
+BEGIN
+    WHILE bound <= last_month LOOP
+        suffix := '_p' || to_char(bound AT TIME ZONE 'UTC', 'YYYY_MM');
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF app_order FOR VALUES FROM (%L) TO (%L)',
+            'app_order' || suffix, bound, bound + interval '1 month'
+        );
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF app_orderitem FOR VALUES FROM (%L) TO (%L)',
+            'app_orderitem' || suffix, bound, bound + interval '1 month'
+        );
+        bound := bound + interval '1 month';
+    END LOOP;
+END
+$$;
+
+INSERT INTO app_order (id, customer_id, shop_id, created_at, total_amount, status)
+    SELECT id, customer_id, shop_id, created_at, total_amount, status FROM app_order_unpartitioned;
+INSERT INTO app_orderitem (id, order_id, product_id, quantity, unit_price, total_price, created_at)
+    SELECT i.id, i.order_id, i.product_id, i.quantity, i.unit_price, i.total_price, o.created_at
+    FROM app_orderitem_unpartitioned i JOIN app_order_unpartitioned o ON o.id = i.order_id;
+SELECT setval(pg_get_serial_sequence('app_order', 'id'), coalesce(max(id), 0) + 1, false) FROM app_order;
+SELECT setval(pg_get_serial_sequence('app_orderitem', 'id'), coalesce(max(id), 0) + 1, false) FROM app_orderitem;
+DROP TABLE app_orderitem_unpartitioned;
+DROP TABLE app_order_unpartitioned;
+
+ALTER TABLE app_order ADD CONSTRAINT app_order_customer_id_7c27c407_fk_app_user_id
+    FOREIGN KEY (customer_id) REFERENCES app_user (id) DEFERRABLE INITIALLY DEFERRED;
+ALTER TABLE app_order ADD CONSTRAINT app_order_shop_id_611ce46a_fk_app_artisanshop_id
+    FOREIGN KEY (shop_id) REFERENCES app_artisanshop (id) DEFERRABLE INITIALLY DEFERRED;
+CREATE INDEX app_order_customer_id_7c27c407 ON app_order (customer_id);
+CREATE INDEX app_order_shop_id_611ce46a ON app_order (shop_id);
+CREATE INDEX app_order_created_at_70f788d6 ON app_order (created_at);
+CREATE INDEX app_order_status_ff012753 ON app_order (status);
+CREATE INDEX app_order_status_ff012753_like ON app_order (status varchar_pattern_ops);
+CREATE INDEX order_shop_status_created_idx ON app_order (shop_id, status, created_at);
+CREATE INDEX order_customer_created_idx ON app_order (customer_id, created_at, id);
+
+-- Updating an order's created_at moves its lines to the new month with it.
+ALTER TABLE app_orderitem ADD CONSTRAINT app_orderitem_order_created_fk
+    FOREIGN KEY (order_id, created_at) REFERENCES app_order (id, created_at)
+    ON UPDATE CASCADE DEFERRABLE INITIALLY DEFERRED;
+ALTER TABLE app_orderitem ADD CONSTRAINT app_orderitem_product_id_5f40ddb0_fk_app_product_id
+    FOREIGN KEY (product_id) REFERENCES app_product (id) DEFERRABLE INITIALLY DEFERRED;
+CREATE INDEX app_orderitem_order_id_41257a1b ON app_orderitem (order_id);
+CREATE INDEX app_orderitem_product_id_5f40ddb0 ON app_orderitem (product_id);
+"""
+
+# Back to plain tables, dropping every attached partition; detached or archived ones are left alone.
+UNPARTITION_ORDERS_SQL = """
+ALTER TABLE app_orderitem RENAME TO app_orderitem_partitioned;
+ALTER INDEX app_orderitem_pkey RENAME TO app_orderitem_partitioned_pkey;
+ALTER SEQUENCE app_orderitem_id_seq RENAME TO app_orderitem_partitioned_id_seq;
+ALTER TABLE app_order RENAME TO app_order_partitioned;
+ALTER INDEX app_order_pkey RENAME TO app_order_partitioned_pkey;
+ALTER SEQUENCE app_order_id_seq RENAME TO app_order_partitioned_id_seq;
+
+CREATE TABLE app_order (
+    id bigint NOT NULL PRIMARY KEY GENERATED BY DEFAULT AS IDENTITY,
+    customer_id bigint NOT NULL,
+    shop_id bigint NOT NULL,
+    created_at timestamp with time zone NOT NULL,
+    total_amount numeric(10, 2) NOT NULL,
+    status varchar(16) NOT NULL
+);
+CREATE TABLE app_orderitem (
+    id bigint NOT NULL PRIMARY KEY GENERATED BY DEFAULT AS IDENTITY,
+    order_id bigint NOT NULL,
+    product_id bigint NOT NULL,
+    quantity integer NOT NULL CHECK (quantity >= 0),
+    unit_price numeric(10, 2) NOT NULL,
+    total_price numeric(10, 2) NOT NULL
+);
+
+INSERT INTO app_order (id, customer_id, shop_id, created_at, total_amount, status)
+    SELECT id, customer_id, shop_id, created_at, total_amount, status FROM app_order_partitioned;
+INSERT INTO app_orderitem (id, order_id, product_id, quantity, unit_price, total_price)
+    SELECT id, order_id, product_id, quantity, unit_price, total_price FROM app_orderitem_partitioned;
+SELECT setval(pg_get_serial_sequence('app_order', 'id'), coalesce(max(id), 0) + 1, false) FROM app_order;
+SELECT setval(pg_get_serial_sequence('app_orderitem', 'id'), coalesce(max(id), 0) + 1, false) FROM app_orderitem;
+DROP TABLE app_orderitem_partitioned;
+DROP TABLE app_order_partitioned;
+DELETE FROM app_deliveryschedule d WHERE NOT EXISTS (SELECT 1 FROM app_order o WHERE o.id = d.order_id);
+
+ALTER TABLE app_order ADD CONSTRAINT app_order_customer_id_7c27c407_fk_app_user_id
+    FOREIGN KEY (customer_id) REFERENCES app_user (id) DEFERRABLE INITIALLY DEFERRED;
+ALTER TABLE app_order ADD CONSTRAINT app_order_shop_id_611ce46a_fk_app_artisanshop_id
+    FOREIGN KEY (shop_id) REFERENCES app_artisanshop (id) DEFERRABLE INITIALLY DEFERRED;
+CREATE INDEX app_order_customer_id_7c27c407 ON app_order (customer_id);
+CREATE INDEX app_order_shop_id_611ce46a ON app_order (shop_id);
+CREATE INDEX app_order_created_at_70f788d6 ON app_order (created_at);
+CREATE INDEX app_order_status_ff012753 ON app_order (status);
+CREATE INDEX app_order_status_ff012753_like ON app_order (status varchar_pattern_ops);
+CREATE INDEX order_shop_status_created_idx ON app_order (shop_id, status, created_at);
+CREATE INDEX order_customer_created_idx ON app_order (customer_id, created_at, id);
+
+ALTER TABLE app_orderitem ADD CONSTRAINT app_orderitem_order_id_41257a1b_fk_app_order_id
+    FOREIGN KEY (order_id) REFERENCES app_order (id) DEFERRABLE INITIALLY DEFERRED;
+ALTER TABLE app_orderitem ADD CONSTRAINT app_orderitem_product_id_5f40ddb0_fk_app_product_id
+    FOREIGN KEY (product_id) REFERENCES app_product (id) DEFERRABLE INITIALLY DEFERRED;
+CREATE INDEX app_orderitem_order_id_41257a1b ON app_orderitem (order_id);
+CREATE INDEX app_orderitem_product_id_5f40ddb0 ON app_orderitem (product_id);
+ALTER TABLE app_deliveryschedule ADD CONSTRAINT app_deliveryschedule_order_id_45f4051b_fk_app_order_id
+    FOREIGN KEY (order_id) REFERENCES app_order (id) DEFERRABLE INITIALLY DEFERRED;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0012_product_sku'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunSQL(PARTITION_ORDERS_SQL, UNPARTITION_ORDERS_SQL)],
+            state_operations=[
+                migrations.AddField(
+                    model_name='orderitem',
+                    name='created_at',
+                    field=models.DateTimeField(),
+                ),
+                migrations.AlterField(
+                    model_name='orderitem',
+                    name='order',
+                    field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='items', to='app.order'),
+                ),
+                migrations.AlterField(
+                    model_name='deliveryschedule',
+                    name='order',
+                    field=models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='delivery_schedule', to='app.order'),
+                ),
+            ],
+        ),
+    ]
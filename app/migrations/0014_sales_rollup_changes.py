@@ -0,0 +1,76 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:30
+
+from django.db import migrations, models
+
+# Record the shop and UTC day of every completed order inserted, deleted, or updated in status, shop
+# or ``created_at``, whatever wrote it, so ``app.rollups.rebuild_changed_rollups`` can repair the
+# rollups that ``change_order_status`` did not maintain. Statement-level triggers with transition
+# tables cost one insert per statement, bulk loads included.
+SALES_CHANGES_SQL = """
+CREATE FUNCTION app_order_sales_changed() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO app_salesrollupchange (shop_id, day)
+            SELECT DISTINCT shop_id, CAST(created_at AT TIME ZONE 'UTC' AS date) FROM new_orders
+            WHERE status = 'completed'
+            ON CONFLICT (shop_id, day) DO NOTHING;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO app_salesrollupchange (shop_id, day)
+            SELECT DISTINCT shop_id, CAST(created_at AT TIME ZONE 'UTC' AS date) FROM old_orders
+            WHERE status = 'completed'
+            ON CONFLICT (shop_id, day) DO NOTHING;
+    ELSE
+        INSERT INTO app_salesrollupchange (shop_id, day)
+            SELECT DISTINCT changed.shop_id, changed.day
+            FROM old_orders o JOIN new_orders n ON n.id = o.id
+            CROSS JOIN LATERAL (VALUES
+                (o.shop_id, CAST(o.created_at AT TIME ZONE 'UTC' AS date)),
+                (n.shop_id, CAST(n.created_at AT TIME ZONE 'UTC' AS date))
+            ) AS changed (shop_id, day)
+            WHERE 'completed' IN (o.status, n.status)
+                AND (o.status, o.shop_id, o.created_at) IS DISTINCT FROM (n.status, n.shop_id, n.created_at)
+            ON CONFLICT (shop_id, day) DO NOTHING;
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+CREATE TRIGGER app_order_sales_inserted
+    AFTER INSERT ON app_order REFERENCING NEW TABLE AS new_orders
+    FOR EACH STATEMENT EXECUTE FUNCTION app_order_sales_changed();
+CREATE TRIGGER app_order_sales_updated
+    AFTER UPDATE ON app_order REFERENCING OLD TABLE AS old_orders NEW TABLE AS new_orders
+    FOR EACH STATEMENT EXECUTE FUNCTION app_order_sales_changed();
+CREATE TRIGGER app_order_sales_deleted
+    AFTER DELETE ON app_order REFERENCING OLD TABLE AS old_orders
+    FOR EACH STATEMENT EXECUTE FUNCTION app_order_sales_changed();
+"""
+
+DROP_SALES_CHANGES_SQL = """
+DROP TRIGGER app_order_sales_inserted ON app_order;
+DROP TRIGGER app_order_sales_updated ON app_order;
+DROP TRIGGER app_order_sales_deleted ON app_order;
+DROP FUNCTION app_order_sales_changed();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0013_partition_orders'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesRollupChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shop_id', models.BigIntegerField()),
+                ('day', models.DateField()),
+            ],
+            options={
+                'unique_together': {('shop_id', 'day')},
+            },
+        ),
+        migrations.RunSQL(SALES_CHANGES_SQL, DROP_SALES_CHANGES_SQL),
+    ]
@@ -1,6 +1,9 @@
 from django.contrib.auth.models import AbstractUser
 from django.contrib.gis.db import models as geomodels
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models import Q
 from django.utils import timezone
 
 
@@ -37,6 +40,7 @@ class ArtisanShop(models.Model):
 
     class Meta:
         unique_together = [('owner', 'name')]
+        indexes = [models.Index(fields=['created_at', 'id'], name='shop_created_idx')]
 
     def __str__(self):
         return self.name
@@ -45,21 +49,67 @@ class ArtisanShop(models.Model):
 class Product(models.Model):
     shop = models.ForeignKey(ArtisanShop, on_delete=models.CASCADE, related_name='products')
     name = models.CharField(max_length=255)
+    # Artisan-assigned stock keeping unit, unique per shop; the key of bulk imports.
+    sku = models.CharField(max_length=64, null=True, blank=True)
     description = models.TextField(blank=True, null=True)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     quantity = models.PositiveIntegerField(default=0)
     category = models.ForeignKey(Category, on_delete=models.PROTECT, related_name='products')
     location = geomodels.PointField(srid=4326, null=True, blank=True)
+    is_hot = models.BooleanField(default=False, db_index=True)
+    flash_sale_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    flash_sale_start = models.DateTimeField(null=True, blank=True)
+    flash_sale_end = models.DateTimeField(null=True, blank=True)
+    # Maintained by ``apply_flash_sale`` on save and by the flash sale boundary task.
+    on_flash_sale = models.BooleanField(default=False, editable=False)
+    effective_price = models.DecimalField(max_digits=10, decimal_places=2, default=0, editable=False)
+    # Weighted name/category/shop/description vector, maintained by database triggers (migration 0011).
+    search_vector = SearchVectorField(null=True, editable=False)
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['shop', 'sku'], name='product_shop_sku_uniq')]
+        indexes = [
+            models.Index(fields=['effective_price', 'id'], name='product_effective_price_idx'),
+            models.Index(fields=['created_at', 'id'], name='product_created_idx'),
+            models.Index(fields=['-on_flash_sale', '-created_at', '-id'], name='product_sale_first_idx'),
+            models.Index(
+                fields=['flash_sale_start'],
+                name='product_sale_pending_idx',
+                condition=Q(on_flash_sale=False, flash_sale_price__isnull=False),
+            ),
+            models.Index(fields=['flash_sale_end'], name='product_sale_active_idx', condition=Q(on_flash_sale=True)),
+            GinIndex(fields=['search_vector'], name='product_search_vector_idx'),
+            GinIndex(fields=['name'], opclasses=['gin_trgm_ops'], name='product_name_trgm_idx'),
+        ]
+
     def __str__(self):
         return f'{self.name} ({self.shop.name})'
 
+    def save(self, *args, **kwargs):
+        self.apply_flash_sale()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'on_flash_sale', 'effective_price'}
+        super().save(*args, **kwargs)
+
+    def flash_sale_active(self, at=None):
+        if self.flash_sale_price is None or not self.flash_sale_start or not self.flash_sale_end:
+            return False
+        return self.flash_sale_start <= (at or timezone.now()) < self.flash_sale_end
+
+    def current_price(self, at=None):
+        return self.flash_sale_price if self.flash_sale_active(at) else self.price
+
+    def apply_flash_sale(self, at=None):
+        self.on_flash_sale = self.flash_sale_active(at)
+        self.effective_price = self.current_price(at)
+
 
 class Order(models.Model):
     customer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='orders')
     shop = models.ForeignKey(ArtisanShop, on_delete=models.CASCADE, related_name='orders')
+    # Partition key of the monthly partitions (``app.partitions``); the primary key is ``(id, created_at)``.
     created_at = models.DateTimeField(default=timezone.now, db_index=True)
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     STATUS_PENDING = 'pending'
@@ -74,6 +124,12 @@ class Order(models.Model):
     ]
     status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING, db_index=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['shop', 'status', 'created_at'], name='order_shop_status_created_idx'),
+            models.Index(fields=['customer', 'created_at', 'id'], name='order_customer_created_idx'),
+        ]
+
     def __str__(self):
         return f'Order {self.pk} by {self.customer.username} ({self.shop.name})'
 
@@ -83,18 +139,28 @@ class Order(models.Model):
 
 
 class OrderItem(models.Model):
-    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
+    # Orders and their lines are partitioned by month of ``created_at`` (see ``app.partitions``), so the
+    # table references ``(order_id, created_at)`` itself instead of a plain foreign key on ``order_id``.
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items', db_constraint=False)
     product = models.ForeignKey(Product, on_delete=models.PROTECT, related_name='order_items')
     quantity = models.PositiveIntegerField()
     unit_price = models.DecimalField(max_digits=10, decimal_places=2)
     total_price = models.DecimalField(max_digits=10, decimal_places=2)
+    # The order's ``created_at``, placing the line in its order's partition.
+    created_at = models.DateTimeField()
 
     def __str__(self):
         return f'{self.product.name} x {self.quantity}'
 
+    def save(self, *args, **kwargs):
+        if self.created_at is None:
+            self.created_at = self.order.created_at
+        super().save(*args, **kwargs)
+
 
 class DeliverySchedule(models.Model):
-    order = models.OneToOneField(Order, on_delete=models.CASCADE, related_name='delivery_schedule')
+    # No database foreign key: the partitioned order table has no unique constraint on ``id`` alone.
+    order = models.OneToOneField(Order, on_delete=models.CASCADE, related_name='delivery_schedule', db_constraint=False)
     scheduled_date = models.DateTimeField(null=True, blank=True)
     address = models.CharField(max_length=255)
     delivered_at = models.DateTimeField(null=True, blank=True)
@@ -112,6 +178,97 @@ class InventoryAlert(models.Model):
 
     class Meta:
         unique_together = [('shop', 'product', 'triggered_at')]
+        indexes = [
+            models.Index(
+                fields=['shop', '-triggered_at', '-id'], name='alert_open_by_shop_idx', condition=Q(resolved=False)
+            ),
+        ]
 
     def __str__(self):
         return f'Low stock alert for {self.product.name} in {self.shop.name}'
+
+
+class OutboxEvent(models.Model):
+    EVENT_ORDER_CREATED = 'order_created'
+    EVENT_STOCK_LOW = 'stock_low'
+    EVENT_CHOICES = [
+        (EVENT_ORDER_CREATED, 'Order created'),
+        (EVENT_STOCK_LOW, 'Stock low'),
+    ]
+    event_type = models.CharField(max_length=32, choices=EVENT_CHOICES)
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(default=timezone.now)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=['id'], name='outbox_unprocessed_idx', condition=Q(processed_at__isnull=True))]
+
+    def __str__(self):
+        return f'{self.event_type} event {self.pk}'
+
+
+class ShopDailySales(models.Model):
+    shop = models.ForeignKey(ArtisanShop, on_delete=models.CASCADE, related_name='daily_sales')
+    day = models.DateField()
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    orders = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = [('shop', 'day')]
+
+    def __str__(self):
+        return f'{self.shop_id} sales on {self.day}'
+
+
+class ShopProductDailySales(models.Model):
+    shop = models.ForeignKey(ArtisanShop, on_delete=models.CASCADE, related_name='product_daily_sales')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_sales')
+    day = models.DateField()
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    quantity = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = [('shop', 'product', 'day')]
+        indexes = [
+            models.Index(
+                fields=['shop', 'day'], include=['product', 'revenue', 'quantity'], name='product_sales_shop_day_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.product_id} sales on {self.day}'
+
+
+class SalesRollupChange(models.Model):
+    """A shop and UTC day whose completed orders changed, recorded by a trigger on the order table."""
+
+    # No foreign key: the trigger also records orders deleted along with their shop.
+    shop_id = models.BigIntegerField()
+    day = models.DateField()
+
+    class Meta:
+        unique_together = [('shop_id', 'day')]
+
+    def __str__(self):
+        return f'{self.shop_id} sales changed on {self.day}'
+
+
+class ProductRecommendation(models.Model):
+    SOURCE_CO_PURCHASE = 'co_purchase'
+    SOURCE_CATEGORY = 'category'
+    SOURCE_CHOICES = [
+        (SOURCE_CO_PURCHASE, 'Bought together'),
+        (SOURCE_CATEGORY, 'Same category'),
+    ]
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='recommendations')
+    recommended = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='recommended_for')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField(default=0)
+    source = models.CharField(max_length=16, choices=SOURCE_CHOICES, default=SOURCE_CO_PURCHASE)
+
+    class Meta:
+        unique_together = [('product', 'rank')]
+
+    def __str__(self):
+        return f'{self.recommended_id} for {self.product_id} (#{self.rank})'
@@ -0,0 +1,172 @@
+"""Monthly partitions of ``Order`` and ``OrderItem``.
+
+Both tables are partitioned by range of ``created_at``, one partition per calendar month (UTC)
+named ``<table>_pYYYY_MM``. A line item stores its order's ``created_at``, so an order and its lines
+share a month, and queries bounded on ``created_at`` only touch the partitions of their months.
+Postgres rejects rows with no partition, so ``ensure_partitions`` creates months ahead of time,
+run daily by ``maintain_order_partitions``.
+
+Months older than ``ORDER_RETENTION_MONTHS`` leave the live tables with ``archive_partitions``:
+their partitions are detached and moved to the ``archive`` schema, or dropped, which costs a
+catalog update instead of a bulk ``DELETE`` and leaves nothing to vacuum. The daily sales rollups
+of those months stay.
+"""
+
+import logging
+import re
+from datetime import date, datetime
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import DeliverySchedule, Order, OrderItem
+
+logger = logging.getLogger(__name__)
+
+# Referenced table first: partitions are created in this order and detached in reverse.
+PARTITIONED_MODELS = (Order, OrderItem)
+ARCHIVE_SCHEMA = 'archive'
+# A month keeps its partitions while any of its orders can still change.
+OPEN_STATUSES = (Order.STATUS_PENDING, Order.STATUS_PROCESSING)
+# Partition DDL locks the parent table; give up rather than queue every order insert behind it.
+LOCK_TIMEOUT = '5s'
+
+_SUFFIX_RE = re.compile(r'_p(\d{4})_(\d{2})$')
+
+
+def month_start(moment):
+    """First day of the UTC month of a date or aware datetime."""
+    if isinstance(moment, datetime):
+        moment = moment.astimezone(dt_timezone.utc).date()
+    return date(moment.year, moment.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(model, month):
+    return f'{model._meta.db_table}_p{month:%Y_%m}'
+
+
+def _bound(month):
+    return datetime(month.year, month.month, 1, tzinfo=dt_timezone.utc)
+
+
+def partition_months(model=Order):
+    """Months of ``model``'s attached partitions, oldest first."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+            'WHERE i.inhparent = CAST(%s AS regclass)',
+            [connection.ops.quote_name(model._meta.db_table)],
+        )
+        names = [name for (name,) in cursor.fetchall()]
+    months = []
+    for name in names:
+        match = _SUFFIX_RE.search(name)
+        if match:
+            months.append(date(int(match[1]), int(match[2]), 1))
+    return sorted(months)
+
+
+def ensure_partitions(start, end):
+    """Create the missing partitions of the months from ``start`` to ``end`` inclusive; return their names."""
+    first, last = month_start(start), month_start(end)
+    created = []
+    existing = {model: set(partition_months(model)) for model in PARTITIONED_MODELS}
+    month = first
+    while month <= last:
+        missing = [model for model in PARTITIONED_MODELS if month not in existing[model]]
+        if missing:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+                for model in missing:
+                    name = partition_name(model, month)
+                    cursor.execute(
+                        f'CREATE TABLE IF NOT EXISTS {connection.ops.quote_name(name)} '
+                        f'PARTITION OF {connection.ops.quote_name(model._meta.db_table)} FOR VALUES FROM (%s) TO (%s)',
+                        [_bound(month), _bound(add_months(month, 1))],
+                    )
+                    created.append(name)
+        month = add_months(month, 1)
+    return created
+
+
+def _has_open_orders(cursor, month):
+    cursor.execute(
+        f'SELECT EXISTS (SELECT 1 FROM {connection.ops.quote_name(partition_name(Order, month))} '
+        f'WHERE status = ANY(%s))',
+        [list(OPEN_STATUSES)],
+    )
+    return cursor.fetchone()[0]
+
+
+def _archive_delivery_schedules(cursor, month, drop):
+    # Delivery schedules have no partitions of their own; they follow their orders out of the live tables.
+    schedules = connection.ops.quote_name(DeliverySchedule._meta.db_table)
+    orders = connection.ops.quote_name(partition_name(Order, month))
+    delete = f'DELETE FROM {schedules} WHERE order_id IN (SELECT id FROM {orders})'
+    if drop:
+        cursor.execute(delete)
+        return
+    archived = f'{ARCHIVE_SCHEMA}.{connection.ops.quote_name(partition_name(DeliverySchedule, month))}'
+    cursor.execute(f'CREATE TABLE IF NOT EXISTS {archived} (LIKE {schedules})')
+    cursor.execute(f'WITH moved AS ({delete} RETURNING *) INSERT INTO {archived} SELECT * FROM moved')
+
+
+def _drop_foreign_keys(cursor, name):
+    # A detached partition keeps the foreign keys of its parent: archived rows must not hold back
+    # detaching the order partition or deleting a live user, shop or product.
+    cursor.execute("SELECT conname FROM pg_constraint WHERE conrelid = CAST(%s AS regclass) AND contype = 'f'", [name])
+    for (constraint,) in cursor.fetchall():
+        cursor.execute(f'ALTER TABLE {name} DROP CONSTRAINT {connection.ops.quote_name(constraint)}')
+
+
+def archive_partitions(before, drop=False):
+    """Take the partitions of months before ``before`` out of the live tables; return the months archived.
+
+    Partitions are detached and moved to the ``archive`` schema, or dropped with ``drop``, one month
+    per transaction. Months still holding pending or processing orders are skipped.
+    """
+    cutoff = month_start(before)
+    archived = []
+    for month in partition_months(Order):
+        if month >= cutoff:
+            break
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+            if _has_open_orders(cursor, month):
+                logger.warning('Not archiving orders of %s: some are still open', f'{month:%Y-%m}')
+                continue
+            if not drop:
+                cursor.execute(f'CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}')
+            _archive_delivery_schedules(cursor, month, drop)
+            for model in reversed(PARTITIONED_MODELS):
+                parent = connection.ops.quote_name(model._meta.db_table)
+                name = connection.ops.quote_name(partition_name(model, month))
+                cursor.execute(f'ALTER TABLE {parent} DETACH PARTITION {name}')
+                if drop:
+                    cursor.execute(f'DROP TABLE {name}')
+                else:
+                    _drop_foreign_keys(cursor, name)
+                    cursor.execute(f'ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}')
+        archived.append(month)
+    return archived
+
+
+def maintain_order_partitions(months_ahead=None, retention_months=None, drop=None):
+    """Create the partitions of the next ``months_ahead`` months and archive those past retention.
+
+    Returns ``(created partition names, archived months)``. ``retention_months=0`` keeps every month.
+    """
+    months_ahead = settings.ORDER_PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    retention_months = settings.ORDER_RETENTION_MONTHS if retention_months is None else retention_months
+    drop = settings.ORDER_ARCHIVE_DROP if drop is None else drop
+    current = month_start(timezone.now())
+    created = ensure_partitions(current, add_months(current, months_ahead))
+    archived = archive_partitions(add_months(current, -retention_months), drop=drop) if retention_months else []
+    return created, archived
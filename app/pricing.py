@@ -0,0 +1,68 @@
+"""Flash sale windows and the precomputed ``Product.effective_price``.
+
+``effective_price`` and ``on_flash_sale`` are stored on the product so catalog queries can sort
+and filter on plain indexed columns. ``Product.save`` keeps them right when a product is edited;
+the ``app.apply_flash_sales`` task flips them when a sale window opens or closes. That task is
+queued with an ETA at both boundaries of every saved window, and beat runs it every minute as a
+safety net for lost or early messages. A window that has closed is cleared from its product, so
+the partial index on pending sales only holds current and future windows.
+"""
+
+import logging
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from config.celery import app as celery_app
+
+from .models import Product
+from .services import CATALOG_PRODUCTS, invalidate_catalog_on_commit
+
+logger = logging.getLogger(__name__)
+
+
+def apply_flash_sale_windows(now=None):
+    """Start and end every flash sale whose window boundary has passed.
+
+    The updates are set-based and served by the partial indexes on pending and active sales. Ended
+    windows, and pending ones that closed before they were started, are cleared. Returns
+    ``(started, ended)`` row counts.
+    """
+    now = now or timezone.now()
+    cleared = {'flash_sale_price': None, 'flash_sale_start': None, 'flash_sale_end': None, 'updated_at': now}
+    with transaction.atomic():
+        ended = Product.objects.filter(on_flash_sale=True, flash_sale_end__lte=now).update(
+            on_flash_sale=False, effective_price=F('price'), **cleared
+        )
+        lapsed = Product.objects.filter(
+            on_flash_sale=False, flash_sale_price__isnull=False, flash_sale_end__lte=now
+        ).update(**cleared)
+        started = Product.objects.filter(
+            on_flash_sale=False,
+            flash_sale_price__isnull=False,
+            flash_sale_start__lte=now,
+            flash_sale_end__gt=now,
+        ).update(on_flash_sale=True, effective_price=F('flash_sale_price'), updated_at=now)
+        if started or ended or lapsed:
+            invalidate_catalog_on_commit(CATALOG_PRODUCTS)
+    return started, ended
+
+
+def schedule_flash_sale_boundaries(product):
+    """Queue ``app.apply_flash_sales`` at the future boundaries of ``product``'s sale window."""
+    if product.flash_sale_price is None:
+        return
+    now = timezone.now()
+    boundaries = [at for at in (product.flash_sale_start, product.flash_sale_end) if at and at > now]
+    if boundaries:
+        transaction.on_commit(lambda: _send_boundary_tasks(boundaries))
+
+
+def _send_boundary_tasks(boundaries):
+    try:
+        for eta in boundaries:
+            celery_app.send_task('app.apply_flash_sales', eta=eta)
+    except Exception:
+        # The periodic run flips the window within a minute anyway.
+        logger.warning('Could not schedule flash sale boundaries %s', boundaries, exc_info=True)
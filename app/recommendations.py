@@ -0,0 +1,173 @@
+"""Offline item-to-item recommendations built from ``OrderItem`` co-purchases.
+
+The full build streams the order history into a sparse orders x products matrix and keeps, for
+every product, the ``RECOMMENDATIONS_TOP_K`` products bought together with it most often.
+Products with fewer co-purchase neighbours are padded with popular products of the same
+category, preferring the same shop. The daily refresh folds in only the orders placed since the
+last run, so the table stays current between full builds. Requests only read the precomputed
+``ProductRecommendation`` rows.
+"""
+
+from array import array
+from collections import defaultdict
+from itertools import chain
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from scipy import sparse
+
+from .models import Order, OrderItem, Product, ProductRecommendation
+from .services import redis_client
+
+RECOMMENDATIONS_WATERMARK_KEY = 'recommendations:last-order-id'
+
+
+def _co_purchase_matrix(items):
+    """Build ``(product_ids, co_counts, purchases)`` from ``(order_id, product_id)`` pairs."""
+    order_ids = array('q')
+    product_ids = array('q')
+    for order_id, product_id in items:
+        order_ids.append(order_id)
+        product_ids.append(product_id)
+    if not order_ids:
+        return np.empty(0, dtype=np.int64), sparse.csr_matrix((0, 0)), np.empty(0)
+    _, order_index = np.unique(np.frombuffer(order_ids, dtype=np.int64), return_inverse=True)
+    columns, product_index = np.unique(np.frombuffer(product_ids, dtype=np.int64), return_inverse=True)
+    baskets = sparse.csr_matrix(
+        (np.ones(len(order_index), dtype=np.float32), (order_index, product_index)),
+        shape=(order_index.max() + 1, len(columns)),
+    )
+    baskets.data[:] = 1
+    co_counts = (baskets.T @ baskets).tocsr()
+    purchases = co_counts.diagonal()
+    co_counts.setdiag(0)
+    co_counts.eliminate_zeros()
+    return columns, co_counts, purchases
+
+
+def _top_neighbours(columns, co_counts, top_k):
+    neighbours = {}
+    for row in range(co_counts.shape[0]):
+        start, end = co_counts.indptr[row], co_counts.indptr[row + 1]
+        if start == end:
+            continue
+        counts = co_counts.data[start:end]
+        others = co_counts.indices[start:end]
+        best = np.argsort(-counts, kind='stable')[:top_k]
+        neighbours[int(columns[row])] = [(int(columns[others[i]]), float(counts[i])) for i in best]
+    return neighbours
+
+
+def _order_items(after_order_id, up_to_order_id):
+    return (
+        OrderItem.objects.filter(order_id__gt=after_order_id, order_id__lte=up_to_order_id)
+        .exclude(order__status=Order.STATUS_CANCELLED)
+        .order_by()
+        .values_list('order_id', 'product_id')
+        .iterator(chunk_size=10000)
+    )
+
+
+def _last_order_id():
+    return Order.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+
+def _category_padding(popularity):
+    """Index in-stock products per category and per (category, shop), most purchased first."""
+    by_category = defaultdict(list)
+    by_shop_category = defaultdict(list)
+    products = Product.objects.filter(quantity__gt=0).values_list('id', 'shop_id', 'category_id')
+    for product_id, shop_id, category_id in products.iterator(chunk_size=10000):
+        by_category[category_id].append(product_id)
+        by_shop_category[(category_id, shop_id)].append(product_id)
+    for product_list in (*by_category.values(), *by_shop_category.values()):
+        product_list.sort(key=lambda pk: (-popularity.get(pk, 0), pk))
+    return by_category, by_shop_category
+
+
+def _rows_for(product_id, neighbours, padding, top_k):
+    """Rank ``neighbours`` (``(id, co_count)`` pairs), then pad with ``padding`` ids up to ``top_k``."""
+    rows = [
+        ProductRecommendation(
+            product_id=product_id,
+            recommended_id=other,
+            rank=rank,
+            score=score,
+            source=ProductRecommendation.SOURCE_CO_PURCHASE,
+        )
+        for rank, (other, score) in enumerate(neighbours[:top_k], start=1)
+    ]
+    taken = {product_id} | {row.recommended_id for row in rows}
+    for candidate in padding:
+        if len(rows) >= top_k:
+            break
+        if candidate in taken:
+            continue
+        taken.add(candidate)
+        rows.append(
+            ProductRecommendation(
+                product_id=product_id,
+                recommended_id=candidate,
+                rank=len(rows) + 1,
+                source=ProductRecommendation.SOURCE_CATEGORY,
+            )
+        )
+    return rows
+
+
+def build_recommendations(top_k=None):
+    """Rebuild the whole recommendation table from the order history."""
+    top_k = top_k or settings.RECOMMENDATIONS_TOP_K
+    last_order_id = _last_order_id()
+    columns, co_counts, purchases = _co_purchase_matrix(_order_items(0, last_order_id))
+    neighbours = _top_neighbours(columns, co_counts, top_k)
+    by_category, by_shop_category = _category_padding(dict(zip(columns.tolist(), purchases.tolist())))
+    with transaction.atomic():
+        ProductRecommendation.objects.all().delete()
+        batch = []
+        products = Product.objects.values_list('id', 'shop_id', 'category_id')
+        for product_id, shop_id, category_id in products.iterator(chunk_size=10000):
+            padding = chain(by_shop_category.get((category_id, shop_id), ()), by_category.get(category_id, ()))
+            batch += _rows_for(product_id, neighbours.get(product_id, []), padding, top_k)
+            if len(batch) >= 5000:
+                ProductRecommendation.objects.bulk_create(batch)
+                batch = []
+        ProductRecommendation.objects.bulk_create(batch)
+    redis_client.set(RECOMMENDATIONS_WATERMARK_KEY, last_order_id)
+    return len(neighbours)
+
+
+def refresh_recommendations(top_k=None):
+    """Fold the orders placed since the last build or refresh into the stored neighbour lists.
+
+    Co-purchase counts of the new orders are added to the stored scores of the products they
+    touch. A pair that was below a product's top-K cut-off before the refresh is only seen again
+    by the next full build, so the refresh is exact for new pairs and approximate otherwise.
+    """
+    top_k = top_k or settings.RECOMMENDATIONS_TOP_K
+    watermark = redis_client.get(RECOMMENDATIONS_WATERMARK_KEY)
+    if watermark is None:
+        return build_recommendations(top_k)
+    last_order_id = _last_order_id()
+    columns, co_counts, _ = _co_purchase_matrix(_order_items(int(watermark), last_order_id))
+    deltas = _top_neighbours(columns, co_counts, co_counts.shape[1])
+    if deltas:
+        scores = defaultdict(dict)
+        padding = defaultdict(list)
+        for row in ProductRecommendation.objects.filter(product_id__in=deltas.keys()).order_by('product_id', 'rank'):
+            if row.source == ProductRecommendation.SOURCE_CO_PURCHASE:
+                scores[row.product_id][row.recommended_id] = row.score
+            else:
+                padding[row.product_id].append(row.recommended_id)
+        rows = []
+        for product_id, delta in deltas.items():
+            for other, count in delta:
+                scores[product_id][other] = scores[product_id].get(other, 0) + count
+            ranked = sorted(scores[product_id].items(), key=lambda item: (-item[1], item[0]))
+            rows += _rows_for(product_id, ranked, padding[product_id], top_k)
+        with transaction.atomic():
+            ProductRecommendation.objects.filter(product_id__in=deltas.keys()).delete()
+            ProductRecommendation.objects.bulk_create(rows, batch_size=5000)
+    redis_client.set(RECOMMENDATIONS_WATERMARK_KEY, last_order_id)
+    return len(deltas)
@@ -0,0 +1,202 @@
+"""Two-tier cache for small reference entities (categories, shops) looked up on hot request paths.
+
+Rows are kept in a per-process LRU with a short TTL, in front of Redis with a longer one, and
+rebuilt with ``Model.from_db`` so callers get ordinary model instances. Only rows that exist are
+cached, so a row created after its id was looked up is found straight away. Saving or deleting an
+instance invalidates its row once the transaction commits (``connect_signals``, from
+``AppConfig.ready``): the Redis copy is deleted and the primary key is broadcast over pub/sub so
+every worker drops its in-process copy too. Writes that send no signals (``QuerySet.update``, raw
+SQL) show up after ``REFERENCE_CACHE_TTL``, as does a reader racing a write that put back the
+previous row.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.gis.db.models import GeometryField
+from django.contrib.gis.geos import GEOSGeometry
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from .models import ArtisanShop, Category
+from .services import async_redis, redis_client
+
+logger = logging.getLogger(__name__)
+
+REFERENCE_CACHE_KEY = 'refcache:{}:{}'
+REFERENCE_CACHE_CHANNEL = 'refcache:invalidate'
+
+_MISSING = object()
+
+
+class ReferenceCache:
+    def __init__(self, model):
+        self.model = model
+        self.label = model._meta.label_lower
+        self.fields = model._meta.concrete_fields
+        self.attnames = [field.attname for field in self.fields]
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        _REGISTRY[self.label] = self
+
+    def __deepcopy__(self, memo):
+        # Shared by every copy of the serializer fields that hold it.
+        return self
+
+    def get(self, pk):
+        """Return the instance with primary key ``pk``, or ``None`` when there is none."""
+        pk = _int_pk(pk)
+        if pk is None:
+            return None
+        _ensure_listener()
+        row = self._get_local(pk)
+        if row is _MISSING:
+            key = REFERENCE_CACHE_KEY.format(self.label, pk)
+            raw = redis_client.get(key)
+            if raw is not None:
+                row = json.loads(raw)
+            else:
+                instance = self.model._default_manager.filter(pk=pk).first()
+                if instance is None:
+                    return None
+                row = self._dump(instance)
+                redis_client.set(key, json.dumps(row), ex=settings.REFERENCE_CACHE_TTL)
+            self._set_local(pk, row)
+        return self._load(row)
+
+    async def aget(self, pk):
+        """Async ``get``, reading Redis and Postgres with the async clients."""
+        pk = _int_pk(pk)
+        if pk is None:
+            return None
+        _ensure_listener()
+        row = self._get_local(pk)
+        if row is _MISSING:
+            key = REFERENCE_CACHE_KEY.format(self.label, pk)
+            raw = await async_redis().get(key)
+            if raw is not None:
+                row = json.loads(raw)
+            else:
+                instance = await self.model._default_manager.filter(pk=pk).afirst()
+                if instance is None:
+                    return None
+                row = self._dump(instance)
+                await async_redis().set(key, json.dumps(row), ex=settings.REFERENCE_CACHE_TTL)
+            self._set_local(pk, row)
+        return self._load(row)
+
+    def invalidate(self, *pks):
+        if not pks:
+            return
+        for pk in pks:
+            self.forget(pk)
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.delete(*[REFERENCE_CACHE_KEY.format(self.label, pk) for pk in pks])
+        for pk in pks:
+            pipe.publish(REFERENCE_CACHE_CHANNEL, f'{self.label}:{pk}')
+        pipe.execute()
+
+    def invalidate_on_commit(self, *pks):
+        if pks:
+            transaction.on_commit(lambda: self.invalidate(*pks))
+
+    def _saved(self, sender, instance, created, **kwargs):
+        # A new row cannot be cached yet: misses are not stored.
+        if not created:
+            self.invalidate_on_commit(instance.pk)
+
+    def _deleted(self, sender, instance, **kwargs):
+        self.invalidate_on_commit(instance.pk)
+
+    def forget(self, pk):
+        with self._lock:
+            self._local.pop(int(pk), None)
+
+    def _get_local(self, pk):
+        with self._lock:
+            entry = self._local.get(pk)
+            if entry is None:
+                return _MISSING
+            expires_at, row = entry
+            if expires_at < time.monotonic():
+                del self._local[pk]
+                return _MISSING
+            self._local.move_to_end(pk)
+            return row
+
+    def _set_local(self, pk, row):
+        with self._lock:
+            self._local[pk] = (time.monotonic() + settings.REFERENCE_CACHE_LOCAL_TTL, row)
+            self._local.move_to_end(pk)
+            while len(self._local) > settings.REFERENCE_CACHE_MAXSIZE:
+                self._local.popitem(last=False)
+
+    def _dump(self, instance):
+        row = []
+        for field in self.fields:
+            value = field.value_from_object(instance)
+            if value is not None:
+                value = value.ewkt if isinstance(field, GeometryField) else field.value_to_string(instance)
+            row.append(value)
+        return row
+
+    def _load(self, row):
+        values = []
+        for field, value in zip(self.fields, row):
+            if value is not None:
+                value = GEOSGeometry(value) if isinstance(field, GeometryField) else field.to_python(value)
+            values.append(value)
+        return self.model.from_db('default', self.attnames, values)
+
+
+def _int_pk(pk):
+    try:
+        return int(pk)
+    except (TypeError, ValueError):
+        return None
+
+
+_REGISTRY = {}
+_listener = {'pid': None}
+_listener_lock = threading.Lock()
+
+
+def connect_signals():
+    """Invalidate the cached row of every saved or deleted instance of a cached model."""
+    for label, cache in _REGISTRY.items():
+        post_save.connect(cache._saved, sender=cache.model, weak=False, dispatch_uid=f'refcache.saved.{label}')
+        post_delete.connect(cache._deleted, sender=cache.model, weak=False, dispatch_uid=f'refcache.deleted.{label}')
+
+
+def _handle_invalidation(message):
+    label, _, pk = message['data'].decode().rpartition(':')
+    cache = _REGISTRY.get(label)
+    if cache is not None:
+        cache.forget(pk)
+
+
+def _ensure_listener():
+    """Subscribe this process to invalidation broadcasts; started lazily so forked workers get their own."""
+    if _listener['pid'] == os.getpid():
+        return
+    with _listener_lock:
+        if _listener['pid'] == os.getpid():
+            return
+        try:
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{REFERENCE_CACHE_CHANNEL: _handle_invalidation})
+            pubsub.run_in_thread(sleep_time=1, daemon=True)
+        except Exception:
+            # Without the broadcast, local copies still expire after ``REFERENCE_CACHE_LOCAL_TTL``.
+            logger.warning('Could not subscribe to reference cache invalidations', exc_info=True)
+            return
+        _listener['pid'] = os.getpid()
+
+
+category_cache = ReferenceCache(Category)
+shop_cache = ReferenceCache(ArtisanShop)
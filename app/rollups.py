@@ -0,0 +1,204 @@
+"""Daily sales rollups feeding the artisan dashboard.
+
+``ShopDailySales`` and ``ShopProductDailySales`` hold the completed-order revenue of each shop
+(and product) per day of ``Order.created_at``. They are kept current incrementally when an order
+enters or leaves ``STATUS_COMPLETED`` through ``change_order_status`` and rebuilt from the raw orders
+by the backfill command and the nightly reconciliation task. Any other write to a completed order
+(``QuerySet.update``, a plain ``save``, a delete or raw SQL) is recorded by a trigger as a
+``SalesRollupChange``, and ``rebuild_changed_rollups`` rebuilds those days within minutes.
+"""
+
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import Category, Order, OrderItem, Product, SalesRollupChange, ShopDailySales, ShopProductDailySales
+
+
+def apply_order_to_rollups(order, sign):
+    """Add (``sign=1``) or remove (``sign=-1``) a completed order from its day's rollups."""
+    day = timezone.localdate(order.created_at)
+    lines = list(
+        order.items.filter(created_at=order.created_at)
+        .order_by()
+        .values('product_id')
+        .annotate(revenue=Sum('total_price'), quantity=Sum('quantity'))
+    )
+    revenue = sum((line['revenue'] for line in lines), Decimal(0))
+    daily = connection.ops.quote_name(ShopDailySales._meta.db_table)
+    product_daily = connection.ops.quote_name(ShopProductDailySales._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {daily} (shop_id, day, revenue, orders) VALUES (%s, %s, %s, %s) '
+            f'ON CONFLICT (shop_id, day) DO UPDATE SET revenue = {daily}.revenue + EXCLUDED.revenue, '
+            f'orders = {daily}.orders + EXCLUDED.orders',
+            [order.shop_id, day, sign * revenue, sign],
+        )
+        if not lines:
+            return
+        values = ', '.join(['(%s, %s, %s, %s, %s)'] * len(lines))
+        params = [
+            value
+            for line in lines
+            for value in (order.shop_id, line['product_id'], day, sign * line['revenue'], sign * line['quantity'])
+        ]
+        cursor.execute(
+            f'INSERT INTO {product_daily} (shop_id, product_id, day, revenue, quantity) VALUES {values} '
+            f'ON CONFLICT (shop_id, product_id, day) DO UPDATE SET '
+            f'revenue = {product_daily}.revenue + EXCLUDED.revenue, '
+            f'quantity = {product_daily}.quantity + EXCLUDED.quantity',
+            params,
+        )
+
+
+def rebuild_rollups(start, end, shop_ids=None):
+    """Recompute the rollups of days ``[start, end)`` from the raw completed orders.
+
+    Both rollup levels come from one scan of the orders in range: a ``GROUPING SETS`` query
+    yields the per-product rows and the per-day order counts together, and the half-open
+    ``created_at`` range uses the ``(shop, status, created_at)`` index. Bounding the lines on the
+    same range limits both tables to the partitions of the months in range.
+    """
+    start_at = timezone.make_aware(datetime.combine(start, time.min))
+    end_at = timezone.make_aware(datetime.combine(end, time.min))
+    order_table = connection.ops.quote_name(Order._meta.db_table)
+    item_table = connection.ops.quote_name(OrderItem._meta.db_table)
+    day = 'CAST(o.created_at AT TIME ZONE %s AS date)'
+    shop_filter = 'AND o.shop_id = ANY(%s)' if shop_ids is not None else ''
+    sql = (
+        f'SELECT GROUPING(i.product_id), o.shop_id, {day}, i.product_id, '
+        f'COALESCE(SUM(i.total_price), 0), COALESCE(SUM(i.quantity), 0), COUNT(DISTINCT o.id) '
+        f'FROM {order_table} o LEFT JOIN {item_table} i ON i.order_id = o.id AND i.created_at = o.created_at '
+        f'AND i.created_at >= %s AND i.created_at < %s '
+        f'WHERE o.status = %s AND o.created_at >= %s AND o.created_at < %s {shop_filter} '
+        f'GROUP BY GROUPING SETS ((o.shop_id, {day}, i.product_id), (o.shop_id, {day}))'
+    )
+    tz_name = timezone.get_current_timezone_name()
+    params = [tz_name, start_at, end_at, Order.STATUS_COMPLETED, start_at, end_at]
+    if shop_ids is not None:
+        params.append(list(shop_ids))
+    params += [tz_name, tz_name]
+
+    daily_qs = ShopDailySales.objects.filter(day__gte=start, day__lt=end)
+    product_daily_qs = ShopProductDailySales.objects.filter(day__gte=start, day__lt=end)
+    if shop_ids is not None:
+        daily_qs = daily_qs.filter(shop_id__in=shop_ids)
+        product_daily_qs = product_daily_qs.filter(shop_id__in=shop_ids)
+    with transaction.atomic():
+        daily_qs.delete()
+        product_daily_qs.delete()
+        daily = []
+        batch = []
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            while rows := cursor.fetchmany(2000):
+                for shop_level, shop_id, row_day, product_id, revenue, quantity, orders in rows:
+                    if shop_level:
+                        daily.append(ShopDailySales(shop_id=shop_id, day=row_day, revenue=revenue, orders=orders))
+                    elif product_id is not None:
+                        batch.append(
+                            ShopProductDailySales(
+                                shop_id=shop_id, product_id=product_id, day=row_day, revenue=revenue, quantity=quantity
+                            )
+                        )
+                ShopProductDailySales.objects.bulk_create(batch)
+                batch = []
+        ShopDailySales.objects.bulk_create(daily, batch_size=2000)
+
+
+def shop_sales_breakdown(shop_id, start=None, end=None):
+    """Total, per-category and per-product revenue of a shop in one pass over its rollups.
+
+    Returns ``(total_revenue, category_rows, product_rows)``; product rows are sorted by revenue.
+    """
+    rollup_table = connection.ops.quote_name(ShopProductDailySales._meta.db_table)
+    product_table = connection.ops.quote_name(Product._meta.db_table)
+    category_table = connection.ops.quote_name(Category._meta.db_table)
+    params = [shop_id]
+    day_filter = ''
+    if start is not None:
+        day_filter = 'AND s.day >= %s AND s.day < %s'
+        params += [start, end]
+    sql = (
+        f'SELECT GROUPING(p.id, c.name), p.id, p.name, c.name, SUM(s.revenue), SUM(s.quantity) '
+        f'FROM {rollup_table} s '
+        f'JOIN {product_table} p ON p.id = s.product_id '
+        f'JOIN {category_table} c ON c.id = p.category_id '
+        f'WHERE s.shop_id = %s {day_filter} '
+        f'GROUP BY GROUPING SETS ((p.id, p.name), (c.name), ())'
+    )
+    total_revenue = 0
+    categories = []
+    products = []
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        for level, product_id, product_name, category_name, revenue, quantity in cursor.fetchall():
+            if level == 0b01:
+                products.append((product_id, product_name, revenue, quantity))
+            elif level == 0b10:
+                categories.append((category_name, revenue))
+            elif level == 0b11:
+                total_revenue = revenue or 0
+    products.sort(key=lambda row: row[2], reverse=True)
+    return total_revenue, categories, products
+
+
+def month_range(year, month):
+    start = date(year, month, 1)
+    end = date(year + month // 12, month % 12 + 1, 1)
+    return start, end
+
+
+def iter_month_ranges(start, end):
+    """Split ``[start, end)`` into calendar-month chunks so rebuilds keep short transactions."""
+    current = start
+    while current < end:
+        _, month_end = month_range(current.year, current.month)
+        chunk_end = min(month_end, end)
+        yield current, chunk_end
+        current = chunk_end
+
+
+def reconcile_recent_rollups(days):
+    """Rebuild the last ``days`` closed days, repairing drift from writes that bypassed the service layer."""
+    end = timezone.localdate()
+    start = end - timedelta(days=days)
+    rebuild_rollups(start, end)
+    return start, end
+
+
+def rebuild_changed_rollups(batch_size=500):
+    """Rebuild the rollups of the shop days recorded as ``SalesRollupChange``; return the shops rebuilt.
+
+    Changes are consumed in batches, each deleted in the transaction that rebuilds its days. A change
+    recorded while its day is being rebuilt waits for that transaction and is picked up next time.
+    """
+    table = connection.ops.quote_name(SalesRollupChange._meta.db_table)
+    rebuilt = set()
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {table} WHERE id IN (SELECT id FROM {table} ORDER BY id LIMIT %s FOR UPDATE SKIP LOCKED) '
+                f'RETURNING shop_id, day',
+                [batch_size],
+            )
+            changes = cursor.fetchall()
+            shops_by_day = defaultdict(set)
+            for shop_id, day in changes:
+                shops_by_day[day].add(shop_id)
+            for day, shop_ids in sorted(shops_by_day.items()):
+                # Changes are recorded per UTC day; the local days it overlaps lie within a day of it.
+                rebuild_rollups(day - timedelta(days=1), day + timedelta(days=2), shop_ids=sorted(shop_ids))
+                rebuilt |= shop_ids
+        if len(changes) < batch_size:
+            return sorted(rebuilt)
+
+
+def discard_rollup_changes():
+    """Forget the recorded changes, after a full rebuild made them moot."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'TRUNCATE {connection.ops.quote_name(SalesRollupChange._meta.db_table)}')
@@ -0,0 +1,195 @@
+"""Send the reads of selected endpoints to read replicas.
+
+``DATABASE_REPLICAS`` lists the aliases of replica databases (from ``DATABASE_REPLICA_URLS``). Reads
+stay on the primary unless the view handling the request opts in with ``use_replica()``, which the
+read-only catalog, geosearch, recommendation and dashboard endpoints do. One replica serves all
+of a request's reads. Within that request, a write, an open transaction on the primary or
+``select_for_update`` sends the reads that follow to the primary.
+
+A request that writes pins its user to the primary for ``REPLICA_PIN_SECONDS``. While pinned, the
+user's reads skip the replicas, so a customer sees their own order right after
+``POST /api/orders/`` even when the replicas lag. Tasks, commands and requests outside
+``ReplicaRoutingMiddleware`` never use a replica, and neither does anything when
+``DATABASE_REPLICAS`` is empty.
+
+Results cached or tagged under a version bumped on the primary must not come from a lagging
+replica, or they would be served as current until the next bump. Dashboard KPIs and geosearch
+tiles computed on a replica are not cached within ``REPLICA_PIN_SECONDS`` of a change (see
+``app.services.cached_dashboard_kpis`` and ``app.geotiles``), and catalog endpoints read from the
+primary inside ``primary_reads()`` for that long after the catalog changes (see
+``app.api.conditional``).
+"""
+
+import logging
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import redis
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from app.services import async_redis, redis_client
+
+logger = logging.getLogger(__name__)
+
+PIN_KEY = 'db:pin:user:{}'
+
+
+class RoutingState:
+    """Database routing of one request; mutated in place so ``sync_to_async`` threads share it."""
+
+    __slots__ = ('replica', 'wrote')
+
+    def __init__(self):
+        self.replica = None
+        self.wrote = False
+
+
+_current = ContextVar('database_routing', default=None)
+_primary_only = ContextVar('primary_reads', default=False)
+
+
+@contextmanager
+def primary_reads():
+    """Send the reads inside the block to the primary, even in a request reading from a replica."""
+    token = _primary_only.set(True)
+    try:
+        yield
+    finally:
+        _primary_only.reset(token)
+
+
+def _user_id(user):
+    return user.pk if user is not None and user.is_authenticated else None
+
+
+def _routable(state):
+    return state is not None and not state.wrote and bool(settings.DATABASE_REPLICAS)
+
+
+def _choose_replica(state):
+    state.replica = random.choice(settings.DATABASE_REPLICAS)
+    return True
+
+
+def use_replica(user=None):
+    """Route the current request's reads to a replica unless ``user`` is pinned to the primary.
+
+    Returns whether the reads go to a replica.
+    """
+    state = _current.get()
+    if not _routable(state):
+        return False
+    user_id = _user_id(user)
+    if user_id is not None:
+        try:
+            if redis_client.exists(PIN_KEY.format(user_id)):
+                return False
+        except redis.RedisError:
+            logger.warning('Could not read the primary pin of user %s; reading from the primary', user_id)
+            return False
+    return _choose_replica(state)
+
+
+async def ause_replica(user=None):
+    """Async ``use_replica``."""
+    state = _current.get()
+    if not _routable(state):
+        return False
+    user_id = _user_id(user)
+    if user_id is not None:
+        try:
+            if await async_redis().exists(PIN_KEY.format(user_id)):
+                return False
+        except redis.RedisError:
+            logger.warning('Could not read the primary pin of user %s; reading from the primary', user_id)
+            return False
+    return _choose_replica(state)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _current.get()
+        if state is None or state.replica is None or state.wrote or _primary_only.get():
+            return None
+        # Reads inside a transaction on the primary (``select_for_update`` included) must see its writes.
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _current.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def _pin(user_id):
+    try:
+        redis_client.set(PIN_KEY.format(user_id), 1, ex=settings.REPLICA_PIN_SECONDS)
+    except redis.RedisError:
+        logger.warning('Could not pin user %s to the primary', user_id)
+
+
+async def _apin(user_id):
+    try:
+        await async_redis().set(PIN_KEY.format(user_id), 1, ex=settings.REPLICA_PIN_SECONDS)
+    except redis.RedisError:
+        logger.warning('Could not pin user %s to the primary', user_id)
+
+
+def _request_user_id(request):
+    # DRF copies the user it authenticated onto the Django request.
+    return _user_id(getattr(request, 'user', None))
+
+
+class ReplicaRoutingMiddleware:
+    """Give each request its routing state and pin users who wrote to the primary."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = RoutingState()
+        token = _current.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        if state.wrote and settings.DATABASE_REPLICAS:
+            user_id = _request_user_id(request)
+            if user_id is not None:
+                _pin(user_id)
+        return response
+
+    async def __acall__(self, request):
+        state = RoutingState()
+        token = _current.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        if state.wrote and settings.DATABASE_REPLICAS:
+            user_id = await sync_to_async(_request_user_id)(request)
+            if user_id is not None:
+                await _apin(user_id)
+        return response
@@ -0,0 +1,552 @@
+"""Synthetic marketplace data at production scale, for ``manage.py seed_marketplace``.
+
+Every row is drawn by vectorized NumPy samplers: shops and their products cluster around a few
+cities, a few shops and the first products of each shop take most of the orders, and order times
+follow a seasonal curve (holiday peak, summer dip, busier weekends and evenings, steady growth).
+A ``SeedPlan`` holds what several tables share, such as the shop layout and product prices, and
+each table is generated in chunks that are streamed into Postgres with ``COPY`` and committed
+separately, so the chunks can be spread over processes. A chunk draws from its own generator
+seeded with ``(seed, phase, chunk)``, so the data depends on the seed, the sizes and the chunk size
+but not on the number of processes; only the ids of order items, delivery schedules and alerts,
+which come from their sequences, follow the load order.
+"""
+
+import multiprocessing
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime
+from datetime import timezone as dt_timezone
+
+import numpy as np
+from django.apps import apps
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+
+from .models import ArtisanShop, Category, DeliverySchedule, InventoryAlert, Order, OrderItem, Product, User
+from .partitions import ensure_partitions
+from .services import LOW_STOCK_THRESHOLD
+
+# name, longitude, latitude, share of shops
+CITIES = (
+    ('New York', -73.99, 40.73, 0.2),
+    ('London', -0.12, 51.51, 0.15),
+    ('Paris', 2.35, 48.86, 0.1),
+    ('Berlin', 13.40, 52.52, 0.1),
+    ('Lisbon', -9.14, 38.72, 0.05),
+    ('Istanbul', 28.98, 41.01, 0.08),
+    ('Tokyo', 139.69, 35.69, 0.12),
+    ('San Francisco', -122.42, 37.77, 0.08),
+    ('Mexico City', -99.13, 19.43, 0.07),
+    ('Melbourne', 144.96, -37.81, 0.05),
+)
+# name, typical price, share of products, product nouns
+CATEGORIES = (
+    ('Ceramics', 38, 0.16, ('Mug', 'Bowl', 'Vase', 'Plate')),
+    ('Jewelry', 65, 0.15, ('Ring', 'Necklace', 'Bracelet', 'Earrings')),
+    ('Textiles', 55, 0.12, ('Scarf', 'Quilt', 'Rug', 'Tote Bag')),
+    ('Woodwork', 45, 0.1, ('Cutting Board', 'Spoon', 'Stool', 'Frame')),
+    ('Leather Goods', 80, 0.08, ('Wallet', 'Belt', 'Satchel', 'Journal Cover')),
+    ('Glass', 42, 0.07, ('Tumbler', 'Ornament', 'Lamp', 'Paperweight')),
+    ('Candles & Soap', 18, 0.12, ('Candle', 'Soap Bar', 'Bath Bomb', 'Diffuser')),
+    ('Paper Goods', 22, 0.09, ('Notebook', 'Print', 'Card Set', 'Calendar')),
+    ('Metalwork', 70, 0.05, ('Knife', 'Hook', 'Candle Holder', 'Bottle Opener')),
+    ('Toys', 30, 0.06, ('Puzzle', 'Doll', 'Wooden Train', 'Kite')),
+)
+ADJECTIVES = np.array(
+    ['Hand-thrown', 'Rustic', 'Speckled', 'Minimal', 'Vintage', 'Hammered', 'Woven', 'Carved', 'Glazed', 'Botanical']
+    + ['Indigo', 'Sunset', 'Small-batch', 'Reclaimed', 'Linen', 'Oak', 'Copper', 'Moss', 'Coastal', 'Folk']
+)
+FIRST_NAMES = np.array(['Ada', 'Bea', 'Cai', 'Dev', 'Eli', 'Femi', 'Gus', 'Hana', 'Ines', 'Jun', 'Kofi', 'Lena'])
+LAST_NAMES = np.array(['Okafor', 'Silva', 'Tanaka', 'Novak', 'Haddad', 'Larsen', 'Moreau', 'Kaya', 'Reyes', 'Byrne'])
+STREETS = np.array(['Market Street', 'High Street', 'Mill Lane', 'Church Road', 'Station Road', 'Harbour Way'])
+# Relative order volume by hour of day (UTC).
+HOURLY_PROFILE = np.array(
+    [0.3, 0.2, 0.15, 0.1, 0.1, 0.15, 0.3, 0.5, 0.7, 0.8, 0.9, 1.0]
+    + [1.1, 1.1, 1.0, 1.0, 1.0, 1.1, 1.3, 1.5, 1.6, 1.4, 1.0, 0.6]
+)
+
+PHASES = ('users', 'shops', 'products', 'orders')
+ORDER_STATUSES = np.array(
+    [Order.STATUS_PENDING, Order.STATUS_PROCESSING, Order.STATUS_COMPLETED, Order.STATUS_CANCELLED]
+)
+PENDING, PROCESSING, COMPLETED, CANCELLED = range(4)
+# Probability that the nth (0-based) product of a shop is picked falls off as rank ** (1 / skew - 1).
+POPULARITY_SKEW = 3.0
+MAX_ORDER_LINES = 8
+DAY = 86400.0
+KM_PER_DEGREE = 111.32
+
+
+@dataclass(frozen=True)
+class SeedSizes:
+    customers: int = 20000
+    shops: int = 500
+    products: int = 50000
+    orders: int = 400000
+    items_per_order: float = 2.5
+    history_days: int = 730
+
+    def scaled(self, scale):
+        return SeedSizes(
+            customers=round(self.customers * scale),
+            shops=max(1, round(self.shops * scale)),
+            products=round(self.products * scale),
+            orders=round(self.orders * scale),
+            items_per_order=self.items_per_order,
+            history_days=self.history_days,
+        )
+
+
+@dataclass
+class SeedPlan:
+    seed: int
+    sizes: SeedSizes
+    now: float
+    history_start: float
+    category_ids: np.ndarray
+    shop_city: np.ndarray
+    shop_lng: np.ndarray
+    shop_lat: np.ndarray
+    shop_created: np.ndarray
+    shop_category: np.ndarray
+    shop_offset: np.ndarray
+    shop_products: np.ndarray
+    shop_order_share: np.ndarray
+    product_category: np.ndarray
+    product_cents: np.ndarray
+    order_time_cdf: np.ndarray
+
+    @property
+    def user_count(self):
+        return self.sizes.shops + self.sizes.customers
+
+
+def _scatter(rng, lng, lat, km):
+    """Normal scatter of ``km`` standard deviation around each point."""
+    lat = lat + rng.normal(0, km, len(lat)) / KM_PER_DEGREE
+    lng = lng + rng.normal(0, km, len(lng)) / (KM_PER_DEGREE * np.cos(np.radians(lat)))
+    return lng, lat
+
+
+def seasonal_hour_weights(start, hours):
+    """Relative order volume of each hour from the epoch second ``start`` on."""
+    moments = (start + np.arange(hours) * 3600).astype('datetime64[s]')
+    day_of_year = (moments.astype('datetime64[D]') - moments.astype('datetime64[Y]')).astype(int)
+    days = moments.astype('datetime64[D]').astype(int)
+    weekday = (days + 3) % 7  # 1970-01-01 was a Thursday; Monday is 0
+    hour = (moments - moments.astype('datetime64[D]')).astype('timedelta64[h]').astype(int)
+    season = 1 + 0.9 * np.exp(-(((day_of_year - 340) / 18) ** 2)) - 0.25 * np.exp(-(((day_of_year - 200) / 30) ** 2))
+    weekly = np.where(weekday >= 5, 1.25, 1.0)
+    growth = np.linspace(1.0, 1.6, hours)
+    return season * weekly * growth * HOURLY_PROFILE[hour]
+
+
+def make_plan(seed, sizes, category_ids, now):
+    """Draw the shop layout, product categories and prices, and the order time distribution."""
+    if sizes.shops < 1 or sizes.products < sizes.shops:
+        raise ValueError('Every shop needs at least one product')
+    if sizes.orders and sizes.customers < 1:
+        raise ValueError('Orders need at least one customer')
+    rng = np.random.default_rng([seed, 0])
+    history_start = (now - sizes.history_days * DAY) // 3600 * 3600
+    city_share = np.array([city[3] for city in CITIES])
+    shop_city = rng.choice(len(CITIES), sizes.shops, p=city_share / city_share.sum())
+    city_lng = np.array([city[1] for city in CITIES])
+    city_lat = np.array([city[2] for city in CITIES])
+    shop_lng, shop_lat = _scatter(rng, city_lng[shop_city], city_lat[shop_city], 6.0)
+    category_share = np.array([category[2] for category in CATEGORIES])
+    category_share /= category_share.sum()
+    shop_category = rng.choice(len(CATEGORIES), sizes.shops, p=category_share)
+
+    # A few large shops and a long tail of small ones, each with at least one product.
+    size_weights = rng.lognormal(0, 1.0, sizes.shops)
+    shop_products = 1 + rng.multinomial(sizes.products - sizes.shops, size_weights / size_weights.sum())
+    shop_offset = np.concatenate([[0], np.cumsum(shop_products)[:-1]])
+    order_weights = shop_products * rng.lognormal(0, 0.75, sizes.shops)
+
+    # Most products belong to their shop's craft; prices scatter around the category's typical price.
+    product_shop = np.repeat(np.arange(sizes.shops), shop_products)
+    own_craft = rng.random(sizes.products) < 0.7
+    product_category = np.where(
+        own_craft, shop_category[product_shop], rng.choice(len(CATEGORIES), sizes.products, p=category_share)
+    ).astype(np.int16)
+    typical_price = np.array([category[1] for category in CATEGORIES], dtype=float)
+    prices = typical_price[product_category] * rng.lognormal(0, 0.5, sizes.products)
+    product_cents = np.rint(np.clip(prices, 3, 5000) * 100).astype(np.int64)
+
+    hours = int((now - history_start) // 3600)
+    weights = seasonal_hour_weights(history_start, hours)
+    order_time_cdf = np.concatenate([[0.0], np.cumsum(weights) / weights.sum()])
+    return SeedPlan(
+        seed=seed,
+        sizes=sizes,
+        now=now,
+        history_start=history_start,
+        category_ids=np.asarray(category_ids),
+        shop_city=shop_city,
+        shop_lng=shop_lng,
+        shop_lat=shop_lat,
+        shop_created=history_start - rng.uniform(30, 730, sizes.shops) * DAY,
+        shop_category=shop_category,
+        shop_offset=shop_offset,
+        shop_products=shop_products,
+        shop_order_share=order_weights / order_weights.sum(),
+        product_category=product_category,
+        product_cents=product_cents,
+        order_time_cdf=order_time_cdf,
+    )
+
+
+def _datetimes(seconds):
+    return (np.asarray(seconds) * 1e6).astype(np.int64).astype('datetime64[us]')
+
+
+def _points(lng, lat):
+    return np.char.add(
+        np.char.add(np.char.add('SRID=4326;POINT(', np.char.mod('%.6f', lng)), ' '),
+        np.char.add(np.char.mod('%.6f', lat), ')'),
+    )
+
+
+def _join(*parts):
+    result = parts[0]
+    for part in parts[1:]:
+        result = np.char.add(result, part)
+    return result
+
+
+def generate_users(plan, start, stop, rng):
+    """Users ``start + 1`` to ``stop``: the artisans owning shops ``1..shops`` first, then the customers."""
+    ids = np.arange(start, stop) + 1
+    count = len(ids)
+    artisan = ids <= plan.sizes.shops
+    first = FIRST_NAMES[rng.integers(0, len(FIRST_NAMES), count)]
+    last = LAST_NAMES[rng.integers(0, len(LAST_NAMES), count)]
+    username = _join(np.where(artisan, 'seed-artisan-', 'seed-customer-'), ids.astype(str))
+    shop_created = plan.shop_created[np.minimum(ids, plan.sizes.shops) - 1]
+    joined = np.where(
+        artisan,
+        shop_created - rng.uniform(0, 30, count) * DAY,
+        plan.history_start - rng.uniform(0, 365, count) * DAY,
+    )
+    return [
+        (
+            User,
+            {
+                'id': ids,
+                'password': np.full(count, '!'),
+                'is_superuser': np.zeros(count, dtype=bool),
+                'username': username,
+                'first_name': first,
+                'last_name': last,
+                'email': np.char.add(username, '@example.com'),
+                'is_staff': np.zeros(count, dtype=bool),
+                'is_active': np.ones(count, dtype=bool),
+                'date_joined': _datetimes(joined),
+                'role': np.where(artisan, User.ROLE_ARTISAN, User.ROLE_CUSTOMER),
+            },
+        )
+    ]
+
+
+def generate_shops(plan, start, stop, rng):
+    """Shops ``start + 1`` to ``stop``; shop ``n`` is owned by user ``n``."""
+    index = np.arange(start, stop)
+    count = len(index)
+    craft = np.array([category[0] for category in CATEGORIES])[plan.shop_category[index]]
+    city = np.array([city[0] for city in CITIES])[plan.shop_city[index]]
+    last = LAST_NAMES[rng.integers(0, len(LAST_NAMES), count)]
+    return [
+        (
+            ArtisanShop,
+            {
+                'id': index + 1,
+                'owner_id': index + 1,
+                'name': _join(last, ' ', craft, ' Studio ', (index + 1).astype(str)),
+                'description': _join(craft, ' made by hand in ', city),
+                'location': _points(plan.shop_lng[index], plan.shop_lat[index]),
+                'created_at': _datetimes(plan.shop_created[index]),
+            },
+        )
+    ]
+
+
+def generate_products(plan, start, stop, rng):
+    """Products ``start + 1`` to ``stop``, and the inventory alerts of those low on stock."""
+    index = np.arange(start, stop)
+    count = len(index)
+    shop = np.searchsorted(plan.shop_offset, index, side='right') - 1
+    rank = index - plan.shop_offset[shop]
+    category = plan.product_category[index]
+    nouns = np.array([category[3] for category in CATEGORIES])
+    noun = nouns[category, rng.integers(0, nouns.shape[1], count)]
+    cents = plan.product_cents[index]
+    quantity = rng.negative_binomial(2, 0.06, count)
+    lng, lat = _scatter(rng, plan.shop_lng[shop], plan.shop_lat[shop], 1.5)
+    created = plan.shop_created[shop] + rng.random(count) * (plan.history_start - plan.shop_created[shop])
+
+    # Flash sales on a few products, from a week ago to a few days ahead.
+    on_sale = rng.random(count) < 0.02
+    sale_start = plan.now + rng.uniform(-7, 3, count) * DAY
+    sale_end = sale_start + rng.uniform(1, 7, count) * DAY
+    sale_cents = np.rint(cents * rng.uniform(0.6, 0.9, count))
+    sale_active = on_sale & (sale_start <= plan.now) & (plan.now < sale_end)
+    nat = np.datetime64('NaT', 'us')
+
+    # An open alert for every product at or under the threshold, and resolved ones from the past.
+    low = quantity <= LOW_STOCK_THRESHOLD
+    restocked = rng.random(count) < 0.03
+    alert_products = np.concatenate([index[low], index[restocked]])
+    alert_times = np.concatenate(
+        [
+            plan.now - rng.uniform(0, 14, low.sum()) * DAY,
+            plan.now - rng.uniform(15, plan.sizes.history_days, restocked.sum()) * DAY,
+        ]
+    )
+    return [
+        (
+            Product,
+            {
+                'id': index + 1,
+                'shop_id': shop + 1,
+                'name': _join(ADJECTIVES[rng.integers(0, len(ADJECTIVES), count)], ' ', noun),
+                'sku': np.char.add('SKU-', np.char.zfill((rank + 1).astype(str), 6)),
+                'description': np.char.add('Handmade ', np.char.lower(noun)),
+                'price': cents / 100,
+                'quantity': quantity,
+                'category_id': plan.category_ids[category],
+                'location': _points(lng, lat),
+                'is_hot': np.zeros(count, dtype=bool),
+                'flash_sale_price': np.where(on_sale, sale_cents / 100, np.nan),
+                'flash_sale_start': np.where(on_sale, _datetimes(sale_start), nat),
+                'flash_sale_end': np.where(on_sale, _datetimes(sale_end), nat),
+                'on_flash_sale': sale_active,
+                'effective_price': np.where(sale_active, sale_cents, cents) / 100,
+                'created_at': _datetimes(created),
+                'updated_at': _datetimes(created),
+            },
+        ),
+        (
+            InventoryAlert,
+            {
+                'shop_id': shop[alert_products - start] + 1,
+                'product_id': alert_products + 1,
+                'triggered_at': _datetimes(alert_times),
+                'quantity': np.concatenate([quantity[low], rng.integers(0, LOW_STOCK_THRESHOLD + 1, restocked.sum())]),
+                'resolved': np.concatenate([np.zeros(low.sum(), dtype=bool), np.ones(restocked.sum(), dtype=bool)]),
+            },
+        ),
+    ]
+
+
+def generate_orders(plan, start, stop, rng):
+    """Orders ``start + 1`` to ``stop`` with their lines and delivery schedules.
+
+    Order times are stratified over the seasonal distribution, so they grow with the order id.
+    """
+    sizes = plan.sizes
+    index = np.arange(start, stop)
+    count = len(index)
+    quantiles = (index + rng.random(count)) / sizes.orders
+    hour_edges = plan.history_start + np.arange(len(plan.order_time_cdf)) * 3600.0
+    created = np.interp(quantiles, plan.order_time_cdf, hour_edges)
+    shop = rng.choice(sizes.shops, count, p=plan.shop_order_share)
+    # Repeat buyers: a minority of the customers place most of the orders.
+    customer = np.minimum((sizes.customers * rng.random(count) ** 2).astype(np.int64), sizes.customers - 1)
+
+    age = (plan.now - created) / DAY
+    draw = rng.random(count)
+    status = np.select(
+        [age < 2, age < 14],
+        [
+            np.select([draw < 0.6, draw < 0.9], [PENDING, PROCESSING], COMPLETED),
+            np.select([draw < 0.05, draw < 0.25], [CANCELLED, PROCESSING], COMPLETED),
+        ],
+        np.where(draw < 0.07, CANCELLED, COMPLETED),
+    )
+
+    # Lines come from the order's shop, skewed towards its first products; a product appears once per order.
+    lines = np.minimum(1 + rng.poisson(max(sizes.items_per_order - 1, 0), count), MAX_ORDER_LINES)
+    lines = np.minimum(lines, plan.shop_products[shop])
+    line_order = np.repeat(np.arange(count), lines)
+    line_shop = shop[line_order]
+    line_rank = (plan.shop_products[line_shop] * rng.random(len(line_order)) ** POPULARITY_SKEW).astype(np.int64)
+    keys = np.unique(line_order * sizes.products + plan.shop_offset[line_shop] + line_rank)
+    line_order, line_product = np.divmod(keys, sizes.products)
+    quantity = np.minimum(rng.geometric(0.7, len(line_order)), 5)
+    unit_cents = plan.product_cents[line_product]
+    total_cents = unit_cents * quantity
+    order_cents = np.bincount(line_order, weights=total_cents, minlength=count)
+
+    delivered = np.isin(status, [PROCESSING, COMPLETED]) & (rng.random(count) < 0.85)
+    scheduled = created[delivered] + rng.uniform(1, 7, delivered.sum()) * DAY
+    done = status[delivered] == COMPLETED
+    delivered_at = np.minimum(scheduled + rng.uniform(0, 2, delivered.sum()) * DAY, plan.now)
+    city = np.array([city[0] for city in CITIES])[plan.shop_city[shop[delivered]]]
+    return [
+        (
+            Order,
+            {
+                'id': index + 1,
+                'customer_id': sizes.shops + customer + 1,
+                'shop_id': shop + 1,
+                'created_at': _datetimes(created),
+                'total_amount': order_cents / 100,
+                'status': ORDER_STATUSES[status],
+            },
+        ),
+        (
+            OrderItem,
+            {
+                'order_id': index[line_order] + 1,
+                'product_id': line_product + 1,
+                'quantity': quantity,
+                'unit_price': unit_cents / 100,
+                'total_price': total_cents / 100,
+                'created_at': _datetimes(created[line_order]),
+            },
+        ),
+        (
+            DeliverySchedule,
+            {
+                'order_id': index[delivered] + 1,
+                'scheduled_date': _datetimes(scheduled),
+                'address': _join(
+                    rng.integers(1, 400, delivered.sum()).astype(str),
+                    ' ',
+                    STREETS[rng.integers(0, len(STREETS), delivered.sum())],
+                    ', ',
+                    city,
+                ),
+                'delivered_at': np.where(done, _datetimes(delivered_at), np.datetime64('NaT', 'us')),
+            },
+        ),
+    ]
+
+
+GENERATORS = {
+    'users': generate_users,
+    'shops': generate_shops,
+    'products': generate_products,
+    'orders': generate_orders,
+}
+
+
+def _text(values):
+    """Column values in the ``COPY`` text format; NaN and NaT become NULL."""
+    values = np.asarray(values)
+    nulls = None
+    if values.dtype == bool:
+        return np.where(values, 't', 'f')
+    if np.issubdtype(values.dtype, np.datetime64):
+        nulls = np.isnat(values)
+        text = np.datetime_as_string(values, unit='us', timezone='UTC')
+    elif np.issubdtype(values.dtype, np.floating):
+        nulls = np.isnan(values)
+        text = values.astype(str)
+    else:
+        text = values.astype(str)
+    return np.where(nulls, r'\N', text) if nulls is not None and nulls.any() else text
+
+
+def copy_rows(cursor, model, columns):
+    """Stream ``columns`` (name -> equally long arrays) into the table of ``model``; return the row count."""
+    names = list(columns)
+    texts = [_text(columns[name]).tolist() for name in names]
+    if not texts[0]:
+        return 0
+    table = connection.ops.quote_name(model._meta.db_table)
+    quoted = ', '.join(connection.ops.quote_name(name) for name in names)
+    with cursor.copy(f'COPY {table} ({quoted}) FROM STDIN') as copy:
+        copy.write('\n'.join(map('\t'.join, zip(*texts))) + '\n')
+    return len(texts[0])
+
+
+def chunk_tasks(plan, phase, chunk_size):
+    total = {
+        'users': plan.user_count,
+        'shops': plan.sizes.shops,
+        'products': plan.sizes.products,
+        'orders': plan.sizes.orders,
+    }[phase]
+    return [
+        (phase, chunk, start, min(start + chunk_size, total)) for chunk, start in enumerate(range(0, total, chunk_size))
+    ]
+
+
+_plan = None
+
+
+def _set_plan(plan):
+    global _plan
+    _plan = plan
+
+
+def load_chunk(task):
+    """Generate one chunk and ``COPY`` its tables in one transaction; return ``(phase, row counts)``."""
+    phase, chunk, start, stop = task
+    rng = np.random.default_rng([_plan.seed, PHASES.index(phase) + 1, chunk])
+    counts = Counter()
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('SET LOCAL synchronous_commit TO OFF')
+        for model, columns in GENERATORS[phase](_plan, start, stop, rng):
+            counts[model._meta.label] += copy_rows(cursor, model, columns)
+    return phase, counts
+
+
+def marketplace_is_empty():
+    return not any(model.objects.exists() for model in (User, ArtisanShop, Category, Product, Order))
+
+
+def reset_marketplace():
+    """Empty every table of the app and restart their ids."""
+    tables = ', '.join(
+        connection.ops.quote_name(model._meta.db_table) for model in apps.get_app_config('app').get_models()
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(f'TRUNCATE {tables} RESTART IDENTITY CASCADE')
+
+
+def create_categories():
+    names = [category[0] for category in CATEGORIES]
+    Category.objects.bulk_create([Category(name=name) for name in names], ignore_conflicts=True)
+    ids = dict(Category.objects.filter(name__in=names).values_list('name', 'id'))
+    return [ids[name] for name in names]
+
+
+def seed_marketplace(plan, chunk_size=100000, workers=1, progress=None):
+    """Load every phase of ``plan`` in dependency order; return the row counts per model.
+
+    With several ``workers`` the chunks of a phase are loaded by forked processes, each with its
+    own database connection; a phase starts once every chunk of the previous one is committed.
+    ``progress(phase, counts)`` is called after each chunk.
+    """
+    totals = Counter()
+    _set_plan(plan)
+    # Orders and their lines only load into existing monthly partitions.
+    ensure_partitions(
+        datetime.fromtimestamp(plan.history_start, tz=dt_timezone.utc),
+        datetime.fromtimestamp(plan.now, tz=dt_timezone.utc),
+    )
+    pool = None
+    if workers > 1:
+        # Forked children must open their own connections instead of sharing the parent's socket.
+        connections.close_all()
+        pool = multiprocessing.get_context('fork').Pool(workers)
+    try:
+        for phase in PHASES:
+            tasks = chunk_tasks(plan, phase, chunk_size)
+            results = pool.imap_unordered(load_chunk, tasks) if pool else map(load_chunk, tasks)
+            for done_phase, counts in results:
+                totals.update(counts)
+                if progress:
+                    progress(done_phase, counts)
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+    models = [User, ArtisanShop, Product, Order, OrderItem, DeliverySchedule, InventoryAlert]
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), models):
+            cursor.execute(sql)
+    return totals
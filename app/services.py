@@ -1,94 +1,852 @@
+import asyncio
+import json
+import logging
+import secrets
+import time
+import weakref
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
 import redis
+import redis.asyncio
+from asgiref.sync import sync_to_async
 from django.conf import settings
-from django.db import transaction
-from django.db.models import F, Sum, Window
-from django.db.models.functions import Rank
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import BooleanField, Case, F, FloatField, Q, Sum, Value, When
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+
+from config.celery import app as celery_app
+
+from .connections import redis_pool, redis_url
+from .metrics import AsyncInstrumentedRedis, InstrumentedRedis
+from .models import InventoryAlert, Order, OrderItem, OutboxEvent, Product, ShopDailySales
+from .rollups import apply_order_to_rollups, month_range, shop_sales_breakdown
+
+logger = logging.getLogger(__name__)
+
+redis_client = InstrumentedRedis(connection_pool=redis_pool())
+_async_redis_clients = weakref.WeakKeyDictionary()
+
+
+def async_redis():
+    """The ``redis.asyncio`` client of the running event loop, whose connections cannot serve another loop."""
+    loop = asyncio.get_running_loop()
+    client = _async_redis_clients.get(loop)
+    if client is None:
+        pool = redis.asyncio.BlockingConnectionPool.from_url(
+            redis_url(),
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            timeout=settings.REDIS_POOL_TIMEOUT,
+            health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+        )
+        client = _async_redis_clients[loop] = AsyncInstrumentedRedis(connection_pool=pool)
+    return client
+
+
+LOW_STOCK_THRESHOLD = 3
 
-from .models import InventoryAlert, Order, OrderItem, Product
+# Product columns ``create_order`` needs: stock plus everything ``Product.current_price`` reads.
+ORDER_PRODUCT_FIELDS = ('id', 'name', 'price', 'flash_sale_price', 'flash_sale_start', 'flash_sale_end', 'quantity')
 
-redis_client = redis.Redis.from_url(settings.CACHES['default']['LOCATION'])
+INVENTORY_ALERT_KEY = 'inventory-alert:{}:{}'
+INVENTORY_ALERT_TTL = 3600
+
+DASHBOARD_VERSION_KEY = 'dashboard-version:{}'
+DASHBOARD_CACHE_KEY = 'dashboard:{}'
+DASHBOARD_LOCK_KEY = 'dashboard-lock:{}'
+# Set for ``REPLICA_PIN_SECONDS`` after a version bump, while the replicas may not have replayed it yet.
+DASHBOARD_CHANGED_KEY = 'dashboard-changed:{}'
+# Seconds between polls of a worker waiting for another one to compute the entry.
+DASHBOARD_WAIT_INTERVAL = 0.05
+
+# Version counters and last write times of the public catalog, the validators of conditional GETs.
+CATALOG_VERSION_KEY = 'catalog-version:{}'
+CATALOG_MODIFIED_KEY = 'catalog-modified:{}'
+# Random token of the Redis dataset holding the counters, so counters restarted by a flush never repeat an ETag.
+CATALOG_EPOCH_KEY = 'catalog-epoch'
+CATALOG_PRODUCTS = 'products'
+CATALOG_CATEGORIES = 'categories'
+
+# Text search configuration of the ``search_vector`` trigger (migration 0011).
+SEARCH_CONFIG = 'english'
+
+HOT_STOCK_KEY = 'hot-stock:{}'
+HOT_STOCK_PENDING_KEY = 'hot-stock:pending'
+HOT_STOCK_PROCESSING_KEY = 'hot-stock:processing'
+HOT_STOCK_LOCK_KEY = 'hot-stock:reconcile-lock'
+
+# KEYS: one stock counter per product, then the pending hash.
+# ARGV: one quantity per product, then the matching product ids.
+# Returns the remaining counters, or {-1, i} when counter i is not seeded and {-2, i} when it is short.
+_reserve_hot_stock_script = redis_client.register_script(
+    """
+local n = #KEYS - 1
+for i = 1, n do
+  local available = redis.call('GET', KEYS[i])
+  if not available then return {-1, i} end
+  if tonumber(available) < tonumber(ARGV[i]) then return {-2, i} end
+end
+local remaining = {}
+for i = 1, n do
+  remaining[i] = redis.call('DECRBY', KEYS[i], ARGV[i])
+  redis.call('HINCRBY', KEYS[n + 1], ARGV[n + i], ARGV[i])
+end
+return remaining
+"""
+)
+
+_release_hot_stock_script = redis_client.register_script(
+    """
+local n = #KEYS - 1
+for i = 1, n do
+  redis.call('INCRBY', KEYS[i], ARGV[i])
+  redis.call('HINCRBY', KEYS[n + 1], ARGV[n + i], -tonumber(ARGV[i]))
+end
+return n
+"""
+)
+
+# KEYS: stock counter, pending hash, processing hash. ARGV: Postgres quantity, product id, overwrite flag.
+_seed_hot_stock_script = redis_client.register_script(
+    """
+if ARGV[3] ~= '1' and redis.call('EXISTS', KEYS[1]) == 1 then
+  return tonumber(redis.call('GET', KEYS[1]))
+end
+local pending = tonumber(redis.call('HGET', KEYS[2], ARGV[2]) or '0')
+  + tonumber(redis.call('HGET', KEYS[3], ARGV[2]) or '0')
+local available = math.max(tonumber(ARGV[1]) - pending, 0)
+redis.call('SET', KEYS[1], available)
+return available
+"""
+)
 
 
 def create_order(customer, shop, items):
+    lines = _merge_order_lines(items)
+    hot_products = _hot_products(lines)
+    if hot_products:
+        _reserve_hot_stock(hot_products, lines)
+    try:
+        with transaction.atomic():
+            cold_lines = {pid: quantity for pid, quantity in lines.items() if pid not in hot_products}
+            products = _lock_products(cold_lines) if cold_lines else {}
+            for product_id, quantity in cold_lines.items():
+                product = products[product_id]
+                if product.quantity < quantity:
+                    raise ValueError(f'Insufficient inventory for product {product.name}')
+                product.quantity -= quantity
+            products.update(hot_products)
+            priced_at = timezone.now()
+            total_amount = 0
+            order_items = []
+            for product_id, quantity in lines.items():
+                product = products[product_id]
+                unit_price = product.current_price(priced_at)
+                total_price = unit_price * quantity
+                order_items.append(
+                    OrderItem(product=product, quantity=quantity, unit_price=unit_price, total_price=total_price)
+                )
+                total_amount += total_price
+            if cold_lines:
+                _decrement_stock(cold_lines)
+            order = Order.objects.create(customer=customer, shop=shop, total_amount=total_amount)
+            for order_item in order_items:
+                order_item.order = order
+                order_item.created_at = order.created_at
+            OrderItem.objects.bulk_create(order_items)
+            events = [OutboxEvent(event_type=OutboxEvent.EVENT_ORDER_CREATED, payload=_order_payload(order))]
+            events += [
+                OutboxEvent(
+                    event_type=OutboxEvent.EVENT_STOCK_LOW,
+                    payload={'shop_id': shop.pk, 'product_id': product.pk, 'quantity': product.quantity},
+                )
+                for product in products.values()
+                if product.quantity <= LOW_STOCK_THRESHOLD
+            ]
+            publish_events(events)
+            return order
+    except Exception:
+        if hot_products:
+            _release_hot_stock(hot_products, lines)
+        raise
+
+
+def _merge_order_lines(items):
+    """Collapse cart lines into ``{product_id: quantity}``, summing repeated products."""
+    lines = {}
+    for item in items:
+        product_id = int(item['product'].pk if 'product' in item else item['product_id'])
+        lines[product_id] = lines.get(product_id, 0) + item['quantity']
+    if not lines:
+        raise ValueError('Order must contain at least one item')
+    return lines
+
+
+def _lock_products(lines):
+    """Lock every product of the cart in one statement.
+
+    Rows are locked in primary-key order so two carts sharing products cannot deadlock.
+    """
+    products = {
+        product.pk: product
+        for product in Product.objects.select_for_update()
+        .filter(pk__in=lines.keys())
+        .order_by('pk')
+        .only(*ORDER_PRODUCT_FIELDS)
+    }
+    missing = [product_id for product_id in lines if product_id not in products]
+    if missing:
+        raise ValueError(f'Product {missing[0]} does not exist')
+    return products
+
+
+def _decrement_stock(lines):
+    table = connection.ops.quote_name(Product._meta.db_table)
+    values = ', '.join(['(%s::bigint, %s::integer)'] * len(lines))
+    params = [value for line in lines.items() for value in line]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {table} AS p SET quantity = GREATEST(p.quantity - v.quantity, 0), updated_at = %s '
+            f'FROM (VALUES {values}) AS v(id, quantity) WHERE p.id = v.id RETURNING p.shop_id',
+            [timezone.now(), *params],
+        )
+        shop_ids = {row[0] for row in cursor.fetchall()}
+    invalidate_catalog_on_commit(CATALOG_PRODUCTS)
+    return shop_ids
+
+
+def _hot_products(lines):
+    """Return the hot products of the cart; they are reserved in Redis instead of being row-locked."""
+    if not settings.INVENTORY_RESERVATIONS_ENABLED:
+        return {}
+    return {
+        product.pk: product
+        for product in Product.objects.filter(pk__in=lines.keys(), is_hot=True).only(*ORDER_PRODUCT_FIELDS)
+    }
+
+
+def _reserve_hot_stock(products, lines):
+    product_ids = list(products)
+    keys = [HOT_STOCK_KEY.format(pid) for pid in product_ids] + [HOT_STOCK_PENDING_KEY]
+    args = [lines[pid] for pid in product_ids] + product_ids
+    result = _reserve_hot_stock_script(keys=keys, args=args)
+    if result[0] == -1:
+        for product in products.values():
+            seed_hot_stock(product)
+        result = _reserve_hot_stock_script(keys=keys, args=args)
+    if result[0] < 0:
+        raise ValueError(f'Insufficient inventory for product {products[product_ids[result[1] - 1]].name}')
+    for pid, remaining in zip(product_ids, result):
+        products[pid].quantity = remaining
+
+
+def _release_hot_stock(products, lines):
+    product_ids = list(products)
+    keys = [HOT_STOCK_KEY.format(pid) for pid in product_ids] + [HOT_STOCK_PENDING_KEY]
+    _release_hot_stock_script(keys=keys, args=[lines[pid] for pid in product_ids] + product_ids)
+
+
+def seed_hot_stock(product, overwrite=False):
+    """Initialise the Redis stock counter of a hot product from Postgres, net of unreconciled reservations."""
+    keys = [HOT_STOCK_KEY.format(product.pk), HOT_STOCK_PENDING_KEY, HOT_STOCK_PROCESSING_KEY]
+    return _seed_hot_stock_script(keys=keys, args=[product.quantity, product.pk, int(overwrite)])
+
+
+def reseed_hot_stock_on_save(sender, instance, created, update_fields=None, **kwargs):
+    """``post_save`` receiver resetting the counter of a saved hot product once its transaction commits.
+
+    Restocks through the admin or any other ``save`` reach Redis this way; bulk writes that bypass
+    ``save`` are caught by the ``audit-hot-stock`` beat task, which repairs drifted counters.
+    """
+    if not instance.is_hot or not settings.INVENTORY_RESERVATIONS_ENABLED:
+        return
+    if update_fields is not None and not {'quantity', 'is_hot'} & set(update_fields):
+        return
+    transaction.on_commit(lambda: seed_hot_stock(instance, overwrite=True))
+
+
+def reconcile_hot_stock():
+    """Apply reserved hot-product stock to ``Product.quantity`` in one batched update.
+
+    Pending decrements are moved to a processing hash first, so reservations taken while the
+    update runs land in a fresh pending hash. A leftover processing hash from a crashed run is
+    applied before anything new is taken. Reservations exceeding the stock left in Postgres mean
+    Redis oversold; the stock is clamped at zero and the products are logged as errors.
+    """
+    lock = redis_client.lock(HOT_STOCK_LOCK_KEY, timeout=60)
+    if not lock.acquire(blocking=False):
+        return 0
+    try:
+        if not redis_client.exists(HOT_STOCK_PROCESSING_KEY):
+            try:
+                redis_client.renamenx(HOT_STOCK_PENDING_KEY, HOT_STOCK_PROCESSING_KEY)
+            except redis.ResponseError:
+                return 0
+        pending = {
+            int(pid): int(quantity)
+            for pid, quantity in redis_client.hgetall(HOT_STOCK_PROCESSING_KEY).items()
+            if int(quantity)
+        }
+        if pending:
+            with transaction.atomic():
+                stock = dict(
+                    Product.objects.select_for_update()
+                    .filter(pk__in=pending.keys())
+                    .order_by('pk')
+                    .values_list('pk', 'quantity')
+                )
+                oversold = {
+                    pid: quantity - stock[pid]
+                    for pid, quantity in pending.items()
+                    if quantity > stock.get(pid, quantity)
+                }
+                if oversold:
+                    logger.error('Hot stock oversold by Redis reservations, clamped to 0: %s', oversold)
+                invalidate_dashboard_on_commit(*_decrement_stock(pending))
+        redis_client.delete(HOT_STOCK_PROCESSING_KEY)
+        return len(pending)
+    finally:
+        lock.release()
+
+
+def audit_hot_stock(repair=False):
+    """Compare every hot counter with ``Product.quantity`` minus unreconciled reservations.
+
+    Returns the drifted products; with ``repair`` their counters are reset from Postgres.
+    """
+    if not settings.INVENTORY_RESERVATIONS_ENABLED:
+        return []
+    lock = redis_client.lock(HOT_STOCK_LOCK_KEY, timeout=60)
+    lock.acquire()
+    try:
+        products = list(Product.objects.filter(is_hot=True).only('id', 'quantity'))
+        pipe = redis_client.pipeline(transaction=True)
+        for product in products:
+            pipe.get(HOT_STOCK_KEY.format(product.pk))
+        pipe.hgetall(HOT_STOCK_PENDING_KEY)
+        pipe.hgetall(HOT_STOCK_PROCESSING_KEY)
+        *counters, pending, processing = pipe.execute()
+        drift = []
+        for product, counter in zip(products, counters):
+            field = str(product.pk).encode()
+            expected = max(product.quantity - int(pending.get(field, 0)) - int(processing.get(field, 0)), 0)
+            if counter is None:
+                seed_hot_stock(product)
+            elif int(counter) != expected:
+                drift.append({'product': product.pk, 'redis': int(counter), 'expected': expected})
+                if repair:
+                    seed_hot_stock(product, overwrite=True)
+    finally:
+        lock.release()
+    if drift:
+        logger.warning('Hot stock drift detected for %d products: %s', len(drift), drift)
+    return drift
+
+
+def _order_payload(order):
+    return {'order_id': order.pk, 'shop_id': order.shop_id, 'customer_id': order.customer_id, 'status': order.status}
+
+
+OUTBOX_HANDLERS = {}
+
+
+def outbox_handler(event_type):
+    """Register a handler called with every batch of ``event_type`` events drained from the outbox."""
+
+    def register(handler):
+        OUTBOX_HANDLERS.setdefault(event_type, []).append(handler)
+        return handler
+
+    return register
+
+
+def publish_events(events):
+    """Write side effects to the outbox in the caller's transaction and relay them once it commits."""
+    OutboxEvent.objects.bulk_create(events)
+    transaction.on_commit(_schedule_outbox_relay)
+
+
+def _schedule_outbox_relay():
+    try:
+        celery_app.send_task('app.relay_outbox')
+    except Exception:
+        # The periodic relay picks the events up anyway; the order itself is already committed.
+        logger.warning('Could not schedule the outbox relay', exc_info=True)
+
+
+def relay_outbox(batch_size=None):
+    """Dispatch one batch of unprocessed outbox events to their handlers.
+
+    Rows are claimed with ``SKIP LOCKED`` so several relays can drain the outbox concurrently.
+    A failing handler only holds back the events of its own type, which are retried until
+    ``OUTBOX_MAX_ATTEMPTS`` is reached; the events giving up then are logged as errors and stay in
+    the outbox for inspection. Returns the number of events claimed.
+    """
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
     with transaction.atomic():
-        total_amount = 0
-        created_items = []
-        order = Order.objects.create(customer=customer, shop=shop, total_amount=0)
-        for item in items:
-            product = Product.objects.select_for_update().get(pk=item['product'].pk)
-            if product.quantity < item['quantity']:
-                raise ValueError(f'Insufficient inventory for product {product.name}')
-            product.quantity = F('quantity') - item['quantity']
-            product.save()
-            product.refresh_from_db()
-            unit_price = product.price
-            total_price = unit_price * item['quantity']
-            oi = OrderItem.objects.create(
-                order=order, product=product, quantity=item['quantity'], unit_price=unit_price, total_price=total_price
-            )
-            created_items.append(oi)
-            total_amount += total_price
-            if product.quantity <= 3:
-                _trigger_inventory_alert(shop, product)
-        order.total_amount = total_amount
-        order.save()
-        return order
+        events = list(
+            OutboxEvent.objects.select_for_update(skip_locked=True)
+            .filter(processed_at__isnull=True, attempts__lt=settings.OUTBOX_MAX_ATTEMPTS)
+            .order_by('pk')[:batch_size]
+        )
+        batches = {}
+        for event in events:
+            batches.setdefault(event.event_type, []).append(event)
+        processed = []
+        for event_type, batch in batches.items():
+            event_ids = [event.pk for event in batch]
+            try:
+                with transaction.atomic():
+                    for handler in OUTBOX_HANDLERS.get(event_type, ()):
+                        handler(batch)
+            except Exception:
+                logger.exception('Outbox handler failed for %d %s events', len(batch), event_type)
+                OutboxEvent.objects.filter(pk__in=event_ids).update(attempts=F('attempts') + 1)
+                exhausted = [event.pk for event in batch if event.attempts + 1 >= settings.OUTBOX_MAX_ATTEMPTS]
+                if exhausted:
+                    logger.error(
+                        'Giving up on %d %s outbox events after %d attempts: %s',
+                        len(exhausted),
+                        event_type,
+                        settings.OUTBOX_MAX_ATTEMPTS,
+                        exhausted,
+                    )
+                continue
+            processed += event_ids
+        if processed:
+            OutboxEvent.objects.filter(pk__in=processed).update(processed_at=timezone.now())
+    return len(events)
+
+
+def prune_outbox(retention_days=None, batch_size=None):
+    """Delete outbox events processed more than ``OUTBOX_RETENTION_DAYS`` ago, one batch at a time.
+
+    Events that exhausted their attempts are never processed, so they are kept. Returns the number
+    of events deleted.
+    """
+    retention_days = settings.OUTBOX_RETENTION_DAYS if retention_days is None else retention_days
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    deleted = 0
+    while True:
+        event_ids = list(
+            OutboxEvent.objects.filter(processed_at__lt=cutoff).order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not event_ids:
+            return deleted
+        deleted += OutboxEvent.objects.filter(pk__in=event_ids).delete()[0]
+
 
+@outbox_handler(OutboxEvent.EVENT_ORDER_CREATED)
+def _handle_order_created(events):
+    # A new order moves its shop's stock, so the dashboard is refreshed once per shop of the batch.
+    bump_dashboard_version(*{event.payload['shop_id'] for event in events})
 
-def _trigger_inventory_alert(shop, product):
-    alert_key = f'inventory-alert:{shop.id}:{product.id}'
-    if not redis_client.get(alert_key):
-        InventoryAlert.objects.create(shop=shop, product=product, quantity=product.quantity)
-        redis_client.setex(alert_key, 3600, 'alert')
+
+@outbox_handler(OutboxEvent.EVENT_STOCK_LOW)
+def _handle_stock_low(events):
+    low_stock = {}
+    for event in events:
+        low_stock[(event.payload['shop_id'], event.payload['product_id'])] = event.payload['quantity']
+    _trigger_inventory_alerts(low_stock)
+
+
+def _trigger_inventory_alerts(low_stock):
+    """Create one alert per ``(shop_id, product_id)`` not alerted within ``INVENTORY_ALERT_TTL``.
+
+    Deduplication claims every key with an atomic ``SET NX EX`` in a single pipeline, so concurrent
+    relays cannot both create an alert for the same product.
+    """
+    keys = [INVENTORY_ALERT_KEY.format(shop_id, product_id) for shop_id, product_id in low_stock]
+    pipe = redis_client.pipeline(transaction=False)
+    for key in keys:
+        pipe.set(key, 'alert', nx=True, ex=INVENTORY_ALERT_TTL)
+    claimed = pipe.execute()
+    alerts = [
+        InventoryAlert(shop_id=shop_id, product_id=product_id, quantity=quantity)
+        for ((shop_id, product_id), quantity), is_new in zip(low_stock.items(), claimed)
+        if is_new
+    ]
+    if not alerts:
+        return
+    try:
+        InventoryAlert.objects.bulk_create(alerts)
+    except Exception:
+        redis_client.delete(*[key for key, is_new in zip(keys, claimed) if is_new])
+        raise
+    invalidate_dashboard_on_commit(*{alert.shop_id for alert in alerts})
 
 
 def get_inventory_alerts(shop):
     return InventoryAlert.objects.filter(shop=shop, resolved=False)
 
 
-def geolocation_product_search(point, radius_km=10, category=None):
-    filter_qs = Product.objects.filter(location__distance_lte=(point, radius_km * 1000))
+def resolve_inventory_alerts(shop, alert_ids):
+    """Resolve open alerts of ``shop`` and let their products alert again right away."""
+    with transaction.atomic():
+        product_ids = list(
+            get_inventory_alerts(shop).filter(pk__in=alert_ids).values_list('product_id', flat=True).distinct()
+        )
+        resolved = get_inventory_alerts(shop).filter(pk__in=alert_ids).update(resolved=True)
+        invalidate_dashboard_on_commit(shop.pk)
+    if product_ids:
+        redis_client.delete(*[INVENTORY_ALERT_KEY.format(shop.pk, product_id) for product_id in product_ids])
+    return resolved
+
+
+def geolocation_product_search(point, radius_km=10, category=None, after=None):
+    """Products within ``radius_km`` of ``point``, nearest first, annotated with ``distance`` in metres.
+
+    The radius test is ``ST_DWithin`` on geography, which the GiST index on ``location::geography``
+    answers with a bounding-box scan before the exact check. Ordering and ``distance`` both use the
+    index-assisted KNN ``<->`` operator. ``after`` is the ``(distance, id)`` of the last row already
+    returned, for keyset pagination.
+    """
+    table = connection.ops.quote_name(Product._meta.db_table)
+    location = f'CAST({table}.location AS geography)'
+    target = 'CAST(ST_SetSRID(ST_MakePoint(%s, %s), 4326) AS geography)'
+    coords = (point.x, point.y)
+    distance = f'{location} <-> {target}'
+    filter_qs = Product.objects.annotate(distance=RawSQL(distance, coords, output_field=FloatField())).filter(
+        RawSQL(f'ST_DWithin({location}, {target}, %s, false)', (*coords, radius_km * 1000), output_field=BooleanField())
+    )
     if category:
         filter_qs = filter_qs.filter(category=category)
-    return filter_qs.select_related('shop', 'category')
+    if after is not None:
+        filter_qs = filter_qs.filter(
+            RawSQL(f'({distance}, {table}.id) > (%s, %s)', (*coords, *after), output_field=BooleanField())
+        )
+    return filter_qs.select_related('shop', 'category').order_by(RawSQL(distance, coords).asc(), 'id')
+
+
+def search_products(query, category=None, point=None, radius_km=10):
+    """Products matching ``query``, best match first, annotated with ``rank``.
+
+    Full-text matches on the trigger-maintained ``search_vector`` and typo-tolerant trigram
+    matches on the name are combined, each served by its own GIN index. With ``point`` the search
+    is narrowed to ``geolocation_product_search`` and also annotated with ``distance``.
+    """
+    search_query = SearchQuery(query, search_type='websearch', config=SEARCH_CONFIG)
+    if point is not None:
+        products = geolocation_product_search(point, radius_km, category)
+    else:
+        products = Product.objects.select_related('shop', 'category')
+        if category:
+            products = products.filter(category=category)
+    return (
+        products.filter(Q(search_vector=search_query) | Q(name__trigram_word_similar=query))
+        .annotate(rank=SearchRank(F('search_vector'), search_query) + TrigramWordSimilarity(query, 'name') * Value(0.5))
+        .order_by('-rank', 'id')
+    )
+
+
+def change_order_status(order, status):
+    """Move an order to ``status`` and keep the daily sales rollups in step.
+
+    Status writes that bypass this function reach the rollups through ``rebuild_changed_rollups``.
+    """
+    if status not in dict(Order.STATUS_CHOICES):
+        raise ValueError(f'Unknown order status {status}')
+    with transaction.atomic():
+        # ``created_at`` confines the lookup to the order's monthly partition.
+        order = Order.objects.select_for_update().get(pk=order.pk, created_at=order.created_at)
+        previous = order.status
+        if previous == status:
+            return order
+        order.status = status
+        order.save(update_fields=['status'])
+        if status == Order.STATUS_COMPLETED:
+            apply_order_to_rollups(order, 1)
+        elif previous == Order.STATUS_COMPLETED:
+            apply_order_to_rollups(order, -1)
+        invalidate_dashboard_on_commit(order.shop_id)
+        return order
 
 
 def monthly_sales_analytics(shop, month=None, year=None):
-    sales_qs = Order.objects.filter(shop=shop, status=Order.STATUS_COMPLETED)
+    start = end = None
     if month and year:
-        sales_qs = sales_qs.filter(created_at__year=year, created_at__month=month)
-    items_qs = OrderItem.objects.filter(order__in=sales_qs)
-    total_revenue = items_qs.aggregate(revenue=Sum('total_price'))['revenue'] or 0
-    category_revenue = items_qs.values('product__category__name').annotate(revenue=Sum('total_price'))
-    top_products = (
-        items_qs.values('product__id', 'product__name')
-        .annotate(
-            product_revenue=Sum('total_price'),
-            product_count=Sum('quantity'),
-            rank=Window(Rank(), order_by=F('product_revenue').desc()),
+        start, end = month_range(year, month)
+    total_revenue, categories, products = shop_sales_breakdown(shop.pk, start, end)
+    top_products = []
+    for position, (product_id, name, revenue, count) in enumerate(products[:5], start=1):
+        rank = top_products[-1]['rank'] if top_products and top_products[-1]['product_revenue'] == revenue else position
+        top_products.append(
+            {
+                'product__id': product_id,
+                'product__name': name,
+                'product_revenue': revenue,
+                'product_count': count,
+                'rank': rank,
+            }
         )
-        .order_by('-product_revenue')[:5]
-    )
     return {
         'total_revenue': total_revenue,
-        'category_revenue': list(category_revenue),
-        'top_products': list(top_products),
+        'category_revenue': [{'product__category__name': name, 'revenue': revenue} for name, revenue in categories],
+        'top_products': top_products,
     }
 
 
-def artisan_dashboard_kpis(shop):
-    analytics = monthly_sales_analytics(shop)
-    total_completed_orders = Order.objects.filter(shop=shop, status=Order.STATUS_COMPLETED).count()
-    low_stock_products = Product.objects.filter(shop=shop, quantity__lte=3).values('id', 'name', 'quantity')
-    alerts = get_inventory_alerts(shop)
+def _completed_orders(shop):
+    return ShopDailySales.objects.filter(shop=shop).aggregate(orders=Sum('orders'))['orders'] or 0
+
+
+def _low_stock_products(shop):
+    return list(Product.objects.filter(shop=shop, quantity__lte=LOW_STOCK_THRESHOLD).values('id', 'name', 'quantity'))
+
+
+def _active_alert_count(shop):
+    return get_inventory_alerts(shop).count()
+
+
+DASHBOARD_QUERIES = (monthly_sales_analytics, _completed_orders, _low_stock_products, _active_alert_count)
+
+
+def _dashboard_kpis(analytics, completed_orders, low_stock_products, active_alerts):
     return {
         'monthly_analytics': analytics,
-        'completed_orders': total_completed_orders,
-        'low_stock_products': list(low_stock_products),
-        'active_alerts': alerts.count(),
+        'completed_orders': completed_orders,
+        'low_stock_products': low_stock_products,
+        'active_alerts': active_alerts,
     }
 
 
-def recommend_products(product, limit=5):
-    # Candidate should implement recommendation logic here
-    return Product.objects.none()
+def artisan_dashboard_kpis(shop):
+    return _dashboard_kpis(*(query(shop) for query in DASHBOARD_QUERIES))
+
+
+async def aartisan_dashboard_kpis(shop):
+    """Async ``artisan_dashboard_kpis``; its independent queries run concurrently.
+
+    Django's async ORM runs every query on one shared thread, so each query instead gets a pool
+    thread of its own, and with it its own database connection. At most
+    ``DASHBOARD_QUERY_CONCURRENCY`` run at once, so a cache miss holds that many connections of
+    the process's pool.
+    """
+    limit = asyncio.Semaphore(settings.DASHBOARD_QUERY_CONCURRENCY)
+
+    async def run(query):
+        async with limit:
+            return await _in_own_connection(query)(shop)
+
+    return _dashboard_kpis(*await asyncio.gather(*(run(query) for query in DASHBOARD_QUERIES)))
+
+
+def _in_own_connection(func):
+    def run(*args):
+        try:
+            return func(*args)
+        finally:
+            connection.close_if_unusable_or_obsolete()
+
+    return sync_to_async(run, thread_sensitive=False)
+
+
+def bump_dashboard_version(*shop_ids):
+    pipe = redis_client.pipeline(transaction=False)
+    for shop_id in shop_ids:
+        pipe.incr(DASHBOARD_VERSION_KEY.format(shop_id))
+        if settings.DATABASE_REPLICAS:
+            pipe.set(DASHBOARD_CHANGED_KEY.format(shop_id), 1, ex=settings.REPLICA_PIN_SECONDS)
+    pipe.execute()
+
+
+def invalidate_dashboard_on_commit(*shop_ids):
+    """Bump the dashboard version of ``shop_ids`` once the current transaction commits."""
+    if shop_ids:
+        transaction.on_commit(lambda: bump_dashboard_version(*shop_ids))
+
+
+def bump_catalog_version(*resources):
+    pipe = redis_client.pipeline(transaction=False)
+    for resource in resources:
+        pipe.incr(CATALOG_VERSION_KEY.format(resource))
+        pipe.set(CATALOG_MODIFIED_KEY.format(resource), time.time())
+    pipe.execute()
+
+
+def invalidate_catalog_on_commit(*resources):
+    """Bump the catalog version of ``resources`` once the current transaction commits."""
+    if resources:
+        transaction.on_commit(lambda: bump_catalog_version(*resources))
+
+
+def catalog_validators(*resources):
+    """Return ``(etag, last_modified)`` of ``resources`` from their version counters, without touching Postgres."""
+    pipe = redis_client.pipeline(transaction=False)
+    _queue_catalog_validators(pipe, resources)
+    return _catalog_validators(resources, pipe.execute())
+
+
+async def acatalog_validators(*resources):
+    """Async ``catalog_validators``."""
+    pipe = async_redis().pipeline(transaction=False)
+    _queue_catalog_validators(pipe, resources)
+    return _catalog_validators(resources, await pipe.execute())
+
+
+def _queue_catalog_validators(pipe, resources):
+    pipe.set(CATALOG_EPOCH_KEY, secrets.token_hex(4), nx=True)
+    pipe.get(CATALOG_EPOCH_KEY)
+    for resource in resources:
+        pipe.get(CATALOG_VERSION_KEY.format(resource))
+        pipe.get(CATALOG_MODIFIED_KEY.format(resource))
+
+
+def _catalog_validators(resources, values):
+    epoch, values = values[1], values[2:]
+    if isinstance(epoch, bytes):
+        epoch = epoch.decode()
+    versions, modified = values[::2], [float(value) for value in values[1::2] if value]
+    etag = '-'.join([epoch, *(f'{resource}.{int(version or 0)}' for resource, version in zip(resources, versions))])
+    last_modified = datetime.fromtimestamp(max(modified), tz=dt_timezone.utc) if modified else None
+    return etag, last_modified
+
+
+def cached_dashboard_kpis(shop):
+    """Return ``(kpis, cache_meta)`` for ``shop``, served from Redis when possible.
+
+    Entries record the shop's dashboard version they were computed for; any bump makes them
+    stale. A single worker recomputes a stale entry (guarded by a short lock) while the others keep
+    serving it for up to ``DASHBOARD_CACHE_STALE`` seconds, so a burst of refreshes costs one
+    round of aggregates. Without an entry to serve, the others poll for the one being computed
+    for up to ``DASHBOARD_CACHE_WAIT`` seconds before computing their own.
+
+    The aggregates may run on a replica. When a bump happened while they ran or within
+    ``REPLICA_PIN_SECONDS`` before, the replica may not have replayed it, so their entry is
+    stored for no version and only ever served as stale.
+    """
+    cache = _DashboardCache(shop.pk)
+    cache.read(redis_client.mget(*cache.keys))
+    result = cache.hit()
+    if result is not None:
+        return result
+    if redis_client.set(cache.lock_key, 1, nx=True, ex=settings.DASHBOARD_CACHE_LOCK_TIMEOUT):
+        try:
+            payload = _dashboard_payload(artisan_dashboard_kpis(shop))
+            entry = cache.entry(payload, redis_client.mget(cache.version_key, cache.changed_key))
+            redis_client.set(cache.cache_key, entry, ex=cache.entry_ttl)
+        finally:
+            redis_client.delete(cache.lock_key)
+        return cache.miss(payload)
+    deadline = time.monotonic() + settings.DASHBOARD_CACHE_WAIT
+    while (result := cache.hit() or cache.stale()) is None and time.monotonic() < deadline:
+        time.sleep(DASHBOARD_WAIT_INTERVAL)
+        cache.read(redis_client.mget(*cache.keys))
+    if result is not None:
+        return result
+    return cache.miss(_dashboard_payload(artisan_dashboard_kpis(shop)))
+
+
+async def acached_dashboard_kpis(shop):
+    """Async ``cached_dashboard_kpis``, sharing its Redis entries and lock."""
+    cache = _DashboardCache(shop.pk)
+    cache.read(await async_redis().mget(*cache.keys))
+    result = cache.hit()
+    if result is not None:
+        return result
+    if await async_redis().set(cache.lock_key, 1, nx=True, ex=settings.DASHBOARD_CACHE_LOCK_TIMEOUT):
+        try:
+            payload = _dashboard_payload(await aartisan_dashboard_kpis(shop))
+            entry = cache.entry(payload, await async_redis().mget(cache.version_key, cache.changed_key))
+            await async_redis().set(cache.cache_key, entry, ex=cache.entry_ttl)
+        finally:
+            await async_redis().delete(cache.lock_key)
+        return cache.miss(payload)
+    deadline = time.monotonic() + settings.DASHBOARD_CACHE_WAIT
+    while (result := cache.hit() or cache.stale()) is None and time.monotonic() < deadline:
+        await asyncio.sleep(DASHBOARD_WAIT_INTERVAL)
+        cache.read(await async_redis().mget(*cache.keys))
+    if result is not None:
+        return result
+    return cache.miss(_dashboard_payload(await aartisan_dashboard_kpis(shop)))
+
+
+class _DashboardCache:
+    """Keys and entry logic of one shop's cached dashboard, shared by the sync and async lookups."""
+
+    def __init__(self, shop_id):
+        self.version_key = DASHBOARD_VERSION_KEY.format(shop_id)
+        self.cache_key = DASHBOARD_CACHE_KEY.format(shop_id)
+        self.changed_key = DASHBOARD_CHANGED_KEY.format(shop_id)
+        self.lock_key = DASHBOARD_LOCK_KEY.format(shop_id)
+        self.keys = (self.version_key, self.cache_key, self.changed_key)
+        self.entry_ttl = settings.DASHBOARD_CACHE_TTL + settings.DASHBOARD_CACHE_STALE
+
+    def read(self, values):
+        """Load the ``MGET`` of ``keys``."""
+        version, raw_entry, changed = values
+        self.version = int(version or 0)
+        self.changed = bool(changed)
+        self.computed_at = time.time()
+        self.current = json.loads(raw_entry) if raw_entry else None
+        self.age = self.computed_at - self.current['computed_at'] if self.current else None
+
+    def hit(self):
+        if self.current and self.current['version'] == self.version and self.age < settings.DASHBOARD_CACHE_TTL:
+            return self.current['payload'], _dashboard_cache_meta('hit', self.current, self.age)
+        return None
+
+    def stale(self):
+        if self.current and self.age < self.entry_ttl:
+            return self.current['payload'], _dashboard_cache_meta('stale', self.current, self.age)
+        return None
+
+    def entry(self, payload, after):
+        """Serialize the entry of ``payload`` given the version and changed flag read after computing it."""
+        version_after, changed_after = after
+        settled = not self.changed and not changed_after and int(version_after or 0) == self.version
+        version = self.version if settled else None
+        return json.dumps({'version': version, 'computed_at': self.computed_at, 'payload': payload})
+
+    def miss(self, payload):
+        return payload, _dashboard_cache_meta('miss', {'version': self.version}, 0)
+
+
+def _dashboard_payload(kpis):
+    return json.loads(json.dumps(kpis, cls=DjangoJSONEncoder))
+
+
+def _dashboard_cache_meta(status, entry, age):
+    return {'status': status, 'version': entry['version'], 'age': round(age, 3)}
+
+
+def _recommendation_candidates(product):
+    """The precomputed neighbours of ``product`` and the same-category fallback, flash sales first."""
+    precomputed = Product.objects.filter(recommended_for__product=product, quantity__gt=0).order_by(
+        '-on_flash_sale', 'recommended_for__rank'
+    )
+    fallback = (
+        Product.objects.filter(category_id=product.category_id, quantity__gt=0)
+        .exclude(pk=product.pk)
+        .annotate(same_shop=Case(When(shop_id=product.shop_id, then=Value(0)), default=Value(1)))
+        .order_by('-on_flash_sale', 'same_shop', '-created_at', 'pk')
+    )
+    return precomputed, fallback
+
+
+def _with_relations(products):
+    return products.select_related('shop', 'category')
+
+
+def recommend_products(product, limit=5, project=None):
+    """Precomputed neighbours of ``product``; same-category products while it has none yet.
+
+    Products on flash sale come first in both cases. ``project`` maps the candidate queryset to
+    the rows returned (model instances with their shop and category by default).
+    """
+    project = project or _with_relations
+    precomputed, fallback = _recommendation_candidates(product)
+    return list(project(precomputed)[:limit]) or list(project(fallback)[:limit])
+
+
+async def arecommend_products(product, limit=5, project=None):
+    """Async ``recommend_products``."""
+    project = project or _with_relations
+    precomputed, fallback = _recommendation_candidates(product)
+    return [row async for row in project(precomputed)[:limit]] or [row async for row in project(fallback)[:limit]]
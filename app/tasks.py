@@ -1,9 +1,83 @@
 """Example Celery tasks for the project."""
 
 from celery import shared_task
+from django.conf import settings
+
+from app import partitions, pricing, recommendations, rollups, services
 
 
 @shared_task(name='app.ping')
 def ping() -> str:
     """Simple task used for health checks."""
     return 'pong'
+
+
+@shared_task(name='app.reconcile_hot_stock')
+def reconcile_hot_stock() -> int:
+    """Apply Redis stock reservations of hot products to Postgres."""
+    return services.reconcile_hot_stock()
+
+
+@shared_task(name='app.audit_hot_stock')
+def audit_hot_stock(repair: bool = False) -> list:
+    """Report (and optionally repair) hot stock counters that drifted from Postgres."""
+    return services.audit_hot_stock(repair=repair)
+
+
+@shared_task(name='app.relay_outbox')
+def relay_outbox(max_batches: int = 20) -> int:
+    """Drain the order side-effect outbox, one batch at a time."""
+    relayed = 0
+    for _ in range(max_batches):
+        count = services.relay_outbox()
+        relayed += count
+        if count < settings.OUTBOX_BATCH_SIZE:
+            break
+    return relayed
+
+
+@shared_task(name='app.prune_outbox')
+def prune_outbox() -> int:
+    """Delete outbox events processed longer ago than ``OUTBOX_RETENTION_DAYS``."""
+    return services.prune_outbox()
+
+
+@shared_task(name='app.reconcile_sales_rollups')
+def reconcile_sales_rollups(days: int | None = None) -> list:
+    """Nightly rebuild of the recent daily sales rollups from the raw orders."""
+    start, end = rollups.reconcile_recent_rollups(days or settings.SALES_ROLLUP_RECONCILE_DAYS)
+    return [start.isoformat(), end.isoformat()]
+
+
+@shared_task(name='app.rebuild_changed_sales_rollups')
+def rebuild_changed_sales_rollups() -> list:
+    """Rebuild the daily sales rollups of the shop days whose completed orders changed, and their dashboards."""
+    shop_ids = rollups.rebuild_changed_rollups()
+    if shop_ids:
+        services.bump_dashboard_version(*shop_ids)
+    return shop_ids
+
+
+@shared_task(name='app.build_recommendations')
+def build_recommendations() -> int:
+    """Full rebuild of the precomputed product recommendations."""
+    return recommendations.build_recommendations()
+
+
+@shared_task(name='app.refresh_recommendations')
+def refresh_recommendations() -> int:
+    """Fold the day's new orders into the precomputed product recommendations."""
+    return recommendations.refresh_recommendations()
+
+
+@shared_task(name='app.apply_flash_sales')
+def apply_flash_sales() -> list:
+    """Switch products whose flash sale window opened or closed to their new effective price."""
+    return list(pricing.apply_flash_sale_windows())
+
+
+@shared_task(name='app.maintain_order_partitions')
+def maintain_order_partitions() -> dict:
+    """Create the coming months' order partitions and archive the months past retention."""
+    created, archived = partitions.maintain_order_partitions()
+    return {'created': created, 'archived': [month.isoformat() for month in archived]}
@@ -0,0 +1,67 @@
+"""Helpers shared by the benchmark scripts: Django setup, latency summaries and result files."""
+
+import json
+import os
+import platform
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+
+
+def setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+
+    django.setup()
+
+
+def percentile(values, fraction):
+    """Linear-interpolated percentile of ``values`` (``fraction`` in [0, 1])."""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(latencies, queries=None):
+    """Summarize per-call latencies in seconds (and query counts) as milliseconds."""
+    summary = {
+        'calls': len(latencies),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3) if latencies else None,
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 3) if latencies else None,
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3) if latencies else None,
+    }
+    if queries is not None:
+        summary['queries_per_call'] = round(sum(queries) / len(queries), 2) if queries else None
+    return summary
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(benchmark, results, output=None):
+    """Write ``results`` with the commit and environment they were measured on; return the path."""
+    revision = git_revision()
+    document = {
+        'benchmark': benchmark,
+        'git_revision': revision,
+        'measured_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+    path = Path(output) if output else RESULTS_DIR / f'{benchmark}-{revision or "unknown"}.json'
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(document, indent=2) + '\n')
+    return path
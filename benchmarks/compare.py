@@ -0,0 +1,52 @@
+"""Compare two benchmark result files, e.g. from the parent commit and the current one::
+
+    python -m benchmarks.compare benchmarks/results/micro-1acfffe.json benchmarks/results/micro-d6b90dc.json
+
+Rows are matched on scale and benchmark (or scenario); changes beyond ``--threshold`` are flagged.
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+METRICS = ('p50_ms', 'p99_ms', 'throughput_rps', 'queries_per_call', 'queries_per_request')
+# Lower is better for everything but throughput.
+HIGHER_IS_BETTER = {'throughput_rps'}
+
+
+def _rows(path):
+    document = json.loads(Path(path).read_text())
+    return document, {(row['scale'], row.get('benchmark') or row['scenario']): row for row in document['results']}
+
+
+def compare(before, after, threshold):
+    """Yield ``(scale, name, metric, before, after, change, flag)`` for each metric measured in both files."""
+    for key in sorted(before.keys() & after.keys()):
+        for metric in METRICS:
+            old, new = before[key].get(metric), after[key].get(metric)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old if old else 0.0
+            worse = change < 0 if metric in HIGHER_IS_BETTER else change > 0
+            flag = ('slower' if worse else 'faster') if abs(change) > threshold else ''
+            yield (*key, metric, old, new, change, flag)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('before')
+    parser.add_argument('after')
+    parser.add_argument('--threshold', type=float, default=0.1, help='relative change worth flagging')
+    args = parser.parse_args()
+    before_document, before = _rows(args.before)
+    after_document, after = _rows(args.after)
+    print(f'{before_document["git_revision"]} -> {after_document["git_revision"]}')
+    regressions = 0
+    for scale, name, metric, old, new, change, flag in compare(before, after, args.threshold):
+        regressions += flag == 'slower'
+        print(f'{scale:>9} {name:<30} {metric:<20} {old:>12} {new:>12} {change:>+8.1%} {flag}')
+    raise SystemExit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""Deterministic benchmark dataset generated inside Postgres.
+
+A scale of ``N`` means ``N`` products and ``N`` orders with two lines each, spread over
+``N // 200`` shops clustered around a few cities and ``N // 20`` customers, with a year of order
+history and its sales rollups. Rows are produced by ``generate_series`` from a seeded
+``random()``, so loading a million products takes one statement per table instead of a million
+ORM saves. Loading truncates every table of the app and flushes the Redis database, so point
+``DATABASE_URL`` and ``CACHE_URL`` at scratch instances.
+"""
+
+from datetime import timedelta
+
+CITIES = [(-73.99, 40.73), (-0.12, 51.51), (2.35, 48.86), (13.40, 52.52), (139.69, 35.69), (-122.42, 37.77)]
+CATEGORY_COUNT = 20
+HISTORY_DAYS = 365
+
+
+def dimensions(scale):
+    return {
+        'products': scale,
+        'orders': scale,
+        'shops': max(5, scale // 200),
+        'customers': max(20, scale // 20),
+        'categories': CATEGORY_COUNT,
+    }
+
+
+def matches(scale):
+    """Whether the database already holds the dataset of ``scale``."""
+    from app.models import ArtisanShop, Product
+
+    return Product.objects.count() == scale and ArtisanShop.objects.count() == dimensions(scale)['shops']
+
+
+def ensure(scale, seed=42, reset=False):
+    """Reuse the dataset of ``scale`` when it is loaded; otherwise (re)load it if ``reset`` allows."""
+    from app.models import Product
+
+    if matches(scale):
+        return False
+    if Product.objects.exists() and not reset:
+        raise SystemExit(
+            f'The database holds other data than the scale {scale} dataset; rerun with --reset to replace it'
+        )
+    load(scale, seed)
+    return True
+
+
+def _near_city(g):
+    """SQL for a random point within about 10 km of the city picked by the series value ``g``."""
+    lngs = ', '.join(str(lng) for lng, _ in CITIES)
+    lats = ', '.join(str(lat) for _, lat in CITIES)
+    city = f'1 + mod({g}, {len(CITIES)})'
+    return (
+        f'ST_SetSRID(ST_MakePoint((ARRAY[{lngs}])[{city}] + (random() - 0.5) * 0.25, '
+        f'(ARRAY[{lats}])[{city}] + (random() - 0.5) * 0.18), 4326)'
+    )
+
+
+def load(scale, seed=42):
+    from django.apps import apps
+    from django.db import connection, transaction
+    from django.utils import timezone
+
+    from app.models import ArtisanShop, Category, Order, OrderItem, Product, User
+    from app.partitions import ensure_partitions
+    from app.rollups import discard_rollup_changes, rebuild_rollups
+    from app.services import redis_client
+
+    size = dimensions(scale)
+    table = {
+        model: connection.ops.quote_name(model._meta.db_table)
+        for model in (User, ArtisanShop, Category, Product, Order, OrderItem)
+    }
+    app_tables = ', '.join(
+        connection.ops.quote_name(model._meta.db_table) for model in apps.get_app_config('app').get_models()
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'TRUNCATE {app_tables} RESTART IDENTITY CASCADE')
+        cursor.execute('SELECT setseed(%s)', [(seed % 1000) / 1000])
+        cursor.execute(
+            f'INSERT INTO {table[User]} (password, is_superuser, username, first_name, last_name, email, is_staff, '
+            f"is_active, date_joined, role) SELECT '!', false, 'bench-' || g, '', '', '', false, true, now(), "
+            f"CASE WHEN g <= %(shops)s THEN 'artisan' ELSE 'customer' END FROM generate_series(1, %(users)s) g",
+            {'shops': size['shops'], 'users': size['shops'] + size['customers']},
+        )
+        cursor.execute(
+            f"INSERT INTO {table[Category]} (name) SELECT 'Bench category ' || g FROM generate_series(1, %(n)s) g",
+            {'n': size['categories']},
+        )
+        cursor.execute(
+            f"INSERT INTO {table[ArtisanShop]} (owner_id, name, location, created_at) SELECT g, 'Bench shop ' || g, "
+            f"{_near_city('g')}, now() - g * interval '1 minute' FROM generate_series(1, %(n)s) g",
+            {'n': size['shops']},
+        )
+        # Product g belongs to shop 1 + (g - 1) mod shops, so the products of shop s are s + shops * j.
+        cursor.execute(
+            f'INSERT INTO {table[Product]} (shop_id, name, sku, description, price, quantity, category_id, location, '
+            f'is_hot, on_flash_sale, effective_price, created_at, updated_at) '
+            f"SELECT 1 + mod(g - 1, %(shops)s), 'Handmade item ' || g, 'SKU-' || g, "
+            f"'Thrown, glazed and fired by hand', price, 1000000, 1 + mod(g, %(categories)s), location, false, false, "
+            f'price, created_at, created_at '
+            f'FROM (SELECT g, round(CAST(5 + random() * 195 AS numeric), 2) AS price, {_near_city("g")} AS location, '
+            f"now() - random() * interval '{HISTORY_DAYS} days' AS created_at FROM generate_series(1, %(n)s) g) AS p",
+            {'n': size['products'], 'shops': size['shops'], 'categories': size['categories']},
+        )
+        now = timezone.now()
+        ensure_partitions(now - timedelta(days=HISTORY_DAYS + 1), now)
+        cursor.execute(
+            f'INSERT INTO {table[Order]} (customer_id, shop_id, created_at, total_amount, status) '
+            f'SELECT %(shops)s + 1 + mod(g, %(customers)s), 1 + mod(g, %(shops)s), '
+            f"now() - random() * interval '{HISTORY_DAYS} days', 0, "
+            f"CASE WHEN random() < 0.8 THEN 'completed' ELSE 'pending' END FROM generate_series(1, %(n)s) g",
+            {'n': size['orders'], 'shops': size['shops'], 'customers': size['customers']},
+        )
+        # Two lines per order from the order's shop, skewed towards its first products.
+        cursor.execute(
+            f'INSERT INTO {table[OrderItem]} (order_id, product_id, quantity, unit_price, total_price, created_at) '
+            f'SELECT l.order_id, p.id, l.quantity, p.price, p.price * l.quantity, l.created_at FROM ('
+            f'SELECT o.id AS order_id, o.created_at, '
+            f'o.shop_id + %(shops)s * CAST(floor(power(random(), 2) * %(per_shop)s) AS bigint) AS product_id, '
+            f'CAST(1 + floor(random() * 3) AS integer) AS quantity '
+            f'FROM {table[Order]} o CROSS JOIN generate_series(1, 2)) AS l '
+            f'JOIN {table[Product]} p ON p.id = l.product_id',
+            {'shops': size['shops'], 'per_shop': size['products'] // size['shops']},
+        )
+        cursor.execute(
+            f'UPDATE {table[Order]} o SET total_amount = t.total FROM (SELECT order_id, sum(total_price) AS total '
+            f'FROM {table[OrderItem]} GROUP BY order_id) AS t WHERE t.order_id = o.id'
+        )
+        today = timezone.localdate()
+        rebuild_rollups(today - timedelta(days=HISTORY_DAYS + 1), today + timedelta(days=1))
+        discard_rollup_changes()
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    redis_client.flushdb()
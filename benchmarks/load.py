@@ -0,0 +1,196 @@
+"""Concurrent-client load scenarios against a running server.
+
+Each scenario keeps ``--clients`` threads busy for ``--duration`` seconds, each with its own
+keep-alive connection and API token, and reports throughput and p50/p99 latency as seen by the
+clients. Queries per request come from the server's own ``/api/metrics/`` counters, read before
+and after the scenario, so they cover every worker process. Tokens and request arguments are
+taken from the database the server uses, loaded with ``benchmarks.dataset``::
+
+    make run-asgi &
+    python -m benchmarks.load --base-url http://localhost:8000 --clients 32 --duration 30
+"""
+
+import argparse
+import http.client
+import json
+import random
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+
+from benchmarks import dataset
+from benchmarks.common import setup_django, summarize, write_results
+
+# scenario: route label of its endpoint in /api/metrics/
+SCENARIOS = {
+    'order': 'api:order-list',
+    'geosearch': 'api:product-geosearch',
+    'geosearch_async': 'api:async-product-geosearch',
+    'dashboard': 'api:artisanshop-dashboard',
+    'dashboard_async': 'api:async-artisanshop-dashboard',
+}
+
+_QUERIES_RE = re.compile(r'^http_request_db_queries_total\{route="([^"]+)"\} (\S+)$', re.MULTILINE)
+_COUNT_RE = re.compile(r'^http_request_duration_seconds_count\{route="([^"]+)",[^}]*\} (\S+)$', re.MULTILINE)
+
+
+def _request_factory(scenario, size, rng):
+    """Return a function building ``(method, path, body)`` for one request of ``scenario``."""
+    per_shop = size['products'] // size['shops']
+
+    def order():
+        shop_id = rng.randint(1, size['shops'])
+        product_id = shop_id + size['shops'] * rng.randrange(per_shop)
+        body = {'shop_id': shop_id, 'items': [{'product_id': product_id, 'quantity': 1}]}
+        return 'POST', '/api/orders/', json.dumps(body)
+
+    def geosearch(prefix):
+        lng, lat = rng.choice(dataset.CITIES)
+        lng, lat = lng + rng.uniform(-0.05, 0.05), lat + rng.uniform(-0.05, 0.05)
+        return 'GET', f'{prefix}/products/geosearch/?lat={lat:.5f}&lng={lng:.5f}&radius=10', None
+
+    def dashboard(prefix):
+        return 'GET', f'{prefix}/shops/{rng.randint(1, size["shops"])}/dashboard/', None
+
+    return {
+        'order': order,
+        'geosearch': lambda: geosearch('/api'),
+        'geosearch_async': lambda: geosearch('/api/async'),
+        'dashboard': lambda: dashboard('/api'),
+        'dashboard_async': lambda: dashboard('/api/async'),
+    }[scenario]
+
+
+def _tokens(count):
+    from rest_framework.authtoken.models import Token
+
+    from app.models import User
+
+    customers = User.objects.filter(role=User.ROLE_CUSTOMER).order_by('pk')[:count]
+    return [Token.objects.get_or_create(user=customer)[0].key for customer in customers]
+
+
+def _connect(base_url):
+    parts = urlsplit(base_url)
+    connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+    return connection_class(parts.hostname, parts.port, timeout=60)
+
+
+def _route_counters(base_url):
+    """``{route: (requests, queries)}`` from the server's metrics endpoint."""
+    connection = _connect(base_url)
+    connection.request('GET', '/api/metrics/')
+    body = connection.getresponse().read().decode()
+    connection.close()
+    counters = {}
+    for route, value in _COUNT_RE.findall(body):
+        requests, queries = counters.get(route, (0, 0))
+        counters[route] = (requests + float(value), queries)
+    for route, value in _QUERIES_RE.findall(body):
+        requests, _ = counters.get(route, (0, 0))
+        counters[route] = (requests, float(value))
+    return counters
+
+
+def _client(base_url, token, build, deadline, latencies, errors, lock):
+    connection = _connect(base_url)
+    headers = {'Authorization': f'Token {token}', 'Content-Type': 'application/json'}
+    mine, failed = [], 0
+    while time.monotonic() < deadline:
+        method, path, body = build()
+        started = time.perf_counter()
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            ok = response.status < 400
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            connection = _connect(base_url)
+            ok = False
+        mine.append(time.perf_counter() - started)
+        failed += not ok
+    connection.close()
+    with lock:
+        latencies.extend(mine)
+        errors[0] += failed
+
+
+def run_scenario(scenario, base_url, tokens, size, duration, seed, settle):
+    route = SCENARIOS[scenario]
+    before = _route_counters(base_url).get(route, (0, 0))
+    latencies, errors, lock = [], [0], threading.Lock()
+    deadline = time.monotonic() + duration
+    started = time.perf_counter()
+    threads = [
+        threading.Thread(
+            target=_client,
+            args=(
+                base_url,
+                token,
+                _request_factory(scenario, size, random.Random(seed + index)),
+                deadline,
+                latencies,
+                errors,
+                lock,
+            ),
+        )
+        for index, token in enumerate(tokens)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    # Every worker flushes its metric samples within METRICS_FLUSH_INTERVAL.
+    time.sleep(settle)
+    after = _route_counters(base_url).get(route, (0, 0))
+    served = after[0] - before[0]
+    return {
+        'scenario': scenario,
+        'clients': len(tokens),
+        'duration_s': round(elapsed, 2),
+        'errors': errors[0],
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+        **summarize(latencies),
+        'queries_per_request': round((after[1] - before[1]) / served, 2) if served else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--base-url', default='http://localhost:8000')
+    parser.add_argument('--scenarios', default='order,geosearch,dashboard', help=f'any of {", ".join(SCENARIOS)}')
+    parser.add_argument('--clients', type=int, default=16, help='concurrent clients per scenario')
+    parser.add_argument('--duration', type=float, default=30, help='seconds per scenario')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='result file (default: benchmarks/results/load-<revision>.json)')
+    args = parser.parse_args()
+    setup_django()
+    from django.conf import settings
+
+    from app.models import Product
+
+    scale = Product.objects.count()
+    if not dataset.matches(scale):
+        raise SystemExit('Load a benchmark dataset first, e.g. python -m benchmarks.micro --scales 100000 --reset')
+    size = dataset.dimensions(scale)
+    tokens = _tokens(args.clients)
+    results = []
+    for scenario in args.scenarios.split(','):
+        if scenario not in SCENARIOS:
+            raise SystemExit(f'Unknown scenario {scenario}')
+        result = {
+            'scale': scale,
+            **run_scenario(
+                scenario, args.base_url, tokens, size, args.duration, args.seed, settings.METRICS_FLUSH_INTERVAL + 1
+            ),
+        }
+        print(result, flush=True)
+        results.append(result)
+    print(f'Results written to {write_results("load", results, args.output)}')
+
+
+if __name__ == '__main__':
+    main()
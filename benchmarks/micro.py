@@ -0,0 +1,114 @@
+"""Micro-benchmarks of the marketplace hot paths at several data scales.
+
+For every scale the deterministic dataset of ``benchmarks.dataset`` is loaded (or reused), then
+``create_order``, ``geolocation_product_search``, ``monthly_sales_analytics`` and the product list
+endpoint are called ``--repeat`` times with seeded random arguments. Each call is timed and its
+queries are counted. Needs a scratch PostGIS database and Redis::
+
+    python -m benchmarks.micro --scales 1000,100000,1000000 --repeat 50 --reset
+"""
+
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+from benchmarks import dataset
+from benchmarks.common import setup_django, summarize, write_results
+
+GEOSEARCH_RADIUS_KM = 10
+GEOSEARCH_PAGE = 20
+
+
+def _benchmarks(scale, rng):
+    from django.contrib.gis.geos import Point
+    from django.test import Client
+
+    from app.models import ArtisanShop, User
+    from app.services import create_order, geolocation_product_search, monthly_sales_analytics
+
+    size = dataset.dimensions(scale)
+    per_shop = size['products'] // size['shops']
+    shops = ArtisanShop.objects.in_bulk()
+    customers = list(User.objects.filter(role=User.ROLE_CUSTOMER)[:1000])
+    client = Client(HTTP_HOST='localhost')
+
+    def order():
+        shop_id = rng.randint(1, size['shops'])
+        product_id = shop_id + size['shops'] * rng.randrange(per_shop)
+        create_order(rng.choice(customers), shops[shop_id], [{'product_id': product_id, 'quantity': 1}])
+
+    def geosearch():
+        lng, lat = rng.choice(dataset.CITIES)
+        point = Point(lng + rng.uniform(-0.05, 0.05), lat + rng.uniform(-0.05, 0.05), srid=4326)
+        list(geolocation_product_search(point, GEOSEARCH_RADIUS_KM)[:GEOSEARCH_PAGE])
+
+    def analytics():
+        day = date.today() - timedelta(days=30 * rng.randrange(12))
+        monthly_sales_analytics(shops[rng.randint(1, size['shops'])], day.month, day.year)
+
+    def get(url):
+        response = client.get(url)
+        if response.status_code != 200:
+            raise SystemExit(f'GET {url} answered {response.status_code}')
+
+    def product_list():
+        get('/api/products/')
+
+    def product_list_keyset():
+        get('/api/products/?cursor=')
+
+    return {
+        'create_order': order,
+        'geolocation_product_search': geosearch,
+        'monthly_sales_analytics': analytics,
+        'product_list': product_list,
+        'product_list_keyset': product_list_keyset,
+    }
+
+
+def _measure(func, repeat):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    func()
+    latencies, queries = [], []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            func()
+            latencies.append(time.perf_counter() - started)
+        queries.append(len(captured))
+    return summarize(latencies, queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', default='1000,100000,1000000', help='comma-separated dataset scales')
+    parser.add_argument('--repeat', type=int, default=50, help='timed calls per benchmark')
+    parser.add_argument('--only', help='comma-separated benchmark names to run')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--reset', action='store_true', help='replace whatever the database holds')
+    parser.add_argument('--output', help='result file (default: benchmarks/results/micro-<revision>.json)')
+    args = parser.parse_args()
+    setup_django()
+
+    results = []
+    for scale in (int(value) for value in args.scales.split(',')):
+        started = time.perf_counter()
+        loaded = dataset.ensure(scale, seed=args.seed, reset=args.reset)
+        load_seconds = round(time.perf_counter() - started, 1) if loaded else None
+        rng = random.Random(args.seed)
+        for name, func in _benchmarks(scale, rng).items():
+            if args.only and name not in args.only.split(','):
+                continue
+            result = {'scale': scale, 'benchmark': name, **_measure(func, args.repeat)}
+            print(result, flush=True)
+            results.append(result)
+        if load_seconds is not None:
+            results.append({'scale': scale, 'benchmark': 'dataset_load', 'seconds': load_seconds})
+    print(f'Results written to {write_results("micro", results, args.output)}')
+
+
+if __name__ == '__main__':
+    main()
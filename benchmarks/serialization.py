@@ -0,0 +1,131 @@
+"""Product list serialization: DRF serializers vs the ``.values()``/orjson fast path.
+
+Both sides start from what the database returns for a page of products, so the DRF side pays for
+model and GEOS hydration as well, and both end with the rendered response body. Needs no database::
+
+    DJANGO_SETTINGS_MODULE=config.settings python -m benchmarks.serialization --rows 100 --repeat 200
+"""
+
+import argparse
+import json
+import os
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+
+def _fixtures(count):
+    from django.contrib.gis.geos import Point
+    from django.utils import timezone
+
+    now = timezone.now()
+    rows = []
+    for i in range(count):
+        rows.append(
+            {
+                'id': i + 1,
+                'shop_id': i % 50 + 1,
+                'name': f'Handmade item {i}',
+                'sku': f'HM-{i:06d}',
+                'description': 'Thrown, glazed and fired by hand. ' * 4,
+                'price': Decimal('24.90'),
+                'quantity': i % 40,
+                'category_id': i % 12 + 1,
+                'category__name': f'Category {i % 12}',
+                'category__description': None,
+                'is_hot': False,
+                'flash_sale_price': Decimal('19.90') if i % 5 == 0 else None,
+                'flash_sale_start': now - timedelta(hours=1) if i % 5 == 0 else None,
+                'flash_sale_end': now + timedelta(hours=1) if i % 5 == 0 else None,
+                'effective_price': Decimal('19.90') if i % 5 == 0 else Decimal('24.90'),
+                'on_flash_sale': i % 5 == 0,
+                'created_at': now - timedelta(minutes=i),
+                'updated_at': now,
+                'location_x': -73.9 + i * 0.0001,
+                'location_y': 40.7 + i * 0.0001,
+            }
+        )
+    ewkb = [Point(row['location_x'], row['location_y'], srid=4326).hexewkb.decode() for row in rows]
+    return rows, ewkb
+
+
+def _serializer_path(rows, ewkb):
+    from django.contrib.gis.geos import GEOSGeometry
+    from rest_framework.renderers import JSONRenderer
+
+    from app.api.serializers import ProductSerializer
+    from app.models import Category, Product
+
+    products = []
+    for row, location in zip(rows, ewkb):
+        category = Category(id=row['category_id'], name=row['category__name'], description=None)
+        product = Product(
+            id=row['id'],
+            shop_id=row['shop_id'],
+            name=row['name'],
+            sku=row['sku'],
+            description=row['description'],
+            price=row['price'],
+            quantity=row['quantity'],
+            category=category,
+            location=GEOSGeometry(location),
+            is_hot=row['is_hot'],
+            flash_sale_price=row['flash_sale_price'],
+            flash_sale_start=row['flash_sale_start'],
+            flash_sale_end=row['flash_sale_end'],
+            effective_price=row['effective_price'],
+            on_flash_sale=row['on_flash_sale'],
+            created_at=row['created_at'],
+            updated_at=row['updated_at'],
+        )
+        products.append(product)
+    return JSONRenderer().render(ProductSerializer(products, many=True).data)
+
+
+def _fast_path(rows, ewkb):
+    from app.api.fastpath import product_rows
+    from app.api.renderers import ORJSONRenderer
+
+    return ORJSONRenderer().render(product_rows(rows))
+
+
+def _time(func, rows, ewkb, repeat):
+    func(rows, ewkb)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func(rows, ewkb)
+    return (time.perf_counter() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100, help='products per response')
+    parser.add_argument('--repeat', type=int, default=200, help='responses rendered per path')
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+
+    django.setup()
+
+    rows, ewkb = _fixtures(args.rows)
+    if json.loads(_serializer_path(rows, ewkb)) != json.loads(_fast_path(rows, ewkb)):
+        raise SystemExit('fast path output differs from ProductSerializer')
+    serializer = _time(_serializer_path, rows, ewkb, args.repeat)
+    fast = _time(_fast_path, rows, ewkb, args.repeat)
+    print(
+        json.dumps(
+            {
+                'benchmark': 'product_list_serialization',
+                'rows': args.rows,
+                'serializer_ms': round(serializer * 1000, 3),
+                'fast_path_ms': round(fast * 1000, 3),
+                'speedup': round(serializer / fast, 2),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == '__main__':
+    main()
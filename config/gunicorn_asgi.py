@@ -0,0 +1,20 @@
+"""Gunicorn settings for serving ``config.asgi`` with Uvicorn workers (``make run-asgi``).
+
+Each worker is one event loop, so a handful of them keep far more slow reads in flight than the
+same number of WSGI workers. Django opens a database connection per thread, and the async ORM
+runs queries on worker threads, so instead of persistent connections each worker checks them out of
+its own pool (``DB_POOL_ENABLED``, sized by ``DB_POOL_MAX_SIZE``) and returns them after each request.
+"""
+
+import multiprocessing
+import os
+
+# Read by config.settings when the workers load the application.
+os.environ.setdefault('DB_POOL_ENABLED', 'true')
+
+bind = os.environ.get('ASGI_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('ASGI_WORKERS', multiprocessing.cpu_count()))
+worker_class = 'uvicorn_worker.UvicornWorker'
+keepalive = int(os.environ.get('ASGI_KEEPALIVE', 5))
+graceful_timeout = int(os.environ.get('ASGI_GRACEFUL_TIMEOUT', 30))
+timeout = int(os.environ.get('ASGI_TIMEOUT', 60))
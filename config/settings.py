@@ -2,6 +2,7 @@ import os
 from pathlib import Path
 
 import environ
+from celery.schedules import crontab
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 env = environ.Env(DEBUG=(bool, False))
@@ -19,6 +20,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django.contrib.gis',
+    'django.contrib.postgres',
     # Third-party apps
     'rest_framework',
     'django_redis',
@@ -28,11 +30,13 @@ INSTALLED_APPS = [
     'app.apps.AppConfig',
 ]
 MIDDLEWARE = [
+    'app.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'app.routers.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -54,12 +58,43 @@ TEMPLATES = [
 ]
 WSGI_APPLICATION = 'config.wsgi.application'
 ASGI_APPLICATION = 'config.asgi.application'
+# Either a psycopg_pool pool per process (DB_POOL_ENABLED, needed under ASGI where every request
+# runs on its own thread) or one persistent connection per thread, health-checked before reuse.
+DB_POOL_ENABLED = env.bool('DB_POOL_ENABLED', default=False)
 DATABASES = {
     'default': {
         **env.db('DATABASE_URL', default='postgres://dbuser:dbpassword@db:5432/appdb'),
-        'ENGINE': 'django.contrib.gis.db.backends.postgis',
+        'ENGINE': 'app.db',
+        'CONN_MAX_AGE': 0 if DB_POOL_ENABLED else env.int('DB_CONN_MAX_AGE', default=60),
+        'CONN_HEALTH_CHECKS': env.bool('DB_CONN_HEALTH_CHECKS', default=True),
     }
 }
+if DB_POOL_ENABLED:
+    DATABASES['default']['OPTIONS'] = {
+        **DATABASES['default'].get('OPTIONS', {}),
+        'pool': {
+            'min_size': env.int('DB_POOL_MIN_SIZE', default=2),
+            'max_size': env.int('DB_POOL_MAX_SIZE', default=10),
+            'timeout': env.float('DB_POOL_TIMEOUT', default=10.0),
+            'max_idle': env.float('DB_POOL_MAX_IDLE', default=300.0),
+            'max_lifetime': env.float('DB_POOL_MAX_LIFETIME', default=1800.0),
+        },
+    }
+# Read replicas, as aliases replica1..N sharing the primary's connection settings. Reads go to them
+# only from endpoints that opt in; see app.routers. Tests read the replicas through the primary.
+DATABASE_REPLICAS = []
+for index, url in enumerate(env.list('DATABASE_REPLICA_URLS', default=[]), start=1):
+    alias = f'replica{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        **env.db_url_config(url),
+        'ENGINE': DATABASES['default']['ENGINE'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ['app.routers.ReplicaRouter']
+# How long a user who wrote keeps reading from the primary, covering the replicas' lag.
+REPLICA_PIN_SECONDS = env.int('REPLICA_PIN_SECONDS', default=5)
 AUTH_USER_MODEL = 'app.User'
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -91,6 +126,10 @@ REST_FRAMEWORK = {
         'rest_framework.authentication.TokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'app.api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
@@ -101,7 +140,19 @@ SPECTACULAR_SETTINGS = {
     'VERSION': '1.0.0',
     'SERVE_INCLUDE_SCHEMA': False,
 }
-CACHES = {'default': env.cache('CACHE_URL', default='redis://localhost:6379/0')}
+CACHES = {
+    'default': {
+        **env.cache('CACHE_URL', default='redis://localhost:6379/0'),
+        'OPTIONS': {'REDIS_CLIENT_CLASS': 'app.metrics.InstrumentedRedis'},
+    }
+}
+# The cache and app.services share the pool of app.connections.redis_pool().
+DJANGO_REDIS_CONNECTION_FACTORY = 'app.connections.SharedConnectionFactory'
+REDIS_MAX_CONNECTIONS = env.int('REDIS_MAX_CONNECTIONS', default=50)
+REDIS_POOL_TIMEOUT = env.float('REDIS_POOL_TIMEOUT', default=5.0)
+REDIS_HEALTH_CHECK_INTERVAL = env.int('REDIS_HEALTH_CHECK_INTERVAL', default=30)
+REDIS_SOCKET_TIMEOUT = env.float('REDIS_SOCKET_TIMEOUT', default=5.0)
+REDIS_SOCKET_CONNECT_TIMEOUT = env.float('REDIS_SOCKET_CONNECT_TIMEOUT', default=2.0)
 SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
 SESSION_CACHE_ALIAS = 'default'
 CELERY_BROKER_URL = env('CELERY_BROKER_URL', default='redis://cache:6379/0')
@@ -111,7 +162,80 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 CELERY_TASK_DEFAULT_QUEUE = env('CELERY_DEFAULT_QUEUE', default='default')
-CELERY_BEAT_SCHEDULE = {}
+CELERY_BEAT_SCHEDULE = {
+    'relay-outbox': {
+        'task': 'app.relay_outbox',
+        'schedule': env.float('OUTBOX_RELAY_INTERVAL', default=10.0),
+    },
+    'prune-outbox': {
+        'task': 'app.prune_outbox',
+        'schedule': crontab(hour=2, minute=45),
+    },
+    'reconcile-hot-stock': {
+        'task': 'app.reconcile_hot_stock',
+        'schedule': env.float('INVENTORY_RECONCILE_INTERVAL', default=5.0),
+    },
+    'apply-flash-sales': {
+        'task': 'app.apply_flash_sales',
+        'schedule': crontab(),
+    },
+    'reconcile-sales-rollups': {
+        'task': 'app.reconcile_sales_rollups',
+        'schedule': crontab(hour=2, minute=15),
+    },
+    'rebuild-changed-sales-rollups': {
+        'task': 'app.rebuild_changed_sales_rollups',
+        'schedule': env.float('SALES_ROLLUP_CHANGES_INTERVAL', default=60.0),
+    },
+    'refresh-recommendations': {
+        'task': 'app.refresh_recommendations',
+        'schedule': crontab(hour=3, minute=0),
+    },
+    'build-recommendations': {
+        'task': 'app.build_recommendations',
+        'schedule': crontab(hour=4, minute=0, day_of_week='sunday'),
+    },
+    'audit-hot-stock': {
+        'task': 'app.audit_hot_stock',
+        'schedule': env.float('INVENTORY_AUDIT_INTERVAL', default=900.0),
+        'kwargs': {'repair': True},
+    },
+    'maintain-order-partitions': {
+        'task': 'app.maintain_order_partitions',
+        'schedule': crontab(hour=1, minute=30),
+    },
+}
+GEOSEARCH_TILE_CACHE_TTL = env.int('GEOSEARCH_TILE_CACHE_TTL', default=120)
+GEOSEARCH_TILE_MAX_CANDIDATES = env.int('GEOSEARCH_TILE_MAX_CANDIDATES', default=5000)
+GEOSEARCH_TILE_OVERFLOW_TTL = env.int('GEOSEARCH_TILE_OVERFLOW_TTL', default=60)
+REFERENCE_CACHE_TTL = env.int('REFERENCE_CACHE_TTL', default=3600)
+REFERENCE_CACHE_LOCAL_TTL = env.int('REFERENCE_CACHE_LOCAL_TTL', default=60)
+REFERENCE_CACHE_MAXSIZE = env.int('REFERENCE_CACHE_MAXSIZE', default=2048)
+DASHBOARD_CACHE_TTL = env.int('DASHBOARD_CACHE_TTL', default=60)
+DASHBOARD_CACHE_STALE = env.int('DASHBOARD_CACHE_STALE', default=15)
+DASHBOARD_CACHE_LOCK_TIMEOUT = env.int('DASHBOARD_CACHE_LOCK_TIMEOUT', default=10)
+DASHBOARD_CACHE_WAIT = env.float('DASHBOARD_CACHE_WAIT', default=2.0)
+# Connections one async dashboard cache miss uses at once; size DB_POOL_MAX_SIZE for the concurrent misses too.
+DASHBOARD_QUERY_CONCURRENCY = env.int('DASHBOARD_QUERY_CONCURRENCY', default=2)
+SALES_ROLLUP_RECONCILE_DAYS = env.int('SALES_ROLLUP_RECONCILE_DAYS', default=3)
+# Monthly order partitions (app.partitions): months created ahead, months kept live (0 keeps all) and
+# whether older months are dropped instead of moved to the archive schema.
+ORDER_PARTITION_MONTHS_AHEAD = env.int('ORDER_PARTITION_MONTHS_AHEAD', default=3)
+ORDER_RETENTION_MONTHS = env.int('ORDER_RETENTION_MONTHS', default=36)
+ORDER_ARCHIVE_DROP = env.bool('ORDER_ARCHIVE_DROP', default=False)
+RECOMMENDATIONS_TOP_K = env.int('RECOMMENDATIONS_TOP_K', default=20)
+PRODUCT_IMPORT_CHUNK_SIZE = env.int('PRODUCT_IMPORT_CHUNK_SIZE', default=5000)
+PRODUCT_IMPORT_MAX_ERRORS = env.int('PRODUCT_IMPORT_MAX_ERRORS', default=1000)
+EXPORT_CHUNK_SIZE = env.int('EXPORT_CHUNK_SIZE', default=2000)
+METRICS_ENABLED = env.bool('METRICS_ENABLED', default=True)
+METRICS_FLUSH_INTERVAL = env.float('METRICS_FLUSH_INTERVAL', default=5.0)
+METRICS_SLOW_REQUEST_SECONDS = env.float('METRICS_SLOW_REQUEST_SECONDS', default=1.0)
+METRICS_SLOW_REQUEST_SAMPLE_RATE = env.float('METRICS_SLOW_REQUEST_SAMPLE_RATE', default=0.1)
+OUTBOX_BATCH_SIZE = env.int('OUTBOX_BATCH_SIZE', default=500)
+OUTBOX_MAX_ATTEMPTS = env.int('OUTBOX_MAX_ATTEMPTS', default=5)
+OUTBOX_RETENTION_DAYS = env.int('OUTBOX_RETENTION_DAYS', default=7)
+# Reserve stock of products flagged ``is_hot`` in Redis instead of row-locking them in Postgres.
+INVENTORY_RESERVATIONS_ENABLED = env.bool('INVENTORY_RESERVATIONS_ENABLED', default=False)
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -1,9 +1,14 @@
+import gzip
+from datetime import timedelta
+
 import pytest
 from django.contrib.gis.geos import Point
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 
-from app.models import ArtisanShop, Category, Product, User
+from app.models import ArtisanShop, Category, Order, Product, ShopDailySales, User
+from app.services import DASHBOARD_CACHE_KEY, DASHBOARD_VERSION_KEY, create_order, redis_client, relay_outbox
 
 pytestmark = pytest.mark.django_db
 
@@ -69,12 +74,31 @@ def test_inventory_alert_trigger(authenticated_api_client, user):
     order_data2 = {'shop_id': shop.id, 'items': [{'product_id': product.id, 'quantity': 2}]}
     order_resp2 = authenticated_api_client.post(order_url, order_data2, format='json')
     assert order_resp2.status_code == status.HTTP_201_CREATED
-    # should trigger alert
+    # should trigger alert once the outbox is relayed
+    relay_outbox()
     alerts_url = reverse('api:inventory-alerts-list') + f'?shop={shop.id}'
     alerts_resp = authenticated_api_client.get(alerts_url)
     assert alerts_resp.status_code == status.HTTP_200_OK
-    assert len(alerts_resp.data) >= 1
-    assert alerts_resp.data[0]['product'] == 'Canvas'
+    assert len(alerts_resp.data['results']) >= 1
+    assert alerts_resp.data['results'][0]['product'] == 'Canvas'
+
+
+def test_shop_owner_changes_order_status(authenticated_api_client, user):
+    category = Category.objects.create(name='Quilts')
+    shop = ArtisanShop.objects.create(owner=user, name='Quilt Corner')
+    quilt = Product.objects.create(shop=shop, name='Quilt', price=120, quantity=4, category=category)
+    customer = User.objects.create_user(username='sleeper', password='pass')
+    order = create_order(customer, shop, [{'product_id': quilt.id, 'quantity': 1}])
+    url = reverse('api:order-set-status', kwargs={'pk': order.pk})
+    response = authenticated_api_client.post(url, {'status': Order.STATUS_COMPLETED}, format='json')
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data['status'] == Order.STATUS_COMPLETED
+    assert ShopDailySales.objects.get(shop=shop).orders == 1
+    response = authenticated_api_client.post(url, {'status': 'lost'}, format='json')
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    authenticated_api_client.force_authenticate(customer)
+    response = authenticated_api_client.post(url, {'status': Order.STATUS_CANCELLED}, format='json')
+    assert response.status_code == status.HTTP_404_NOT_FOUND
 
 
 def test_geosearch(authenticated_api_client, user):
@@ -84,8 +108,8 @@ def test_geosearch(authenticated_api_client, user):
     url = reverse('api:product-geosearch') + '?lat=8.0&lng=8.0&radius=10&category={}'.format(category.id)
     resp = authenticated_api_client.get(url)
     assert resp.status_code == status.HTTP_200_OK
-    assert len(resp.data) > 0
-    assert resp.data[0]['name'] == 'Mug'
+    assert len(resp.data['results']) > 0
+    assert resp.data['results'][0]['name'] == 'Mug'
 
 
 def test_dashboard(authenticated_api_client, user):
@@ -97,3 +121,192 @@ def test_dashboard(authenticated_api_client, user):
     assert resp.status_code == status.HTTP_200_OK
     assert 'monthly_analytics' in resp.data
     assert 'completed_orders' in resp.data
+
+
+def test_dashboard_is_cached_until_the_shop_changes(authenticated_api_client, user, django_capture_on_commit_callbacks):
+    category = Category.objects.create(name='Leather')
+    shop = ArtisanShop.objects.create(owner=user, name='Cached Shop')
+    product = Product.objects.create(shop=shop, name='Belt', price=40, quantity=10, category=category)
+    redis_client.delete(DASHBOARD_CACHE_KEY.format(shop.id), DASHBOARD_VERSION_KEY.format(shop.id))
+    url = reverse('api:artisanshop-dashboard', kwargs={'pk': shop.id})
+    assert authenticated_api_client.get(url).data['cache']['status'] == 'miss'
+    cached = authenticated_api_client.get(url)
+    assert cached.data['cache']['status'] == 'hit'
+    assert cached['X-Cache'] == 'hit'
+    product_url = reverse('api:product-detail', kwargs={'pk': product.id})
+    with django_capture_on_commit_callbacks(execute=True):
+        resp = authenticated_api_client.patch(product_url, {'quantity': 1}, format='json')
+    assert resp.status_code == status.HTTP_200_OK
+    refreshed = authenticated_api_client.get(url)
+    assert refreshed.data['cache']['status'] == 'miss'
+    assert refreshed.data['low_stock_products'][0]['name'] == 'Belt'
+
+
+def test_geosearch_orders_by_distance_and_paginates(api_client, user):
+    category = Category.objects.create(name='Textiles')
+    shop = ArtisanShop.objects.create(owner=user, name='Loom')
+    for name, lng in [('Far', 20.05), ('Near', 20.001), ('Mid', 20.02)]:
+        Product.objects.create(shop=shop, name=name, price=10, quantity=5, category=category, location=Point(lng, 20.0))
+    url = reverse('api:product-geosearch') + f'?lat=20.0&lng=20.0&radius=10&category={category.id}&page_size=2'
+    first = api_client.get(url)
+    assert [p['name'] for p in first.data['results']] == ['Near', 'Mid']
+    assert first.data['results'][0]['distance'] < first.data['results'][1]['distance']
+    second = api_client.get(first.data['next'])
+    assert [p['name'] for p in second.data['results']] == ['Far']
+    assert second.data['next'] is None
+
+
+def test_product_list_sorts_and_filters_by_effective_price(api_client, user):
+    category = Category.objects.create(name='Glass')
+    shop = ArtisanShop.objects.create(owner=user, name='Glassworks')
+    now = timezone.now()
+    Product.objects.create(shop=shop, name='Jar', price=12, quantity=2, category=category)
+    Product.objects.create(
+        shop=shop,
+        name='Vase',
+        price=40,
+        quantity=2,
+        category=category,
+        flash_sale_price=8,
+        flash_sale_start=now - timedelta(hours=1),
+        flash_sale_end=now + timedelta(hours=1),
+    )
+    url = reverse('api:product-list')
+    response = api_client.get(url, {'ordering': 'price'})
+    assert [p['name'] for p in response.data['results']] == ['Vase', 'Jar']
+    response = api_client.get(url, {'max_price': '10'})
+    assert [p['name'] for p in response.data['results']] == ['Vase']
+
+
+def test_product_list_keyset_pagination(api_client, user):
+    category = Category.objects.create(name='Leather')
+    shop = ArtisanShop.objects.create(owner=user, name='Tannery')
+    for i in range(5):
+        Product.objects.create(shop=shop, name=f'Belt {i}', price=10 + i, quantity=1, category=category)
+    url = reverse('api:product-list')
+    response = api_client.get(url, {'cursor': '', 'ordering': 'price', 'page_size': 2, 'approximate_count': 'true'})
+    assert [p['name'] for p in response.data['results']] == ['Belt 0', 'Belt 1']
+    assert 'approximate_count' in response.data
+    names = []
+    next_url = response.data['next']
+    while next_url:
+        response = api_client.get(next_url)
+        names += [p['name'] for p in response.data['results']]
+        next_url = response.data['next']
+    assert names == ['Belt 2', 'Belt 3', 'Belt 4']
+
+
+def test_duplicate_sku_is_rejected(authenticated_api_client, user):
+    category = Category.objects.create(name='Jewellery')
+    shop = ArtisanShop.objects.create(owner=user, name='Silversmith')
+    other_shop = ArtisanShop.objects.create(owner=user, name='Goldsmith')
+    ring = Product.objects.create(shop=shop, name='Ring', sku='RING-1', price=50, quantity=1, category=category)
+    url = reverse('api:product-list')
+    data = {'shop': shop.id, 'name': 'Other ring', 'sku': 'RING-1', 'price': '60.00', 'category_id': category.id}
+    response = authenticated_api_client.post(url, data, format='json')
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert 'sku' in response.data
+    response = authenticated_api_client.post(url, {**data, 'shop': other_shop.id}, format='json')
+    assert response.status_code == status.HTTP_201_CREATED
+    detail = reverse('api:product-detail', kwargs={'pk': ring.id})
+    assert authenticated_api_client.patch(detail, {'sku': 'RING-1'}, format='json').status_code == status.HTTP_200_OK
+    pendant = Product.objects.create(shop=shop, name='Pendant', price=30, quantity=1, category=category)
+    detail = reverse('api:product-detail', kwargs={'pk': pendant.id})
+    response = authenticated_api_client.patch(detail, {'sku': 'RING-1'}, format='json')
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_blank_skus_do_not_collide(authenticated_api_client, user):
+    category = Category.objects.create(name='Candles')
+    shop = ArtisanShop.objects.create(owner=user, name='Chandler')
+    url = reverse('api:product-list')
+    for name in ('Taper', 'Pillar'):
+        data = {'shop': shop.id, 'name': name, 'sku': '', 'price': '8.00', 'category_id': category.id}
+        response = authenticated_api_client.post(url, data, format='json')
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data['sku'] is None
+    assert Product.objects.filter(shop=shop, sku__isnull=True).count() == 2
+
+
+def test_product_search_ranks_and_tolerates_typos(api_client, user):
+    category = Category.objects.create(name='Pottery')
+    shop = ArtisanShop.objects.create(owner=user, name='Clay Corner')
+    Product.objects.create(shop=shop, name='Stoneware teapot', price=45, quantity=3, category=category)
+    Product.objects.create(
+        shop=shop, name='Mug', description='Pairs with our teapot', price=12, quantity=3, category=category
+    )
+    url = reverse('api:product-search')
+    response = api_client.get(url, {'q': 'teapot'})
+    assert response.status_code == status.HTTP_200_OK
+    assert [p['name'] for p in response.data['results']] == ['Stoneware teapot', 'Mug']
+    response = api_client.get(url, {'q': 'teapott'})
+    assert [p['name'] for p in response.data['results']] == ['Stoneware teapot']
+    response = api_client.get(url, {'q': 'clay corner'})
+    assert len(response.data['results']) == 2
+
+
+def test_product_list_answers_conditional_gets(api_client, user, django_capture_on_commit_callbacks):
+    category = Category.objects.create(name='Baskets')
+    shop = ArtisanShop.objects.create(owner=user, name='Weavers')
+    product = Product.objects.create(shop=shop, name='Hamper', price=30, quantity=9, category=category)
+    url = reverse('api:product-list')
+    etag = api_client.get(url)['ETag']
+    response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    with django_capture_on_commit_callbacks(execute=True):
+        create_order(user, shop, [{'product_id': product.pk, 'quantity': 1}])
+    response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_200_OK
+    assert response['ETag'] != etag
+
+
+def test_shop_order_export_streams_csv_and_gzip(authenticated_api_client, user):
+    category = Category.objects.create(name='Candles')
+    shop = ArtisanShop.objects.create(owner=user, name='Wick & Wax')
+    candle = Product.objects.create(shop=shop, name='Taper', price=4, quantity=20, category=category)
+    create_order(user, shop, [{'product_id': candle.pk, 'quantity': 3}])
+    url = reverse('api:artisanshop-export', kwargs={'pk': shop.pk})
+    response = authenticated_api_client.get(url)
+    assert response.status_code == status.HTTP_200_OK
+    lines = b''.join(response.streaming_content).decode().splitlines()
+    assert lines[0].startswith('order_id,created_at,status')
+    assert lines[1].endswith(',Taper,,Candles,3,4.00,12.00')
+    response = authenticated_api_client.get(url, {'output': 'ndjson', 'compress': 'gzip'})
+    assert gzip.decompress(b''.join(response.streaming_content)).count(b'\n') == 1
+
+
+def test_async_product_endpoints_match_their_sync_counterparts(api_client, user):
+    category = Category.objects.create(name='Woodwork')
+    shop = ArtisanShop.objects.create(owner=user, name='Lathe')
+    bowl = Product.objects.create(
+        shop=shop, name='Bowl', price=25, quantity=4, category=category, location=Point(12.0, 12.0)
+    )
+    Product.objects.create(shop=shop, name='Spoon', price=6, quantity=9, category=category, location=Point(12.01, 12.0))
+    for sync_url, async_url in [
+        (
+            reverse('api:product-detail', kwargs={'pk': bowl.id}),
+            reverse('api:async-product-detail', kwargs={'pk': bowl.id}),
+        ),
+        (
+            reverse('api:product-recommendations', kwargs={'pk': bowl.id}),
+            reverse('api:async-product-recommendations', kwargs={'pk': bowl.id}),
+        ),
+        (
+            reverse('api:product-geosearch') + '?lat=12.0&lng=12.0&radius=5&page_size=1',
+            reverse('api:async-product-geosearch') + '?lat=12.0&lng=12.0&radius=5&page_size=1',
+        ),
+    ]:
+        expected = api_client.get(sync_url, HTTP_ACCEPT='application/json')
+        resp = api_client.get(async_url)
+        assert resp.status_code == status.HTTP_200_OK
+        assert resp.content == expected.content.replace(b'/api/products/', b'/api/async/products/')
+        assert resp.get('ETag') == expected.get('ETag')
+    missing = api_client.get(reverse('api:async-product-detail', kwargs={'pk': bowl.id + 100}))
+    assert missing.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_async_dashboard_requires_authentication(api_client, user):
+    shop = ArtisanShop.objects.create(owner=user, name='Private Shop')
+    url = reverse('api:async-artisanshop-dashboard', kwargs={'pk': shop.id})
+    assert api_client.get(url).status_code == status.HTTP_401_UNAUTHORIZED
+    assert api_client.get(url, HTTP_AUTHORIZATION='Token nope').status_code == status.HTTP_401_UNAUTHORIZED
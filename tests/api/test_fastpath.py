@@ -0,0 +1,62 @@
+from decimal import Decimal
+
+from django.contrib.gis.geos import Point
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from app.api.fastpath import _wkt_number, product_rows
+from app.api.renderers import ORJSONRenderer
+from app.api.serializers import ProductSerializer
+from app.models import Category, Product
+
+
+def test_fast_rows_render_like_the_product_serializer():
+    now = timezone.now()
+    category = Category(id=3, name='Glass', description=None)
+    product = Product(
+        id=1,
+        shop_id=2,
+        name='Vase',
+        sku='VS-1',
+        description='Blown',
+        price=Decimal('12.50'),
+        quantity=4,
+        category=category,
+        location=Point(-73.98765432101, 40.0, srid=4326),
+        flash_sale_price=Decimal('9.00'),
+        flash_sale_start=now,
+        flash_sale_end=now.replace(microsecond=0),
+        effective_price=Decimal('9.00'),
+        on_flash_sale=True,
+        created_at=now,
+        updated_at=now,
+    )
+    row = {
+        'id': 1,
+        'shop_id': 2,
+        'name': 'Vase',
+        'sku': 'VS-1',
+        'description': 'Blown',
+        'price': Decimal('12.50'),
+        'quantity': 4,
+        'category_id': 3,
+        'category__name': 'Glass',
+        'category__description': None,
+        'is_hot': False,
+        'flash_sale_price': Decimal('9.00'),
+        'flash_sale_start': now,
+        'flash_sale_end': now.replace(microsecond=0),
+        'effective_price': Decimal('9.00'),
+        'on_flash_sale': True,
+        'created_at': now,
+        'updated_at': now,
+        'location_x': -73.98765432101,
+        'location_y': 40.0,
+    }
+    expected = JSONRenderer().render(ProductSerializer([product], many=True).data)
+    assert ORJSONRenderer().render(product_rows([row])) == expected
+
+
+def test_wkt_numbers_match_geos():
+    for value in (0.0, 10.0, -0.15964446510739094, 0.03507714718867305, 1e-05, 135.26327691874354):
+        assert _wkt_number(value) == str(Point(value, 0)).split('(')[1].split(' ')[0]
@@ -0,0 +1,35 @@
+import re
+
+import pytest
+from django.urls import reverse
+
+from app.metrics import METRICS_KEY
+from app.models import Category
+from app.services import redis_client
+
+
+def _sample(body, series):
+    match = re.search(rf'^{re.escape(series)} (\S+)$', body, re.MULTILINE)
+    return float(match.group(1)) if match else None
+
+
+@pytest.mark.django_db
+def test_metrics_endpoint_reports_latency_and_queries_per_route(api_client, settings):
+    settings.METRICS_SLOW_REQUEST_SECONDS = 0
+    settings.METRICS_SLOW_REQUEST_SAMPLE_RATE = 1
+    redis_client.delete(METRICS_KEY)
+    Category.objects.create(name='Ceramics')
+    category_url = reverse('api:category-detail', kwargs={'pk': Category.objects.get().pk})
+    for _ in range(2):
+        assert api_client.get(category_url).status_code == 200
+
+    resp = api_client.get(reverse('api:metrics'))
+    assert resp['Content-Type'].startswith('text/plain; version=0.0.4')
+    body = resp.content.decode()
+    labels = 'route="api:category-detail",method="GET",status="200"'
+    assert _sample(body, f'http_request_duration_seconds_count{{{labels}}}') == 2
+    assert _sample(body, f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}}') == 2
+    assert _sample(body, 'http_request_db_queries_total{route="api:category-detail"}') >= 2
+    assert _sample(body, 'http_request_redis_calls_total{route="api:category-detail"}') >= 2
+    assert _sample(body, 'http_request_serializer_seconds_total{route="api:category-detail"}') > 0
+    assert '# TYPE http_request_duration_seconds histogram' in body
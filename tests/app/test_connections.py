@@ -0,0 +1,47 @@
+import os
+
+import pytest
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+
+from app import metrics
+from app.connections import pool_samples, redis_pool
+from app.db.base import DatabaseWrapper
+from app.services import redis_client
+
+
+def test_cache_and_services_share_one_redis_pool():
+    assert cache.client.get_client().connection_pool is redis_pool()
+    assert redis_client.connection_pool is redis_pool()
+    assert metrics._store().connection_pool is redis_pool()
+
+
+def test_pool_samples_report_the_redis_pool(settings):
+    _, gauges = pool_samples()
+    assert ('redis_pool_max_connections', {}, settings.REDIS_MAX_CONNECTIONS) in gauges
+    assert ('redis_pool_connections', {'state': 'in_use'}, 0) in gauges
+
+
+def test_forked_child_starts_with_a_fresh_redis_pool():
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read)
+        stats = redis_pool().stats()
+        os.write(write, b'1' if redis_pool().pid == os.getpid() and stats['in_use'] == 0 else b'0')
+        os._exit(0)
+    os.close(write)
+    os.waitpid(pid, 0)
+    assert os.read(read, 1) == b'1'
+    assert redis_pool().pid == os.getpid()
+
+
+def test_pooled_connections_require_conn_max_age_zero():
+    settings_dict = {**connection.settings_dict, 'CONN_MAX_AGE': 60, 'OPTIONS': {'pool': {'max_size': 4}}}
+    with pytest.raises(ImproperlyConfigured):
+        DatabaseWrapper(settings_dict, alias='pooled').pool_options
+    settings_dict['CONN_MAX_AGE'] = 0
+    wrapper = DatabaseWrapper(settings_dict, alias='pooled')
+    assert wrapper.pool_options == {'max_size': 4}
+    assert 'pool' not in wrapper.get_connection_params()
@@ -0,0 +1,63 @@
+import pytest
+from django.contrib.gis.geos import Point
+
+from app.geotiles import (
+    GEO_TILE_KEY,
+    cached_geolocation_product_search,
+    geohash_bounds,
+    geohash_encode,
+    invalidate_geo_tiles,
+)
+from app.models import ArtisanShop, Category, Product, User
+from app.services import redis_client
+
+
+def test_geohash_round_trip():
+    assert geohash_encode(10.40744, 57.64911, 11) == 'u4pruydqqvj'
+    min_lng, min_lat, max_lng, max_lat = geohash_bounds('u4pru')
+    assert min_lng <= 10.40744 <= max_lng
+    assert min_lat <= 57.64911 <= max_lat
+
+
+@pytest.mark.django_db
+def test_tile_cache_refilters_and_is_invalidated_by_product_changes():
+    owner = User.objects.create_user(username='weaver', password='pass', role=User.ROLE_ARTISAN)
+    shop = ArtisanShop.objects.create(owner=owner, name='Tile Shop')
+    category = Category.objects.create(name='Baskets')
+    Product.objects.create(
+        shop=shop, name='Basket', price=15, quantity=3, category=category, location=Point(30.001, 30.0)
+    )
+    first = cached_geolocation_product_search(Point(30.0, 30.0, srid=4326), 2, category)
+    assert [p.name for p in first[:10]] == ['Basket']
+
+    nearby = Point(30.0005, 30.0, srid=4326)
+    tray = Product.objects.create(shop=shop, name='Tray', price=9, quantity=3, category=category, location=nearby)
+    stale = cached_geolocation_product_search(Point(30.0001, 30.0, srid=4326), 2, category)
+    assert [p.name for p in stale[:10]] == ['Basket']
+
+    invalidate_geo_tiles(tray.location)
+    fresh = cached_geolocation_product_search(Point(30.0001, 30.0, srid=4326), 2, category)
+    assert [p.name for p in fresh[:10]] == ['Tray', 'Basket']
+
+
+def test_overflowing_tiles_send_later_searches_straight_to_the_direct_search(settings, monkeypatch):
+    settings.GEOSEARCH_TILE_MAX_CANDIDATES = 1
+    calls = []
+
+    class Rows:
+        def values_list(self, *fields):
+            calls.append('tile')
+            return [(1, Point(40.0, 40.0)), (2, Point(40.001, 40.0))]
+
+    def search(point, radius_km, category, after=None):
+        calls.append('search')
+        return Rows()
+
+    monkeypatch.setattr('app.geotiles.geolocation_product_search', search)
+    point = Point(40.0, 40.0, srid=4326)
+    for tile_key in redis_client.scan_iter(GEO_TILE_KEY.format('*', 'all', '*')):
+        redis_client.delete(tile_key)
+    cached_geolocation_product_search(point, 2)
+    cached_geolocation_product_search(point, 2)
+    # The first search fetches the tile's candidates and falls back; the second skips the tile.
+    assert calls == ['search', 'tile', 'search', 'search']
@@ -0,0 +1,50 @@
+import io
+from decimal import Decimal
+
+import pytest
+
+from app.imports import import_products, read_rows
+from app.models import ArtisanShop, Category, Product, User
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def shop():
+    artisan = User.objects.create_user(username='importer', password='pass', role=User.ROLE_ARTISAN)
+    return ArtisanShop.objects.create(owner=artisan, name='Import Shop')
+
+
+CSV = """sku,name,price,quantity,category,lat,lng
+MUG-1,Mug,12.50,10,Ceramics,40.7,-73.9
+MUG-2,Jug,abc,3,Ceramics,,
+MUG-3,Plate,8,4,Unknown,,
+MUG-1,Big mug,14.00,6,Ceramics,,
+"""
+
+
+def test_csv_import_upserts_valid_rows_and_reports_the_rest(shop):
+    Category.objects.create(name='Ceramics')
+    report = import_products(shop, read_rows(io.StringIO(CSV), 'csv'))
+    assert (report.created, report.updated, report.error_count) == (1, 0, 2)
+    assert [error['row'] for error in report.errors] == [2, 3]
+    mug = Product.objects.get(shop=shop, sku='MUG-1')
+    assert (mug.name, mug.price, mug.effective_price, mug.quantity) == (
+        'Big mug',
+        Decimal('14.00'),
+        Decimal('14.00'),
+        6,
+    )
+    assert mug.location is None
+
+
+def test_ndjson_import_updates_existing_skus(shop):
+    category = Category.objects.create(name='Glass')
+    Product.objects.create(shop=shop, sku='GL-1', name='Glass', price=5, quantity=1, category=category)
+    lines = io.StringIO(
+        f'{{"sku": "GL-1", "name": "Tumbler", "price": 6, "quantity": 9, "category_id": {category.pk}}}\n'
+    )
+    report = import_products(shop, read_rows(lines, 'ndjson'))
+    assert (report.created, report.updated, report.error_count) == (0, 1, 0)
+    tumbler = Product.objects.get(shop=shop, sku='GL-1')
+    assert (tumbler.name, tumbler.quantity) == ('Tumbler', 9)
@@ -0,0 +1,117 @@
+from datetime import date, datetime, timedelta
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+
+import pytest
+from django.db import connection
+from django.utils import timezone
+
+from app.models import ArtisanShop, Category, DeliverySchedule, Order, OrderItem, Product, User
+from app.partitions import (
+    ARCHIVE_SCHEMA,
+    add_months,
+    archive_partitions,
+    ensure_partitions,
+    maintain_order_partitions,
+    month_start,
+    partition_months,
+    partition_name,
+)
+from app.services import create_order
+
+
+@pytest.fixture
+def product():
+    artisan = User.objects.create_user(username='weaver', password='pass', role=User.ROLE_ARTISAN)
+    shop = ArtisanShop.objects.create(owner=artisan, name='Partition Shop')
+    category = Category.objects.create(name='Textiles')
+    return Product.objects.create(shop=shop, name='Rug', price=Decimal('90.00'), quantity=50, category=category)
+
+
+@pytest.fixture
+def customer():
+    return User.objects.create_user(username='archivist', password='pass')
+
+
+def _old_order(product, customer, created_at, status):
+    order = Order.objects.create(customer=customer, shop=product.shop, created_at=created_at, status=status)
+    OrderItem.objects.create(order=order, product=product, quantity=1, unit_price=90, total_price=90)
+    return order
+
+
+def _archive(before, drop=False):
+    # Run the deferred foreign key checks first: Postgres cannot detach a partition with pending trigger events.
+    connection.check_constraints()
+    return archive_partitions(before, drop=drop)
+
+
+def _table_rows(table):
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT count(*) FROM {table}')
+        return cursor.fetchone()[0]
+
+
+def test_month_helpers():
+    assert month_start(datetime(2025, 3, 31, 23, 30, tzinfo=dt_timezone(timedelta(hours=-2)))) == date(2025, 4, 1)
+    assert add_months(date(2025, 11, 1), 3) == date(2026, 2, 1)
+    assert add_months(date(2025, 1, 1), -1) == date(2024, 12, 1)
+    assert partition_name(OrderItem, date(2025, 2, 1)) == 'app_orderitem_p2025_02'
+
+
+@pytest.mark.django_db
+def test_months_ahead_are_created():
+    current = month_start(timezone.now())
+    created, archived = maintain_order_partitions(months_ahead=5, retention_months=0)
+    assert partition_name(Order, add_months(current, 5)) in created
+    assert archived == []
+    for model in (Order, OrderItem):
+        assert {add_months(current, ahead) for ahead in range(6)} <= set(partition_months(model))
+    assert maintain_order_partitions(months_ahead=5, retention_months=0) == ([], [])
+
+
+@pytest.mark.django_db
+def test_lines_share_their_orders_partition(product, customer):
+    created_at = timezone.now() - timedelta(days=200)
+    ensure_partitions(created_at, created_at)
+    order = create_order(customer, product.shop, [{'product_id': product.id, 'quantity': 2}])
+    assert OrderItem.objects.get(order=order).created_at == order.created_at
+    old = _old_order(product, customer, created_at, Order.STATUS_COMPLETED)
+    assert old.items.get().created_at == old.created_at
+    assert _table_rows(partition_name(OrderItem, month_start(old.created_at))) == 1
+
+
+@pytest.mark.django_db
+def test_closed_months_past_retention_are_archived(product, customer):
+    now = timezone.now()
+    ensure_partitions(now - timedelta(days=500), now)
+    closed = _old_order(product, customer, now - timedelta(days=400), Order.STATUS_COMPLETED)
+    DeliverySchedule.objects.create(order=closed, address='1 Loom Lane')
+    still_open = _old_order(product, customer, now - timedelta(days=500), Order.STATUS_PROCESSING)
+    recent = create_order(customer, product.shop, [{'product_id': product.id, 'quantity': 1}])
+
+    archived = _archive(add_months(month_start(now), -6))
+
+    month = month_start(closed.created_at)
+    assert archived == [month]
+    assert set(Order.objects.values_list('pk', flat=True)) == {still_open.pk, recent.pk}
+    assert not OrderItem.objects.filter(order_id=closed.pk).exists()
+    assert not DeliverySchedule.objects.exists()
+    assert month not in partition_months(Order) and month not in partition_months(OrderItem)
+    for model in (Order, OrderItem, DeliverySchedule):
+        assert _table_rows(f'{ARCHIVE_SCHEMA}.{partition_name(model, month)}') == 1
+
+
+@pytest.mark.django_db
+def test_archived_months_can_be_dropped(product, customer):
+    created_at = timezone.now() - timedelta(days=400)
+    ensure_partitions(created_at, created_at)
+    old = _old_order(product, customer, created_at, Order.STATUS_CANCELLED)
+    month = month_start(old.created_at)
+    assert _archive(add_months(month, 1), drop=True) == [month]
+    assert not Order.objects.exists()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT to_regclass(%s), to_regclass(%s)',
+            [partition_name(Order, month), f'{ARCHIVE_SCHEMA}.{partition_name(Order, month)}'],
+        )
+        assert cursor.fetchone() == (None, None)
@@ -0,0 +1,69 @@
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from django.utils import timezone
+
+from app.models import ArtisanShop, Category, OrderItem, Product, User
+from app.pricing import apply_flash_sale_windows
+from app.services import create_order
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def shop():
+    artisan = User.objects.create_user(username='seller', password='pass', role=User.ROLE_ARTISAN)
+    return ArtisanShop.objects.create(owner=artisan, name='Sale Shop')
+
+
+def _sale_product(shop, start, end):
+    category, _ = Category.objects.get_or_create(name='Textiles')
+    return Product.objects.create(
+        shop=shop,
+        name='Scarf',
+        price=Decimal('30.00'),
+        quantity=10,
+        category=category,
+        flash_sale_price=Decimal('20.00'),
+        flash_sale_start=start,
+        flash_sale_end=end,
+    )
+
+
+def test_save_precomputes_effective_price(shop):
+    now = timezone.now()
+    active = _sale_product(shop, now - timedelta(hours=1), now + timedelta(hours=1))
+    upcoming = _sale_product(shop, now + timedelta(hours=1), now + timedelta(hours=2))
+    assert (active.on_flash_sale, active.effective_price) == (True, Decimal('20.00'))
+    assert (upcoming.on_flash_sale, upcoming.effective_price) == (False, Decimal('30.00'))
+
+
+def test_sale_windows_are_switched_at_their_boundaries(shop):
+    now = timezone.now()
+    scarf = _sale_product(shop, now + timedelta(minutes=5), now + timedelta(minutes=10))
+    assert apply_flash_sale_windows(now + timedelta(minutes=6)) == (1, 0)
+    scarf.refresh_from_db()
+    assert (scarf.on_flash_sale, scarf.effective_price) == (True, Decimal('20.00'))
+    assert apply_flash_sale_windows(now + timedelta(minutes=11)) == (0, 1)
+    scarf.refresh_from_db()
+    assert (scarf.on_flash_sale, scarf.effective_price) == (False, Decimal('30.00'))
+    assert scarf.flash_sale_price is None and scarf.flash_sale_end is None
+
+
+def test_windows_closed_before_they_started_are_cleared(shop):
+    now = timezone.now()
+    scarf = _sale_product(shop, now + timedelta(minutes=5), now + timedelta(minutes=10))
+    assert apply_flash_sale_windows(now + timedelta(minutes=11)) == (0, 0)
+    scarf.refresh_from_db()
+    assert (scarf.flash_sale_price, scarf.flash_sale_start, scarf.flash_sale_end) == (None, None, None)
+    assert not Product.objects.filter(on_flash_sale=False, flash_sale_price__isnull=False).exists()
+
+
+def test_create_order_locks_in_the_sale_price(shop):
+    now = timezone.now()
+    scarf = _sale_product(shop, now - timedelta(hours=1), now + timedelta(hours=1))
+    customer = User.objects.create_user(username='shopper', password='pass')
+    order = create_order(customer, shop, [{'product_id': scarf.pk, 'quantity': 2}])
+    assert OrderItem.objects.get(order=order).unit_price == Decimal('20.00')
+    assert order.total_amount == Decimal('40.00')
@@ -0,0 +1,52 @@
+from decimal import Decimal
+
+import pytest
+
+from app.models import ArtisanShop, Category, Product, ProductRecommendation, User
+from app.recommendations import build_recommendations, refresh_recommendations
+from app.services import create_order, recommend_products
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def catalog():
+    owner = User.objects.create_user(username='glassblower', password='pass', role=User.ROLE_ARTISAN)
+    shop = ArtisanShop.objects.create(owner=owner, name='Glass Works')
+    glass = Category.objects.create(name='Glassware')
+    candles = Category.objects.create(name='Candles')
+    products = {
+        name: Product.objects.create(shop=shop, name=name, price=Decimal('5.00'), quantity=100, category=category)
+        for name, category in [('Vase', glass), ('Bowl', glass), ('Tumbler', glass), ('Taper', candles)]
+    }
+    return shop, products
+
+
+def _buy(shop, *products):
+    customer = User.objects.create_user(username=f'buyer{User.objects.count()}', password='pass')
+    create_order(customer, shop, [{'product_id': p.id, 'quantity': 1} for p in products])
+
+
+def test_build_ranks_co_purchases_and_pads_with_category(catalog):
+    shop, p = catalog
+    _buy(shop, p['Vase'], p['Taper'])
+    _buy(shop, p['Vase'], p['Taper'], p['Bowl'])
+    build_recommendations(top_k=3)
+    assert [r.name for r in recommend_products(p['Vase'])] == ['Taper', 'Bowl', 'Tumbler']
+    sources = ProductRecommendation.objects.filter(product=p['Vase']).order_by('rank').values_list('source', flat=True)
+    assert list(sources) == ['co_purchase', 'co_purchase', 'category']
+
+
+def test_refresh_folds_in_new_orders(catalog):
+    shop, p = catalog
+    _buy(shop, p['Vase'], p['Bowl'])
+    build_recommendations(top_k=3)
+    _buy(shop, p['Vase'], p['Tumbler'])
+    _buy(shop, p['Vase'], p['Tumbler'])
+    assert refresh_recommendations(top_k=3) == 2
+    assert [r.name for r in recommend_products(p['Vase'])][:2] == ['Tumbler', 'Bowl']
+
+
+def test_cold_start_falls_back_to_same_category(catalog):
+    _, p = catalog
+    assert {r.name for r in recommend_products(p['Bowl'])} == {'Vase', 'Tumbler'}
@@ -0,0 +1,62 @@
+import pytest
+from asgiref.sync import async_to_sync
+
+from app.models import Category
+from app.refcache import REFERENCE_CACHE_KEY, category_cache
+from app.services import redis_client
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def category():
+    category = Category.objects.create(name='Jewellery')
+    redis_client.delete(REFERENCE_CACHE_KEY.format(category_cache.label, category.pk))
+    category_cache.forget(category.pk)
+    return category
+
+
+def test_lookups_are_served_from_the_cache_tiers(category, django_assert_num_queries):
+    with django_assert_num_queries(1):
+        assert category_cache.get(category.pk).name == 'Jewellery'
+        assert category_cache.get(str(category.pk)) == category
+    category_cache.forget(category.pk)
+    with django_assert_num_queries(0):
+        assert category_cache.get(category.pk).name == 'Jewellery'
+
+
+def test_invalidation_drops_both_tiers(category):
+    category_cache.get(category.pk)
+    Category.objects.filter(pk=category.pk).update(name='Rings')
+    category_cache.invalidate(category.pk)
+    assert category_cache.get(category.pk).name == 'Rings'
+    assert category_cache.get('not-a-pk') is None
+
+
+def test_missing_rows_are_not_cached():
+    redis_client.delete(REFERENCE_CACHE_KEY.format(category_cache.label, 987654))
+    category_cache.forget(987654)
+    assert category_cache.get(987654) is None
+    Category.objects.create(pk=987654, name='Enamel')
+    assert category_cache.get(987654).name == 'Enamel'
+
+
+def test_saves_and_deletes_invalidate_on_commit(category, django_capture_on_commit_callbacks):
+    category_cache.get(category.pk)
+    category.name = 'Brooches'
+    with django_capture_on_commit_callbacks(execute=True):
+        category.save()
+    assert category_cache.get(category.pk).name == 'Brooches'
+    with django_capture_on_commit_callbacks(execute=True):
+        category.delete()
+    assert category_cache.get(category.pk) is None
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_lookups_share_the_cache_tiers(category, django_assert_num_queries):
+    with django_assert_num_queries(1):
+        assert async_to_sync(category_cache.aget)(category.pk).name == 'Jewellery'
+        assert category_cache.get(category.pk) == category
+    category_cache.forget(category.pk)
+    assert async_to_sync(category_cache.aget)(category.pk) == category
+    assert async_to_sync(category_cache.aget)('not-a-pk') is None
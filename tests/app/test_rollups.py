@@ -0,0 +1,85 @@
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.utils import timezone
+
+from app.models import ArtisanShop, Category, Order, Product, ShopDailySales, ShopProductDailySales, User
+from app.rollups import rebuild_changed_rollups, rebuild_rollups
+from app.services import (
+    aartisan_dashboard_kpis,
+    artisan_dashboard_kpis,
+    change_order_status,
+    create_order,
+    monthly_sales_analytics,
+)
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def order():
+    artisan = User.objects.create_user(username='potter', password='pass', role=User.ROLE_ARTISAN)
+    customer = User.objects.create_user(username='collector', password='pass')
+    shop = ArtisanShop.objects.create(owner=artisan, name='Rollup Shop')
+    category = Category.objects.create(name='Stoneware')
+    jug = Product.objects.create(shop=shop, name='Jug', price=Decimal('30.00'), quantity=20, category=category)
+    cup = Product.objects.create(shop=shop, name='Cup', price=Decimal('8.00'), quantity=20, category=category)
+    return create_order(customer, shop, [{'product_id': jug.id, 'quantity': 2}, {'product_id': cup.id, 'quantity': 3}])
+
+
+def test_completing_an_order_updates_the_rollups(order):
+    change_order_status(order, Order.STATUS_COMPLETED)
+    today = timezone.localdate()
+    analytics = monthly_sales_analytics(order.shop, month=today.month, year=today.year)
+    assert analytics['total_revenue'] == Decimal('84.00')
+    assert analytics['category_revenue'] == [{'product__category__name': 'Stoneware', 'revenue': Decimal('84.00')}]
+    assert analytics['top_products'][0]['product__name'] == 'Jug'
+    assert artisan_dashboard_kpis(order.shop)['completed_orders'] == 1
+
+
+def test_leaving_completed_reverts_the_rollups(order):
+    change_order_status(order, Order.STATUS_COMPLETED)
+    change_order_status(order, Order.STATUS_CANCELLED)
+    daily = ShopDailySales.objects.get(shop=order.shop)
+    assert daily.revenue == 0
+    assert daily.orders == 0
+
+
+def test_rebuild_matches_incremental_rollups(order):
+    change_order_status(order, Order.STATUS_COMPLETED)
+    incremental = sorted(ShopProductDailySales.objects.values_list('product_id', 'revenue', 'quantity'))
+    today = timezone.localdate()
+    rebuild_rollups(today, today + timedelta(days=1))
+    assert sorted(ShopProductDailySales.objects.values_list('product_id', 'revenue', 'quantity')) == incremental
+    assert ShopDailySales.objects.get(shop=order.shop).revenue == Decimal('84.00')
+
+
+def test_sales_breakdown_is_a_single_query(order, django_assert_num_queries):
+    change_order_status(order, Order.STATUS_COMPLETED)
+    with django_assert_num_queries(1):
+        analytics = monthly_sales_analytics(order.shop)
+    assert [p['rank'] for p in analytics['top_products']] == [1, 2]
+    assert analytics['top_products'][1]['product_count'] == 3
+
+
+def test_status_writes_outside_the_service_layer_are_rebuilt(order):
+    Order.objects.filter(pk=order.pk).update(status=Order.STATUS_COMPLETED)
+    assert not ShopDailySales.objects.filter(shop=order.shop).exists()
+    assert rebuild_changed_rollups() == [order.shop_id]
+    assert ShopDailySales.objects.get(shop=order.shop).revenue == Decimal('84.00')
+    assert rebuild_changed_rollups() == []
+    Order.objects.filter(pk=order.pk).delete()
+    assert rebuild_changed_rollups() == [order.shop_id]
+    assert not ShopDailySales.objects.filter(shop=order.shop).exists()
+
+
+# The async KPIs query from worker threads with connections of their own, which only see committed rows.
+@pytest.mark.django_db(transaction=True)
+def test_async_dashboard_kpis_match_the_sync_ones(order, settings):
+    settings.DASHBOARD_QUERY_CONCURRENCY = 2
+    change_order_status(order, Order.STATUS_COMPLETED)
+    expected = artisan_dashboard_kpis(order.shop)
+    assert expected['completed_orders'] == 1
+    assert async_to_sync(aartisan_dashboard_kpis)(order.shop) == expected
@@ -0,0 +1,161 @@
+import time
+
+import pytest
+from django.contrib.gis.geos import Point
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.urls import reverse
+
+from app.api.conditional import catalog_condition
+from app.api.views import ArtisanShopViewSet
+from app.geotiles import (
+    GEO_TILE_CHANGED_KEY,
+    GEO_TILE_INDEX_PRECISION,
+    cached_geolocation_product_search,
+    geohash_encode,
+    invalidate_geo_tiles,
+)
+from app.models import ArtisanShop, Product, ShopDailySales, User
+from app.routers import PIN_KEY, ReplicaRouter, ReplicaRoutingMiddleware, use_replica
+from app.services import (
+    CATALOG_MODIFIED_KEY,
+    CATALOG_PRODUCTS,
+    DASHBOARD_CACHE_KEY,
+    DASHBOARD_CHANGED_KEY,
+    bump_catalog_version,
+    bump_dashboard_version,
+    redis_client,
+)
+
+router = ReplicaRouter()
+
+
+@pytest.fixture
+def replicas(settings):
+    settings.DATABASE_REPLICAS = ['replica1']
+
+
+def _within_request(view, user=None):
+    """Run ``view`` as the view of a request passing through ``ReplicaRoutingMiddleware``."""
+    result = {}
+
+    def get_response(request):
+        result['value'] = view()
+        return HttpResponse()
+
+    request = RequestFactory().get('/')
+    if user is not None:
+        request.user = user
+    ReplicaRoutingMiddleware(get_response)(request)
+    return result['value']
+
+
+def _reads_after_opt_in():
+    use_replica()
+    return router.db_for_read(Product)
+
+
+def test_reads_stay_on_the_primary_without_opt_in(replicas):
+    assert use_replica() is False
+    assert router.db_for_read(Product) is None
+    assert _within_request(lambda: router.db_for_read(Product)) is None
+
+
+def test_opted_in_reads_go_to_a_replica(replicas):
+    assert _within_request(_reads_after_opt_in) == 'replica1'
+
+
+def test_reads_fall_back_to_the_primary_without_replicas():
+    assert _within_request(_reads_after_opt_in) is None
+
+
+def test_reads_after_a_write_go_to_the_primary(replicas):
+    def view():
+        use_replica()
+        assert router.db_for_write(Product) == 'default'
+        return router.db_for_read(Product), use_replica()
+
+    assert _within_request(view) == (None, False)
+
+
+def test_a_write_pins_the_user_to_the_primary(replicas):
+    user = User(pk=987654, username='pinned')
+    redis_client.delete(PIN_KEY.format(user.pk))
+    _within_request(lambda: router.db_for_write(User), user=user)
+    assert redis_client.ttl(PIN_KEY.format(user.pk)) > 0
+    assert _within_request(lambda: use_replica(user)) is False
+    assert _within_request(lambda: use_replica(User(pk=987655))) is True
+
+
+def test_only_the_primary_is_migrated(replicas):
+    assert router.allow_migrate('default', 'app')
+    assert not router.allow_migrate('replica1', 'app')
+
+
+class _CatalogView:
+    @catalog_condition(CATALOG_PRODUCTS)
+    def get(self, request):
+        use_replica()
+        return HttpResponse(router.db_for_read(Product) or 'default')
+
+
+def test_catalog_reads_stay_on_the_primary_right_after_a_change(replicas):
+    def get():
+        return ReplicaRoutingMiddleware(_CatalogView().get)(RequestFactory().get('/'))
+
+    bump_catalog_version(CATALOG_PRODUCTS)
+    response = get()
+    assert response.content == b'default'
+    assert response.has_header('ETag')
+    redis_client.set(CATALOG_MODIFIED_KEY.format(CATALOG_PRODUCTS), time.time() - 60)
+    assert get().content == b'replica1'
+
+
+def test_geo_tiles_from_a_replica_are_cached_once_it_caught_up(replicas, monkeypatch):
+    reads = []
+
+    class NoRows:
+        def values_list(self, *fields):
+            return []
+
+    def search(*args, **kwargs):
+        reads.append(router.db_for_read(Product))
+        return NoRows()
+
+    monkeypatch.setattr('app.geotiles.geolocation_product_search', search)
+    point = Point(-70.25, -33.5, srid=4326)
+    invalidate_geo_tiles(point)
+
+    def view():
+        use_replica()
+        cached_geolocation_product_search(point, 2)
+
+    _within_request(view)
+    _within_request(view)
+    assert reads == ['replica1', 'replica1']
+    redis_client.delete(GEO_TILE_CHANGED_KEY.format(geohash_encode(point.x, point.y, GEO_TILE_INDEX_PRECISION)))
+    _within_request(view)
+    _within_request(view)
+    assert reads == ['replica1'] * 3
+
+
+def test_dashboard_kpis_from_a_replica_are_cached_once_it_caught_up(replicas, monkeypatch, api_client):
+    reads = []
+
+    def artisan_dashboard_kpis(shop):
+        reads.append(router.db_for_read(ShopDailySales))
+        return {}
+
+    monkeypatch.setattr('app.services.artisan_dashboard_kpis', artisan_dashboard_kpis)
+    monkeypatch.setattr(ArtisanShopViewSet, 'get_object', lambda self: ArtisanShop(pk=987657))
+    redis_client.delete(DASHBOARD_CACHE_KEY.format(987657))
+    bump_dashboard_version(987657)
+    api_client.force_authenticate(User(pk=987656, username='owner'))
+    url = reverse('api:artisanshop-dashboard', kwargs={'pk': 987657})
+    assert api_client.get(url).status_code == 200
+    assert api_client.get(url)['X-Cache'] == 'miss'
+    assert reads == ['replica1', 'replica1']
+    redis_client.delete(DASHBOARD_CHANGED_KEY.format(987657))
+    assert api_client.get(url)['X-Cache'] == 'miss'
+    assert api_client.get(url)['X-Cache'] == 'hit'
+    assert reads == ['replica1'] * 3
@@ -0,0 +1,94 @@
+import time
+from io import StringIO
+
+import numpy as np
+import pytest
+from django.core.management import call_command
+from django.db.models import F
+
+from app.models import ArtisanShop, DeliverySchedule, InventoryAlert, Order, OrderItem, Product, User
+from app.seeding import SeedSizes, generate_orders, generate_products, make_plan, seasonal_hour_weights
+from app.services import LOW_STOCK_THRESHOLD
+
+SIZES = SeedSizes(customers=200, shops=10, products=300, orders=2000, history_days=90)
+
+
+@pytest.fixture
+def plan():
+    return make_plan(7, SIZES, list(range(1, 11)), time.time())
+
+
+def _columns(tables, model):
+    return next(columns for table_model, columns in tables if table_model is model)
+
+
+def test_plan_is_deterministic(plan):
+    again = make_plan(7, SIZES, list(range(1, 11)), plan.now)
+    assert np.array_equal(plan.product_cents, again.product_cents)
+    assert plan.shop_products.sum() == SIZES.products
+    assert plan.shop_products.min() >= 1
+
+
+def test_orders_are_consistent(plan):
+    tables = generate_orders(plan, 0, SIZES.orders, np.random.default_rng(1))
+    orders, items, deliveries = (_columns(tables, model) for model in (Order, OrderItem, DeliverySchedule))
+    created = orders['created_at'].astype('datetime64[s]').astype(float)
+    assert np.all(np.diff(created) >= 0)
+    assert plan.history_start <= created[0] and created[-1] <= plan.now
+
+    # Every line comes from its order's shop, once per order, and the totals add up.
+    shop_of_order = dict(zip(orders['id'], orders['shop_id']))
+    line_shops = np.array([shop_of_order[order_id] for order_id in items['order_id']])
+    product_shops = np.searchsorted(plan.shop_offset, items['product_id'] - 1, side='right')
+    assert np.array_equal(line_shops, product_shops)
+    # Lines share their order's ``created_at`` and with it its monthly partition.
+    created_of_order = dict(zip(orders['id'], orders['created_at']))
+    assert all(created_of_order[order_id] == at for order_id, at in zip(items['order_id'], items['created_at']))
+    pairs = set(zip(items['order_id'], items['product_id']))
+    assert len(pairs) == len(items['order_id'])
+    totals = np.bincount(items['order_id'], weights=items['total_price'] * 100)[orders['id']]
+    assert np.allclose(totals, orders['total_amount'] * 100)
+
+    statuses = dict(zip(orders['id'], orders['status']))
+    assert {statuses[order_id] for order_id in deliveries['order_id']} <= {'processing', 'completed'}
+
+
+def test_popular_products_dominate(plan):
+    items = _columns(generate_orders(plan, 0, SIZES.orders, np.random.default_rng(1)), OrderItem)
+    sales = np.sort(np.bincount(items['product_id'], minlength=SIZES.products + 1))[::-1]
+    assert sales[: SIZES.products // 10].sum() > sales.sum() / 3
+
+
+def test_holiday_season_is_busier():
+    december = np.datetime64('2025-12-05T00:00', 's').astype(int)
+    march = np.datetime64('2025-03-05T00:00', 's').astype(int)
+    assert seasonal_hour_weights(december, 24 * 7).sum() > 1.5 * seasonal_hour_weights(march, 24 * 7).sum()
+
+
+def test_low_stock_products_get_open_alerts(plan):
+    tables = generate_products(plan, 0, SIZES.products, np.random.default_rng(1))
+    products, alerts = _columns(tables, Product), _columns(tables, InventoryAlert)
+    low = set(products['id'][products['quantity'] <= LOW_STOCK_THRESHOLD])
+    assert set(alerts['product_id'][~alerts['resolved']]) == low
+
+
+@pytest.mark.django_db
+def test_seed_marketplace_command():
+    call_command(
+        'seed_marketplace',
+        customers=50,
+        shops=4,
+        products=40,
+        orders=300,
+        history_days=60,
+        chunk_size=100,
+        workers=1,
+        stdout=StringIO(),
+    )
+    assert User.objects.count() == 54
+    assert ArtisanShop.objects.filter(owner__role=User.ROLE_ARTISAN).count() == 4
+    assert Product.objects.exclude(search_vector=None).count() == 40
+    assert Order.objects.count() == 300
+    assert not OrderItem.objects.exclude(product__shop=F('order__shop')).exists()
+    # The sequences continue after the copied ids.
+    assert Order.objects.create(customer_id=5, shop_id=1).pk == 301
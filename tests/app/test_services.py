@@ -0,0 +1,246 @@
+import json
+import logging
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from app.models import ArtisanShop, Category, InventoryAlert, OrderItem, OutboxEvent, Product, User
+from app.services import (
+    CATALOG_EPOCH_KEY,
+    CATALOG_PRODUCTS,
+    CATALOG_VERSION_KEY,
+    DASHBOARD_CACHE_KEY,
+    DASHBOARD_LOCK_KEY,
+    DASHBOARD_VERSION_KEY,
+    HOT_STOCK_KEY,
+    HOT_STOCK_PENDING_KEY,
+    HOT_STOCK_PROCESSING_KEY,
+    INVENTORY_ALERT_KEY,
+    OUTBOX_HANDLERS,
+    _trigger_inventory_alerts,
+    audit_hot_stock,
+    cached_dashboard_kpis,
+    catalog_validators,
+    create_order,
+    prune_outbox,
+    reconcile_hot_stock,
+    redis_client,
+    relay_outbox,
+)
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def shop():
+    artisan = User.objects.create_user(username='maker', password='pass', role=User.ROLE_ARTISAN)
+    return ArtisanShop.objects.create(owner=artisan, name='Service Shop')
+
+
+@pytest.fixture
+def customer():
+    return User.objects.create_user(username='buyer', password='pass')
+
+
+def _make_products(shop, count, quantity=50):
+    category, _ = Category.objects.get_or_create(name='Ceramics')
+    return [
+        Product.objects.create(
+            shop=shop, name=f'Bowl {i}', price=Decimal('12.50'), quantity=quantity, category=category
+        )
+        for i in range(count)
+    ]
+
+
+def test_create_order_decrements_stock_and_totals(shop, customer):
+    bowl, plate = _make_products(shop, 2)
+    order = create_order(
+        customer,
+        shop,
+        [
+            {'product_id': bowl.id, 'quantity': 2},
+            {'product_id': plate.id, 'quantity': 1},
+            {'product': bowl, 'quantity': 1},
+        ],
+    )
+    bowl.refresh_from_db()
+    plate.refresh_from_db()
+    assert bowl.quantity == 47
+    assert plate.quantity == 49
+    assert order.total_amount == Decimal('50.00')
+    assert OrderItem.objects.get(order=order, product=bowl).quantity == 3
+
+
+def test_create_order_rolls_back_on_insufficient_stock(shop, customer):
+    bowl, plate = _make_products(shop, 2, quantity=5)
+    with pytest.raises(ValueError, match='Insufficient inventory'):
+        create_order(customer, shop, [{'product_id': bowl.id, 'quantity': 1}, {'product_id': plate.id, 'quantity': 6}])
+    bowl.refresh_from_db()
+    assert bowl.quantity == 5
+    assert not OrderItem.objects.exists()
+
+
+def test_create_order_rejects_unknown_product(shop, customer):
+    with pytest.raises(ValueError, match='does not exist'):
+        create_order(customer, shop, [{'product_id': 999999, 'quantity': 1}])
+
+
+def test_create_order_query_count_is_independent_of_cart_size(shop, customer):
+    products = _make_products(shop, 20)
+    with CaptureQueriesContext(connection) as small:
+        create_order(customer, shop, [{'product_id': products[0].id, 'quantity': 1}])
+    with CaptureQueriesContext(connection) as large:
+        create_order(customer, shop, [{'product_id': p.id, 'quantity': 1} for p in products])
+    assert len(large.captured_queries) == len(small.captured_queries)
+
+
+@pytest.fixture
+def hot_stock(settings):
+    settings.INVENTORY_RESERVATIONS_ENABLED = True
+    redis_client.delete(HOT_STOCK_PENDING_KEY, HOT_STOCK_PROCESSING_KEY)
+    yield
+    redis_client.delete(HOT_STOCK_PENDING_KEY, HOT_STOCK_PROCESSING_KEY)
+
+
+def test_hot_products_are_reserved_in_redis_and_reconciled(shop, customer, hot_stock):
+    (vase,) = _make_products(shop, 1, quantity=20)
+    Product.objects.filter(pk=vase.pk).update(is_hot=True)
+    redis_client.delete(HOT_STOCK_KEY.format(vase.pk))
+    create_order(customer, shop, [{'product_id': vase.id, 'quantity': 4}])
+    vase.refresh_from_db()
+    assert vase.quantity == 20
+    assert int(redis_client.get(HOT_STOCK_KEY.format(vase.pk))) == 16
+    assert reconcile_hot_stock() == 1
+    vase.refresh_from_db()
+    assert vase.quantity == 16
+    assert audit_hot_stock() == []
+
+
+def test_failed_order_releases_hot_reservation(shop, customer, hot_stock):
+    vase, cup = _make_products(shop, 2, quantity=5)
+    Product.objects.filter(pk=vase.pk).update(is_hot=True)
+    redis_client.delete(HOT_STOCK_KEY.format(vase.pk))
+    with pytest.raises(ValueError, match='Insufficient inventory'):
+        create_order(customer, shop, [{'product_id': vase.id, 'quantity': 2}, {'product_id': cup.id, 'quantity': 9}])
+    assert int(redis_client.get(HOT_STOCK_KEY.format(vase.pk))) == 5
+    assert int(redis_client.hget(HOT_STOCK_PENDING_KEY, vase.pk) or 0) == 0
+
+
+def test_reconcile_logs_reservations_beyond_postgres_stock(shop, hot_stock, caplog):
+    (vase,) = _make_products(shop, 1, quantity=2)
+    redis_client.hset(HOT_STOCK_PENDING_KEY, vase.pk, 5)
+    with caplog.at_level(logging.ERROR, logger='app.services'):
+        assert reconcile_hot_stock() == 1
+    vase.refresh_from_db()
+    assert vase.quantity == 0
+    assert any('oversold' in record.message and str(vase.pk) in record.message for record in caplog.records)
+
+
+def test_saving_a_hot_product_reseeds_its_counter(shop, hot_stock, django_capture_on_commit_callbacks):
+    (vase,) = _make_products(shop, 1, quantity=3)
+    redis_client.set(HOT_STOCK_KEY.format(vase.pk), 0)
+    vase.is_hot, vase.quantity = True, 12
+    with django_capture_on_commit_callbacks(execute=True):
+        vase.save()
+    assert int(redis_client.get(HOT_STOCK_KEY.format(vase.pk))) == 12
+
+
+def test_create_order_defers_side_effects_to_the_outbox(shop, customer):
+    (lamp,) = _make_products(shop, 1, quantity=4)
+    redis_client.delete(f'inventory-alert:{shop.pk}:{lamp.pk}')
+    redis_client.delete(DASHBOARD_VERSION_KEY.format(shop.pk))
+    order = create_order(customer, shop, [{'product_id': lamp.id, 'quantity': 2}])
+    events = OutboxEvent.objects.filter(processed_at__isnull=True)
+    assert {e.event_type for e in events} == {OutboxEvent.EVENT_ORDER_CREATED, OutboxEvent.EVENT_STOCK_LOW}
+    assert events.get(event_type=OutboxEvent.EVENT_ORDER_CREATED).payload['order_id'] == order.pk
+    assert not InventoryAlert.objects.exists()
+    assert redis_client.get(DASHBOARD_VERSION_KEY.format(shop.pk)) is None
+    assert relay_outbox() == 2
+    assert InventoryAlert.objects.get(product=lamp).quantity == 2
+    assert int(redis_client.get(DASHBOARD_VERSION_KEY.format(shop.pk))) == 1
+    assert not OutboxEvent.objects.filter(processed_at__isnull=True).exists()
+
+
+def test_outbox_events_out_of_attempts_are_logged(monkeypatch, settings, caplog):
+    def fail(events):
+        raise RuntimeError('handler down')
+
+    monkeypatch.setitem(OUTBOX_HANDLERS, OutboxEvent.EVENT_ORDER_CREATED, [fail])
+    settings.OUTBOX_MAX_ATTEMPTS = 2
+    event = OutboxEvent.objects.create(event_type=OutboxEvent.EVENT_ORDER_CREATED, payload={'order_id': 1})
+    with caplog.at_level(logging.ERROR, logger='app.services'):
+        assert relay_outbox() == 1
+        assert not any('Giving up' in record.message for record in caplog.records)
+        assert relay_outbox() == 1
+    assert any('Giving up on 1 order_created' in record.message for record in caplog.records)
+    assert relay_outbox() == 0
+    event.refresh_from_db()
+    assert event.attempts == 2 and event.processed_at is None
+
+
+def test_prune_outbox_deletes_only_old_processed_events(settings):
+    settings.OUTBOX_RETENTION_DAYS = 7
+    now = timezone.now()
+    old, recent, pending, exhausted = OutboxEvent.objects.bulk_create(
+        [
+            OutboxEvent(event_type=OutboxEvent.EVENT_STOCK_LOW, processed_at=now - timedelta(days=8)),
+            OutboxEvent(event_type=OutboxEvent.EVENT_STOCK_LOW, processed_at=now - timedelta(days=1)),
+            OutboxEvent(event_type=OutboxEvent.EVENT_STOCK_LOW, created_at=now - timedelta(days=30)),
+            OutboxEvent(event_type=OutboxEvent.EVENT_STOCK_LOW, created_at=now - timedelta(days=30), attempts=9),
+        ]
+    )
+    assert prune_outbox(batch_size=1) == 1
+    assert set(OutboxEvent.objects.values_list('pk', flat=True)) == {recent.pk, pending.pk, exhausted.pk}
+
+
+def test_inventory_alerts_are_deduplicated_per_product(shop):
+    lamp, shade = _make_products(shop, 2, quantity=1)
+    redis_client.delete(INVENTORY_ALERT_KEY.format(shop.pk, lamp.pk), INVENTORY_ALERT_KEY.format(shop.pk, shade.pk))
+    _trigger_inventory_alerts({(shop.pk, lamp.pk): 1, (shop.pk, shade.pk): 2})
+    _trigger_inventory_alerts({(shop.pk, lamp.pk): 0})
+    assert InventoryAlert.objects.filter(shop=shop).count() == 2
+    assert InventoryAlert.objects.get(product=lamp).quantity == 1
+
+
+@pytest.fixture
+def dashboard_shop(monkeypatch):
+    shop = ArtisanShop(pk=987658)
+    redis_client.delete(DASHBOARD_CACHE_KEY.format(shop.pk), DASHBOARD_VERSION_KEY.format(shop.pk))
+    redis_client.set(DASHBOARD_LOCK_KEY.format(shop.pk), 1, ex=10)
+    computed = []
+    monkeypatch.setattr('app.services.artisan_dashboard_kpis', lambda shop: computed.append(shop.pk) or {'orders': 1})
+    yield shop, computed
+    redis_client.delete(DASHBOARD_LOCK_KEY.format(shop.pk))
+
+
+def test_dashboard_waiters_poll_for_the_entry_being_computed(dashboard_shop, monkeypatch):
+    shop, computed = dashboard_shop
+
+    def sleep(seconds):
+        entry = {'version': 0, 'computed_at': time.time(), 'payload': {'orders': 2}}
+        redis_client.set(DASHBOARD_CACHE_KEY.format(shop.pk), json.dumps(entry))
+
+    monkeypatch.setattr('app.services.time.sleep', sleep)
+    payload, meta = cached_dashboard_kpis(shop)
+    assert (payload, meta['status'], computed) == ({'orders': 2}, 'hit', [])
+
+
+def test_dashboard_waiters_compute_once_the_wait_is_over(dashboard_shop, settings):
+    shop, computed = dashboard_shop
+    settings.DASHBOARD_CACHE_WAIT = 0
+    payload, meta = cached_dashboard_kpis(shop)
+    assert (payload, meta['status'], computed) == ({'orders': 1}, 'miss', [shop.pk])
+
+
+def test_catalog_etags_never_repeat_after_a_redis_flush():
+    redis_client.delete(CATALOG_EPOCH_KEY, CATALOG_VERSION_KEY.format(CATALOG_PRODUCTS))
+    etag, _ = catalog_validators(CATALOG_PRODUCTS)
+    assert catalog_validators(CATALOG_PRODUCTS)[0] == etag
+    # A flush drops the epoch along with the counters.
+    redis_client.delete(CATALOG_EPOCH_KEY)
+    assert catalog_validators(CATALOG_PRODUCTS)[0] != etag
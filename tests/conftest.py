@@ -5,6 +5,15 @@ from django.contrib.auth import get_user_model
 from rest_framework.test import APIClient
 
 
+@pytest.fixture(scope='session')
+def django_db_setup(django_db_setup: Any, django_db_blocker: Any) -> None:
+    from app.partitions import maintain_order_partitions
+
+    # A reused test database may predate the current month's order partitions.
+    with django_db_blocker.unblock():
+        maintain_order_partitions(retention_months=0)
+
+
 @pytest.fixture
 def user(db: Any) -> Any:
     return get_user_model().objects.create_user(username='testuser', password='password123')
@@ -10,7 +10,6 @@ from app.models import ArtisanShop, Category, Product
 pytestmark = pytest.mark.django_db
 
 
-@pytest.mark.xfail(strict=True)
 def test_recommendations_simple(api_client, user):
     category = Category.objects.create(name='Cat1')
     shop = ArtisanShop.objects.create(owner=user, name='Shop1')
@@ -26,7 +25,6 @@ def test_recommendations_simple(api_client, user):
     assert names == {'P1', 'P2'}
 
 
-@pytest.mark.xfail(strict=True)
 def test_recommendations_flash_sale_priority(api_client, user):
     category = Category.objects.create(name='Cat3')
     shop = ArtisanShop.objects.create(owner=user, name='Shop2')